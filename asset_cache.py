@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 静态资源磁盘缓存
+在浏览器上下文上注册路由，把脚本、样式、图片、字体的响应保存到磁盘，按 URL 和校验头（ETag/Last-Modified）索引；
+新的上下文和之后的运行直接从本地返回仍然新鲜的资源，过期的用条件请求重新验证，总大小超过上限时按最近最少使用淘汰
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from email.utils import parsedate_to_datetime
+from loguru import logger
+
+from paths import ASSET_CACHE_DIR
+
+# 缓存的资源类型
+CACHED_RESOURCE_TYPES = ("script", "stylesheet", "image", "font")
+
+# 只拦截看起来是静态资源的地址，其余请求不经过 Python
+ASSET_URL_PATTERN = re.compile(r"^https?://[^?#]+\.(?:js|mjs|css|png|jpe?g|gif|svg|webp|ico|woff2?|ttf|otf)(?:[?#].*)?$", re.I)
+
+# 返回缓存内容时不能沿用的响应头（缓存的是解压后的内容）
+DROP_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+# 没有 max-age 时按 Last-Modified 估算新鲜期的上限(秒)
+HEURISTIC_MAX_AGE = 24 * 3600
+
+
+def _freshness(headers, now):
+    """根据响应头计算过期时间，不可缓存时返回None"""
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return now
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        return now + int(match.group(1))
+    if "last-modified" in headers:
+        try:
+            age = now - parsedate_to_datetime(headers["last-modified"]).timestamp()
+            return now + min(max(age, 0) * 0.1, HEURISTIC_MAX_AGE)
+        except (TypeError, ValueError):
+            pass
+    # 没有新鲜期但有 ETag 的，每次使用前重新验证
+    return now if "etag" in headers else None
+
+
+class AssetCache:
+    """磁盘上的静态资源缓存，多个上下文、多次运行、多个进程共享
+
+    attach(context) 注册路由；同步接口的路由回调在调用 Playwright 的线程中执行，
+    每个进程使用自己的 SQLite 连接。
+    """
+
+    def __init__(self, directory=ASSET_CACHE_DIR, max_mb=200):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(directory, "index.db"), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS assets (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires REAL NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_assets_last_used ON assets(last_used)")
+        self.conn.commit()
+
+        # 本次运行的命中统计
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "stored": 0, "evicted": 0}
+
+    @staticmethod
+    def _key(url):
+        """缓存键：URL 的哈希"""
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def attach(self, context):
+        """在浏览器上下文上注册缓存路由"""
+        context.route(ASSET_URL_PATTERN, self._handle)
+
+    def _handle(self, route):
+        """路由回调：新鲜的直接返回，过期的重新验证，未缓存的请求后保存"""
+        request = route.request
+        if request.method != "GET" or request.resource_type not in CACHED_RESOURCE_TYPES:
+            route.fallback()
+            return
+
+        try:
+            key = self._key(request.url)
+            row = self.conn.execute(
+                "SELECT status, headers, etag, last_modified, expires FROM assets WHERE key = ?", (key,)
+            ).fetchone()
+            body = self._read_body(key) if row else None
+            now = time.time()
+
+            if row and body is not None and row[4] > now:
+                self.stats["hits"] += 1
+                self._touch(key, now)
+                route.fulfill(status=row[0], headers=json.loads(row[1]), body=body)
+                return
+
+            # 过期或未缓存：带上校验头向服务器请求
+            headers = dict(request.headers)
+            if row and body is not None:
+                if row[2]:
+                    headers["if-none-match"] = row[2]
+                if row[3]:
+                    headers["if-modified-since"] = row[3]
+            response = route.fetch(headers=headers)
+
+            if response.status == 304 and row and body is not None:
+                self.stats["revalidated"] += 1
+                expires = _freshness({k.lower(): v for k, v in response.headers.items()}, now) or now
+                self.conn.execute("UPDATE assets SET expires = ?, last_used = ? WHERE key = ?", (expires, now, key))
+                self.conn.commit()
+                route.fulfill(status=row[0], headers=json.loads(row[1]), body=body)
+                return
+
+            self.stats["misses"] += 1
+            body = response.body()
+            if response.status == 200:
+                self._store(key, request.url, response, body, now)
+            route.fulfill(response=response, body=body)
+        except Exception as e:
+            logger.debug(f"资源缓存处理失败，直接请求: {request.url} ({str(e)})")
+            try:
+                route.fallback()
+            except Exception:
+                pass
+
+    def _read_body(self, key):
+        """读取缓存的响应内容，文件缺失时返回None"""
+        try:
+            with open(self._body_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _touch(self, key, now):
+        """更新最近使用时间"""
+        self.conn.execute("UPDATE assets SET last_used = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+
+    def _store(self, key, url, response, body, now):
+        """保存一个可缓存的响应，超过大小上限时淘汰"""
+        headers = {k.lower(): v for k, v in response.headers.items()}
+        expires = _freshness(headers, now)
+        if expires is None or len(body) > self.max_bytes // 10:
+            return
+
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(body)
+        os.replace(tmp_file, path)
+
+        stored_headers = {k: v for k, v in headers.items() if k not in DROP_HEADERS}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO assets (key, url, status, headers, etag, last_modified, expires, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, url, response.status, json.dumps(stored_headers), headers.get("etag"),
+             headers.get("last-modified"), expires, len(body), now),
+        )
+        self.conn.commit()
+        self.stats["stored"] += 1
+        self._evict()
+
+    def total_bytes(self):
+        """缓存的总大小"""
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM assets").fetchone()[0]
+
+    def _evict(self):
+        """总大小超过上限时，按最近最少使用删除到上限的 90%"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for key, size in self.conn.execute("SELECT key, size FROM assets ORDER BY last_used").fetchall():
+            if total <= target:
+                break
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+            self.conn.execute("DELETE FROM assets WHERE key = ?", (key,))
+            total -= size
+            self.stats["evicted"] += 1
+        self.conn.commit()
+
+    def close(self):
+        """关闭索引数据库"""
+        self.conn.close()
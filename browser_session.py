@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 浏览器会话
+管理浏览器、上下文和页面的生命周期：详情页复用同一个标签页，
+每处理 N 个电影节或内存超过阈值时回收标签页/上下文，并保留登录状态
+"""
+
+from collections import OrderedDict
+
+import psutil
+from loguru import logger
+
+# 在页面内发起导航并立即返回，加载在浏览器中后台进行
+NAVIGATE_JS = "url => { window.location.href = url; }"
+
+# Chromium 相关进程名
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell", "msedge")
+
+
+def browser_processes(roots=None):
+    """浏览器进程及其子进程树
+
+    roots 为 None 时返回当前进程启动的所有浏览器进程（Playwright 驱动的子进程树），
+    否则只返回 roots 中仍在运行的进程及其子进程。
+    """
+    if roots is None:
+        candidates = psutil.Process().children(recursive=True)
+    else:
+        candidates = []
+        for root in roots:
+            try:
+                if root.is_running():
+                    candidates.append(root)
+                    candidates.extend(root.children(recursive=True))
+            except psutil.Error:
+                continue
+
+    processes = []
+    for proc in candidates:
+        try:
+            if any(name in proc.name().lower() for name in BROWSER_PROCESS_NAMES):
+                processes.append(proc)
+        except psutil.Error:
+            continue
+    return processes
+
+
+def browser_memory_mb(roots=None):
+    """浏览器进程树的总常驻内存(MB)"""
+    total = 0
+    for proc in browser_processes(roots):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return total / (1024 * 1024)
+
+
+def _driver_process(playwright):
+    """Playwright 驱动进程；同一个 Python 进程中可能同时运行多个驱动（如GUI中同时获取项目列表）"""
+    try:
+        return psutil.Process(playwright._impl_obj._connection._transport._proc.pid)
+    except (AttributeError, psutil.Error):
+        return None
+
+
+class BrowserSession:
+    """浏览器会话
+
+    launcher(playwright) 返回 Browser（普通启动）或 BrowserContext（使用已安装Chrome的持久化上下文）。
+    持久化上下文本身就保存了登录状态，回收时只替换标签页；普通上下文回收时
+    先导出 storage_state（cookies、localStorage），再用它创建新的上下文。
+    """
+
+    def __init__(self, playwright, launcher, recycle_every=20, memory_limit_mb=0, prefetch_count=0, asset_cache=None, har=None):
+        self.playwright = playwright
+        self.launcher = launcher
+        self.asset_cache = asset_cache
+        self.har = har
+        self.recycle_every = recycle_every
+        self.memory_limit_mb = memory_limit_mb
+        self.prefetch_count = prefetch_count
+
+        self.browser = None
+        self.context = None
+        self.page = None
+        self._detail_page = None
+        self._prefetched = OrderedDict()
+        self._spare_pages = []
+        self.prefetch_hits = 0
+        self.processed = 0
+        self.recycles = []
+        self.restarts = []
+        self.storage_state = None
+        self.browser_roots = []
+
+    @property
+    def persistent(self):
+        """是否为持久化上下文（没有独立的 Browser 对象）"""
+        return not hasattr(self.browser, "new_context")
+
+    def open(self):
+        """启动浏览器，返回列表页；已保存登录状态时新上下文会带上它"""
+        self._launch()
+        if self.persistent:
+            self.context = self.browser
+            if self.har:
+                self.har.attach(self.context)
+        else:
+            self._new_context()
+        self.page = self.context.new_page()
+        return self.page
+
+    def _launch(self):
+        """启动浏览器并记下本会话浏览器的根进程
+
+        只在本会话的 Playwright 驱动进程下查找新出现的浏览器进程；取不到驱动进程时
+        退回到启动前后的差集，避免把同一进程中其他会话的浏览器算进来。
+        """
+        driver = _driver_process(self.playwright)
+        roots = [driver] if driver else None
+        before = {proc.pid for proc in browser_processes(roots)}
+        self.browser = self.launcher(self.playwright)
+        started = {proc.pid: proc for proc in browser_processes(roots) if proc.pid not in before}
+        self.browser_roots = []
+        for proc in started.values():
+            try:
+                if proc.ppid() not in started:
+                    self.browser_roots.append(proc)
+            except psutil.Error:
+                continue
+
+    def processes(self):
+        """本会话浏览器的进程树"""
+        return browser_processes(self.browser_roots)
+
+    def memory_mb(self):
+        """本会话浏览器进程树的总常驻内存(MB)"""
+        return browser_memory_mb(self.browser_roots)
+
+    def _new_context(self):
+        """创建带登录状态的新上下文，并挂上静态资源缓存
+
+        持久化上下文有 Chrome 自己的磁盘缓存，而启用路由会关闭浏览器缓存，因此只给新上下文挂缓存。
+        录制或回放 HAR 时不使用资源缓存，所有请求都经过 HAR。
+        """
+        options = self.har.context_options() if self.har else {}
+        self.context = self.browser.new_context(storage_state=self.storage_state, **options)
+        if self.har:
+            self.har.attach(self.context)
+        elif self.asset_cache:
+            self.asset_cache.attach(self.context)
+
+    def snapshot_state(self):
+        """保存当前上下文的登录状态，浏览器崩溃重启后仍可使用"""
+        if not self.persistent:
+            self.storage_state = self.context.storage_state()
+
+    def restart(self, cause):
+        """浏览器失去响应或被结束后重新启动，返回新的列表页"""
+        logger.warning(f"重新启动浏览器: {cause}")
+        self.restarts.append(cause)
+        self.close()
+        return self.open()
+
+    @property
+    def detail_page(self):
+        """用于打开电影节详情的标签页，所有电影节复用同一个"""
+        if self._detail_page is None or self._detail_page.is_closed():
+            self._detail_page = self.context.new_page()
+        return self._detail_page
+
+    def prefetch(self, urls):
+        """在后台标签页中预先打开接下来的详情页，最多 prefetch_count 个，不等待加载完成"""
+        wanted = list(urls)[:self.prefetch_count]
+        for url in list(self._prefetched):
+            if url not in wanted:
+                self._spare_pages.append(self._prefetched.pop(url))
+        for url in wanted:
+            if url in self._prefetched:
+                continue
+            page = self._spare_page()
+            try:
+                page.evaluate(NAVIGATE_JS, url)
+                self._prefetched[url] = page
+            except Exception as e:
+                logger.debug(f"预加载详情页失败: {url} ({str(e)})")
+                self._close_page(page)
+
+    def take_detail_page(self, url):
+        """取出已预加载 url 的标签页作为当前详情页，返回 (标签页, 是否预加载)；
+        没有预加载时返回复用的详情页"""
+        page = self._prefetched.pop(url, None)
+        if page is None or page.is_closed():
+            return self.detail_page, False
+        if self._detail_page and not self._detail_page.is_closed():
+            self._spare_pages.append(self._detail_page)
+        self._detail_page = page
+        self.prefetch_hits += 1
+        return page, True
+
+    def drop_prefetched(self):
+        """丢弃所有预加载的标签页（如配额已满）"""
+        for page in list(self._prefetched.values()) + self._spare_pages:
+            self._close_page(page)
+        self._prefetched.clear()
+        self._spare_pages = []
+
+    def _spare_page(self):
+        """取一个空闲标签页用于预加载，没有时新建"""
+        while self._spare_pages:
+            page = self._spare_pages.pop()
+            if not page.is_closed():
+                return page
+        return self.context.new_page()
+
+    @staticmethod
+    def _close_page(page):
+        """关闭标签页，忽略已关闭或浏览器已退出的错误"""
+        try:
+            if not page.is_closed():
+                page.close()
+        except Exception:
+            pass
+
+    def discard_detail_page(self):
+        """关闭详情标签页，结束其中仍在进行的加载，下次使用时重新创建"""
+        try:
+            if self._detail_page and not self._detail_page.is_closed():
+                self._detail_page.close()
+        except Exception as e:
+            logger.warning(f"关闭详情页时出错: {str(e)}")
+        finally:
+            self._detail_page = None
+
+    def park_listing(self):
+        """列表页不再需要时跳转到空白页，释放其渲染进程占用的内存"""
+        if self.page and not self.page.is_closed():
+            self.page.goto("about:blank")
+
+    def after_festival(self):
+        """每处理完一个电影节调用一次，按策略决定是否回收"""
+        self.processed += 1
+        if self.recycle_every and self.processed % self.recycle_every == 0:
+            self.recycle(f"已处理 {self.processed} 个电影节")
+        elif self.memory_limit_mb:
+            memory = self.memory_mb()
+            if memory > self.memory_limit_mb:
+                self.recycle(f"浏览器内存 {memory:.0f} MB 超过上限 {self.memory_limit_mb} MB")
+
+    def recycle(self, reason):
+        """回收标签页（普通上下文同时重建上下文），保留登录状态"""
+        logger.info(f"回收浏览器页面: {reason}")
+        listing_url = self.page.url if self.page and not self.page.is_closed() else "about:blank"
+
+        self.drop_prefetched()
+        if self.persistent:
+            for page in (self._detail_page, self.page):
+                if page and not page.is_closed():
+                    page.close()
+        else:
+            self.snapshot_state()
+            self.context.close()
+            self._new_context()
+
+        self._detail_page = None
+        self.page = self.context.new_page()
+        if listing_url != "about:blank":
+            self.page.goto(listing_url)
+        self.recycles.append(reason)
+
+    def close(self):
+        """关闭浏览器"""
+        try:
+            if self.browser:
+                self.browser.close()
+        except Exception as e:
+            logger.warning(f"关闭浏览器时出错: {str(e)}")
+        finally:
+            self.browser = None
+            self.browser_roots = []
+            self.context = None
+            self.page = None
+            self._detail_page = None
+            self._prefetched.clear()
+            self._spare_pages = []
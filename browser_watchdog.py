@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 浏览器看门狗
+后台线程定期采样浏览器进程树的CPU和内存，并通过投递循环的心跳判断页面是否卡死，
+超过阈值时结束浏览器进程，由投递循环重新启动浏览器并从当前电影节继续
+"""
+
+import threading
+import time
+
+import psutil
+from loguru import logger
+
+
+class BrowserWatchdog(threading.Thread):
+    """浏览器资源看门狗
+
+    Playwright 同步接口不能跨线程调用，因此看门狗不直接操作页面：
+    投递循环在每个步骤前调用 heartbeat()，心跳长时间没有更新即视为页面无响应。
+    触发后看门狗结束浏览器进程，正在进行的 Playwright 调用会立即抛出异常，
+    投递循环通过 consume_trip() 得知原因并重启浏览器。
+    processes() 返回本会话浏览器的进程树，只采样和结束这些进程，同一进程中其他会话的浏览器不受影响。
+    """
+
+    def __init__(self, processes, interval=5, max_rss_mb=3000, max_cpu_percent=0, cpu_samples=6, hang_seconds=180):
+        super().__init__(name="browser-watchdog", daemon=True)
+        self.processes = processes
+        self.interval = interval
+        self.max_rss_mb = max_rss_mb
+        self.max_cpu_percent = max_cpu_percent
+        self.cpu_samples = cpu_samples
+        self.hang_seconds = hang_seconds
+
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._last_heartbeat = time.monotonic()
+        self._trip_cause = None
+        self._busy_samples = 0
+        self._processes = {}
+
+        # 最近一次采样结果
+        self.last_rss_mb = 0.0
+        self.last_cpu_percent = 0.0
+
+    def heartbeat(self):
+        """投递循环报告自己仍在推进"""
+        with self._lock:
+            self._last_heartbeat = time.monotonic()
+
+    def consume_trip(self):
+        """取出并清除触发原因，未触发时返回None"""
+        with self._lock:
+            cause, self._trip_cause = self._trip_cause, None
+            self._last_heartbeat = time.monotonic()
+            self._busy_samples = 0
+            return cause
+
+    def stop(self):
+        """停止看门狗线程"""
+        self._stop_event.set()
+
+    def _sample(self):
+        """采样浏览器进程树的总内存(MB)和总CPU占用(%)"""
+        current = {}
+        rss = 0
+        cpu = 0.0
+        for proc in self.processes():
+            # 复用 Process 对象，cpu_percent 才能计算两次采样之间的占用
+            proc = self._processes.get(proc.pid, proc)
+            try:
+                rss += proc.memory_info().rss
+                cpu += proc.cpu_percent(interval=None)
+                current[proc.pid] = proc
+            except psutil.Error:
+                continue
+        self._processes = current
+        return rss / (1024 * 1024), cpu
+
+    def _check(self):
+        """检查各项阈值，返回触发原因"""
+        rss_mb, cpu = self._sample()
+        self.last_rss_mb, self.last_cpu_percent = rss_mb, cpu
+
+        if self.max_rss_mb and rss_mb > self.max_rss_mb:
+            return f"浏览器内存 {rss_mb:.0f} MB 超过上限 {self.max_rss_mb} MB"
+
+        if self.max_cpu_percent:
+            self._busy_samples = self._busy_samples + 1 if cpu > self.max_cpu_percent else 0
+            if self._busy_samples >= self.cpu_samples:
+                return f"浏览器CPU占用持续高于 {self.max_cpu_percent}%（{cpu:.0f}%）"
+
+        with self._lock:
+            idle = time.monotonic() - self._last_heartbeat
+        if self.hang_seconds and idle > self.hang_seconds:
+            return f"页面 {idle:.0f} 秒无响应"
+        return None
+
+    def _kill_browser(self):
+        """结束本会话的浏览器进程树"""
+        for proc in self.processes():
+            try:
+                proc.kill()
+            except psutil.Error:
+                continue
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                if self._trip_cause:
+                    continue
+            try:
+                cause = self._check()
+            except Exception as e:
+                logger.warning(f"看门狗采样出错: {str(e)}")
+                continue
+            if cause:
+                logger.warning(f"看门狗触发: {cause}，正在结束浏览器进程")
+                with self._lock:
+                    self._trip_cause = cause
+                self._kill_browser()
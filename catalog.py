@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 本地电影节目录
+将发现阶段解析到的电影节保存在本地SQLite数据库中，供排序、投递计划等模块使用；
+名称、类别、地区和简介建有 FTS5 全文索引，按关键词选择目标时直接在本地查询
+"""
+
+import json
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+from paths import CATALOG_FILE
+
+# 目录浏览可以排序的列
+SORT_COLUMNS = ("name", "fee", "deadline", "first_seen", "last_seen", "submitted_at")
+
+# 目录浏览显示的列
+SUMMARY_COLUMNS = "slug, name, url, fee, deadline, location, first_seen, last_seen, submitted_at"
+
+# 连续多少次运行找不到投递按钮后把电影节移出候选（已截止或关闭投递）
+RETIRE_AFTER_NO_BUTTON = 2
+
+# 全文索引的列
+FTS_COLUMNS = ("name", "categories", "location", "description")
+
+# 全文查询的运算符和词法单元：引号短语、括号、其他连续的非空白字符
+FTS_OPERATORS = ("AND", "OR", "NOT")
+QUERY_TOKEN_RE = re.compile(r'"[^"]*"|[()]|[^\s()]+')
+BAREWORD_RE = re.compile(r"^\w+\*?$")
+
+
+def _fts_term(term):
+    """查询词：普通单词（可带前缀通配符 *）原样保留，其他字符（如连字符）作为短语加引号"""
+    if BAREWORD_RE.match(term):
+        return term
+    return '"' + term.replace('"', '""') + '"'
+
+
+def fts_query(text):
+    """把用户输入的查询转换为 FTS5 查询，如 "documentary AND Europe"、"short* NOT horror"、"location:Berlin"
+
+    支持 AND、OR、NOT、括号、引号短语和前缀通配符；单词之间没有运算符时按 AND 处理。
+    "a AND NOT b" 转换为 FTS5 的 "a NOT b"；NOT 前面必须有另一个条件（开头的 NOT 由 match_slugs 处理），
+    "a OR NOT b"、"(NOT b)" 这类写法无法表达，抛出 ValueError。
+    """
+    parts = []
+    for token in QUERY_TOKEN_RE.findall(text):
+        column, _, term = token.partition(":")
+        if token == "NOT":
+            if parts and parts[-1] == "AND":
+                parts.pop()
+            if not parts or parts[-1] in FTS_OPERATORS or parts[-1] == "(":
+                raise ValueError(f"无法解析查询 {text!r}: NOT 只能跟在另一个条件之后（如 short NOT horror）或放在查询开头")
+            parts.append(token)
+        elif token in FTS_OPERATORS or token in ("(", ")"):
+            parts.append(token)
+        elif len(token) > 1 and token.startswith('"') and token.endswith('"'):
+            parts.append(token)
+        elif term and column in FTS_COLUMNS:
+            parts.append(column + ":" + _fts_term(term.strip('"')))
+        else:
+            parts.append(_fts_term(token.strip('"')))
+    if parts and parts[-1] in FTS_OPERATORS:
+        raise ValueError(f"无法解析查询 {text!r}: 运算符后缺少关键词")
+    return " ".join(parts)
+
+
+def _operand_end(tokens, start, text):
+    """NOT 之后的一个词、短语或括号的结束位置"""
+    if start >= len(tokens) or tokens[start] in FTS_OPERATORS or tokens[start] == ")":
+        raise ValueError(f"无法解析查询 {text!r}: NOT 后缺少关键词")
+    if tokens[start] != "(":
+        return start + 1
+    depth = 0
+    for end in range(start, len(tokens)):
+        depth += {"(": 1, ")": -1}.get(tokens[end], 0)
+        if depth == 0:
+            return end + 1
+    raise ValueError(f"无法解析查询 {text!r}: 括号不匹配")
+
+
+def _split_leading_not(text):
+    """FTS5 的 NOT 只能连接两个查询，开头的 NOT 单独处理
+
+    连续的 NOT 合并为一个排除条件（"NOT a NOT b"、"NOT a AND NOT b" 排除 a OR b）。
+    返回 (被排除的查询, 其余的查询, 其余部分是否以 OR 连接)，不以 NOT 开头时返回 None。
+    """
+    tokens = QUERY_TOKEN_RE.findall(text)
+    if not tokens or tokens[0] != "NOT":
+        return None
+    excluded = []
+    pos = 0
+    while pos < len(tokens) and tokens[pos] == "NOT":
+        end = _operand_end(tokens, pos + 1, text)
+        excluded.append(" ".join(tokens[pos + 1:end]))
+        pos = end
+        if tokens[pos:pos + 2] == ["AND", "NOT"]:
+            pos += 1
+    rest = tokens[pos:]
+    union = bool(rest) and rest[0] == "OR"
+    if rest and rest[0] in ("AND", "OR"):
+        rest = rest[1:]
+        if not rest:
+            raise ValueError(f"无法解析查询 {text!r}: 运算符后缺少关键词")
+    if len(excluded) > 1:
+        excluded = [f"({e})" for e in excluded]
+    return " OR ".join(excluded), " ".join(rest), union
+
+
+def _expired(festival, today):
+    """所有截止档都已过期；没有截止日期信息的电影节不算过期"""
+    dates = [d["date"] for d in festival["deadlines"] if d.get("date")]
+    if festival["deadline"]:
+        dates.append(festival["deadline"])
+    return bool(dates) and max(dates) < today
+
+
+def check_query(text):
+    """检查全文查询能否解析，不能时抛出 ValueError（在内存数据库上执行一次，不打开目录）"""
+    catalog = FestivalCatalog(":memory:")
+    try:
+        catalog.match_slugs(text)
+    finally:
+        catalog.close()
+
+
+def _like_filter(text):
+    """不支持 FTS5 时的近似查询条件：支持 AND、OR、NOT、引号短语和列前缀，忽略括号，返回 (条件, 参数)"""
+    groups = [[]]
+    negate = False
+    for token in QUERY_TOKEN_RE.findall(text):
+        if token in ("(", ")", "AND"):
+            continue
+        if token == "OR":
+            groups.append([])
+            continue
+        if token == "NOT":
+            negate = True
+            continue
+        column, _, term = token.partition(":")
+        columns = (column,) if term and column in FTS_COLUMNS else FTS_COLUMNS
+        term = (term if term and column in FTS_COLUMNS else token).strip('"').rstrip("*")
+        groups[-1].append((columns, term, negate))
+        negate = False
+
+    clauses = []
+    params = []
+    for group in groups:
+        terms = []
+        for columns, term, negated in group:
+            match = "(" + " OR ".join(f"{column} LIKE ?" for column in columns) + ")"
+            terms.append(f"NOT {match}" if negated else match)
+            params.extend(f"%{term}%" for _ in columns)
+        if terms:
+            clauses.append("(" + " AND ".join(terms) + ")")
+    if not clauses:
+        raise ValueError(f"查询中没有关键词: {text}")
+    return " OR ".join(clauses), params
+
+
+def festival_slug(url):
+    """从电影节链接中提取唯一标识，如 /SundanceFilmFestival -> SundanceFilmFestival"""
+    return url.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+
+
+class FestivalCatalog:
+    """本地电影节目录，以电影节标识去重"""
+
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS festivals (
+                slug TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                url TEXT NOT NULL,
+                fee REAL DEFAULT 0,
+                deadline TEXT,
+                deadlines TEXT DEFAULT '[]',
+                categories TEXT DEFAULT '[]',
+                location TEXT DEFAULT '',
+                description TEXT DEFAULT '',
+                first_seen TEXT,
+                last_seen TEXT,
+                submitted_at TEXT,
+                no_button INTEGER DEFAULT 0,
+                retired_at TEXT,
+                retired_reason TEXT
+            )
+            """
+        )
+        # 兼容旧版本创建的数据库
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(festivals)")}
+        if "submitted_at" not in columns:
+            self.conn.execute("ALTER TABLE festivals ADD COLUMN submitted_at TEXT")
+        for column in ("location", "description"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE festivals ADD COLUMN {column} TEXT DEFAULT ''")
+        if "retired_at" not in columns:
+            self.conn.execute("ALTER TABLE festivals ADD COLUMN no_button INTEGER DEFAULT 0")
+            self.conn.execute("ALTER TABLE festivals ADD COLUMN retired_at TEXT")
+            self.conn.execute("ALTER TABLE festivals ADD COLUMN retired_reason TEXT")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS watermarks (
+                key TEXT PRIMARY KEY,
+                slugs TEXT NOT NULL,
+                updated TEXT
+            )
+            """
+        )
+        self.fts = self._create_fts_index()
+        self.conn.commit()
+
+    def _create_fts_index(self):
+        """创建全文索引并用触发器与目录保持同步，SQLite 不支持 FTS5 时返回 False（查询改用 LIKE）"""
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'festivals_fts'"
+        ).fetchone()
+        columns = ", ".join(FTS_COLUMNS)
+        new_columns = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+        old_columns = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+        try:
+            self.conn.execute(
+                f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS festivals_fts USING fts5(
+                    {columns}, content='festivals', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+                )
+                """
+            )
+        except sqlite3.OperationalError:
+            return False
+        self.conn.executescript(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS festivals_fts_insert AFTER INSERT ON festivals BEGIN
+                INSERT INTO festivals_fts (rowid, {columns}) VALUES (new.rowid, {new_columns});
+            END;
+            CREATE TRIGGER IF NOT EXISTS festivals_fts_delete AFTER DELETE ON festivals BEGIN
+                INSERT INTO festivals_fts (festivals_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_columns});
+            END;
+            CREATE TRIGGER IF NOT EXISTS festivals_fts_update AFTER UPDATE OF {columns} ON festivals BEGIN
+                INSERT INTO festivals_fts (festivals_fts, rowid, {columns}) VALUES ('delete', old.rowid, {old_columns});
+                INSERT INTO festivals_fts (rowid, {columns}) VALUES (new.rowid, {new_columns});
+            END;
+            """
+        )
+        if not exists:
+            # 为已有的目录建立索引
+            self.conn.execute("INSERT INTO festivals_fts (festivals_fts) VALUES ('rebuild')")
+        return True
+
+    @staticmethod
+    def _to_row(festival):
+        """电影节记录转换为数据库行"""
+        deadlines = [
+            dict(d, date=d["date"].isoformat() if d.get("date") else None)
+            for d in festival.get("deadlines", [])
+        ]
+        deadline = festival.get("deadline")
+        return {
+            "slug": festival.get("slug") or festival_slug(festival["url"]),
+            "name": festival["name"],
+            "url": festival["url"],
+            "fee": festival.get("fee") or 0.0,
+            "deadline": deadline.isoformat() if deadline else None,
+            "deadlines": json.dumps(deadlines, ensure_ascii=False),
+            "categories": json.dumps(festival.get("categories", []), ensure_ascii=False),
+            "location": festival.get("location") or "",
+            "description": festival.get("description") or "",
+            "seen": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    @staticmethod
+    def _from_row(row):
+        """数据库行转换为电影节记录"""
+        deadlines = [
+            dict(d, date=date.fromisoformat(d["date"]) if d.get("date") else None)
+            for d in json.loads(row["deadlines"])
+        ]
+        return {
+            "slug": row["slug"],
+            "name": row["name"],
+            "url": row["url"],
+            "fee": row["fee"],
+            "deadline": date.fromisoformat(row["deadline"]) if row["deadline"] else None,
+            "deadlines": deadlines,
+            "categories": json.loads(row["categories"]),
+            "location": row["location"] or "",
+            "description": row["description"] or "",
+            "first_seen": row["first_seen"],
+            "last_seen": row["last_seen"],
+            "submitted_at": row["submitted_at"],
+            "retired_at": row["retired_at"],
+        }
+
+    def upsert_many(self, festivals):
+        """批量写入电影节，已存在的记录更新信息但保留首次发现时间"""
+        rows = [self._to_row(f) for f in festivals]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                """
+                INSERT INTO festivals (
+                    slug, name, url, fee, deadline, deadlines, categories, location, description, first_seen, last_seen
+                )
+                VALUES (
+                    :slug, :name, :url, :fee, :deadline, :deadlines, :categories, :location, :description, :seen, :seen
+                )
+                ON CONFLICT(slug) DO UPDATE SET
+                    name=excluded.name, url=excluded.url, fee=excluded.fee, deadline=excluded.deadline,
+                    deadlines=excluded.deadlines, categories=excluded.categories,
+                    location=CASE WHEN excluded.location != '' THEN excluded.location ELSE location END,
+                    description=CASE WHEN excluded.description != '' THEN excluded.description ELSE description END,
+                    last_seen=excluded.last_seen
+                """,
+                rows,
+            )
+            self.conn.commit()
+
+    def get(self, slug):
+        """按标识获取电影节，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM festivals WHERE slug = ?", (slug,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def mark_submitted(self, slug):
+        """记录电影节已投递（或已提交过），之后不再作为候选"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE festivals SET submitted_at = ? WHERE slug = ?",
+                (datetime.now().isoformat(timespec="seconds"), slug),
+            )
+            self.conn.commit()
+
+    def record_no_button(self, slug):
+        """记录一次找不到投递按钮，连续达到 RETIRE_AFTER_NO_BUTTON 次后移出候选，返回是否已移出"""
+        with self.lock:
+            self.conn.execute("UPDATE festivals SET no_button = no_button + 1 WHERE slug = ?", (slug,))
+            retired = self.conn.execute(
+                """
+                UPDATE festivals SET retired_at = ?, retired_reason = 'no_button'
+                WHERE slug = ? AND no_button >= ? AND retired_at IS NULL
+                """,
+                (datetime.now().isoformat(timespec="seconds"), slug, RETIRE_AFTER_NO_BUTTON),
+            ).rowcount
+            self.conn.commit()
+        return bool(retired)
+
+    def reset_no_button(self, slug):
+        """投递页面正常时清零找不到按钮的计数"""
+        with self.lock:
+            self.conn.execute("UPDATE festivals SET no_button = 0 WHERE slug = ? AND no_button > 0", (slug,))
+            self.conn.commit()
+
+    def iter_pending(self, max_fee, seen_before=None, batch_size=500, today=None):
+        """分批遍历尚未投递、未移出候选、费用不超过上限且仍有未截止档位的电影节
+
+        seen_before 用于排除本次运行刚发现的电影节（它们已作为新增部分单独处理）。
+        """
+        today = today or date.today()
+        last_slug = ""
+        while True:
+            query = (
+                "SELECT * FROM festivals WHERE slug > ? AND submitted_at IS NULL AND retired_at IS NULL AND fee <= ?"
+            )
+            params = [last_slug, max_fee]
+            if seen_before:
+                query += " AND last_seen < ?"
+                params.append(seen_before)
+            query += " ORDER BY slug LIMIT ?"
+            params.append(batch_size)
+
+            with self.lock:
+                rows = self.conn.execute(query, params).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                festival = self._from_row(row)
+                if not _expired(festival, today):
+                    yield festival
+            last_slug = rows[-1]["slug"]
+
+    def get_watermark(self, key):
+        """获取某个筛选/排序组合下最近见过的电影节标识"""
+        with self.lock:
+            row = self.conn.execute("SELECT slugs FROM watermarks WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["slugs"]) if row else []
+
+    def set_watermark(self, key, slugs):
+        """更新某个筛选/排序组合的水位线"""
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO watermarks (key, slugs, updated) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET slugs=excluded.slugs, updated=excluded.updated
+                """,
+                (key, json.dumps(slugs), datetime.now().isoformat(timespec="seconds")),
+            )
+            self.conn.commit()
+
+    def search_slugs(self, text=None, sort="last_seen", descending=True):
+        """按名称、标识或类别筛选并排序，只返回电影节标识，由调用方按需分批读取行"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"不支持的排序列: {sort}")
+        query = "SELECT slug FROM festivals"
+        params = []
+        if text:
+            pattern = f"%{text}%"
+            query += " WHERE name LIKE ? OR slug LIKE ? OR categories LIKE ?"
+            params = [pattern, pattern, pattern]
+        direction = "DESC" if descending else "ASC"
+        # 空值始终排在最后
+        query += f" ORDER BY {sort} IS NULL, {sort} {direction}, slug"
+        with self.lock:
+            return [row[0] for row in self.conn.execute(query, params)]
+
+    def match_slugs(self, query, slugs=None, limit=None):
+        """按全文查询匹配电影节，返回按相关度排序的标识；slugs 不为 None 时只在这些电影节中匹配
+
+        查询语法见 fts_query()，另外支持开头的 NOT（如 "NOT horror"、"NOT horror NOT short"）；无法解析时抛出 ValueError。
+        """
+        if slugs is not None and not slugs:
+            return []
+        leading_not = _split_leading_not(query) if self.fts else None
+        if leading_not:
+            # 开头的 NOT：排除匹配的电影节，其余部分（如有）作为另一个条件
+            excluded, rest, union = leading_not
+            condition = "f.rowid NOT IN (SELECT rowid FROM festivals_fts WHERE festivals_fts MATCH ?)"
+            params = [fts_query(excluded)]
+            if rest:
+                condition = (
+                    f"{condition} {'OR' if union else 'AND'}"
+                    " f.rowid IN (SELECT rowid FROM festivals_fts WHERE festivals_fts MATCH ?)"
+                )
+                params.append(fts_query(rest))
+            sql = f"SELECT f.slug FROM festivals f WHERE ({condition})"
+            order = " ORDER BY f.name"
+        elif self.fts:
+            sql = (
+                "SELECT f.slug FROM festivals_fts JOIN festivals f ON f.rowid = festivals_fts.rowid"
+                " WHERE festivals_fts MATCH ?"
+            )
+            params = [fts_query(query)]
+            order = " ORDER BY festivals_fts.rank"
+        else:
+            clause, params = _like_filter(query)
+            sql = f"SELECT f.slug FROM festivals f WHERE ({clause})"
+            order = " ORDER BY f.name"
+        if slugs is not None:
+            sql += f" AND f.slug IN ({','.join('?' * len(slugs))})"
+            params += list(slugs)
+        sql += order
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        try:
+            with self.lock:
+                return [row[0] for row in self.conn.execute(sql, params)]
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"无法解析查询 {query!r}: {str(e)}")
+
+    def summaries(self, slugs):
+        """读取一批电影节的显示列，返回 {标识: 行字典}"""
+        result = {}
+        for start in range(0, len(slugs), 500):
+            chunk = slugs[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            with self.lock:
+                rows = self.conn.execute(
+                    f"SELECT {SUMMARY_COLUMNS} FROM festivals WHERE slug IN ({placeholders})", chunk
+                ).fetchall()
+            result.update((row["slug"], dict(row)) for row in rows)
+        return result
+
+    def data_version(self):
+        """其他连接（如投递进程）提交修改后会变化，用于判断是否需要刷新"""
+        with self.lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def count(self):
+        """目录中的电影节数量"""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM festivals").fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 电影节目录的表格模型
+筛选和排序在后台线程中由SQLite完成，只得到有序的电影节标识；
+表格滚动时通过 canFetchMore/fetchMore 分批读取要显示的行，目录有几万个电影节时界面也不会卡顿；
+投递进程写入目录后自动重新查询
+"""
+
+import threading
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+from catalog import FestivalCatalog
+
+# (数据库列, 表头)
+COLUMNS = [
+    ("name", "电影节"),
+    ("fee", "费用"),
+    ("deadline", "截止日期"),
+    ("first_seen", "首次发现"),
+    ("last_seen", "最近见到"),
+    ("submitted_at", "投递时间"),
+]
+
+
+class CatalogTableModel(QAbstractTableModel):
+    """电影节目录的表格模型，行按需分批加载"""
+
+    # 后台查询完成：(查询序号, 有序的电影节标识)
+    results_ready = pyqtSignal(int, list)
+    # 当前筛选条件下的电影节总数变化
+    total_changed = pyqtSignal(int)
+
+    def __init__(self, catalog=None, batch_size=200, parent=None):
+        super().__init__(parent)
+        self.catalog = catalog or FestivalCatalog()
+        self.batch_size = batch_size
+
+        self.slugs = []
+        self.rows = {}
+        self.loaded = 0
+
+        self.search = ""
+        self.sort_column = "last_seen"
+        self.descending = True
+
+        # 只应用最近一次查询的结果
+        self.generation = 0
+        self.version = self.catalog.data_version()
+        self.results_ready.connect(self._apply_results)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section][1]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self.loaded:
+            return None
+        row = self.rows.get(self.slugs[index.row()])
+        if row is None:
+            return None
+
+        column = COLUMNS[index.column()][0]
+        if role == Qt.ItemDataRole.DisplayRole:
+            value = row[column]
+            if column == "fee":
+                return f"${value:.2f}" if value else "免费"
+            if column in ("first_seen", "last_seen", "submitted_at") and value:
+                return value.replace("T", " ")
+            return value or ""
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return row["url"]
+        if role == Qt.ItemDataRole.UserRole:
+            return row
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.loaded < len(self.slugs)
+
+    def fetchMore(self, parent=QModelIndex()):
+        """滚动到底部时读取下一批行"""
+        if parent.isValid():
+            return
+        count = min(self.batch_size, len(self.slugs) - self.loaded)
+        if count <= 0:
+            return
+        self.rows.update(self.catalog.summaries(self.slugs[self.loaded:self.loaded + count]))
+        self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+        self.loaded += count
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        """表头点击排序，在后台线程中重新查询"""
+        self.sort_column = COLUMNS[column][0]
+        self.descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
+
+    def set_search(self, text):
+        """按名称、标识或类别筛选"""
+        self.search = text.strip()
+        self.refresh()
+
+    def refresh(self):
+        """在后台线程中按当前条件重新查询"""
+        self.generation += 1
+        thread = threading.Thread(
+            target=self._query,
+            args=(self.generation, self.search, self.sort_column, self.descending),
+            daemon=True,
+        )
+        thread.start()
+
+    def _query(self, generation, search, sort_column, descending):
+        """后台线程：只查询有序的标识，结果通过信号交给界面线程"""
+        slugs = self.catalog.search_slugs(search, sort_column, descending)
+        self.results_ready.emit(generation, slugs)
+
+    def _apply_results(self, generation, slugs):
+        """界面线程：替换结果，保持已加载的行数，避免刷新后滚动位置跳回顶部"""
+        if generation != self.generation:
+            return
+        keep = min(max(self.loaded, self.batch_size), len(slugs))
+        self.beginResetModel()
+        self.slugs = slugs
+        self.rows = self.catalog.summaries(slugs[:keep])
+        self.loaded = keep
+        self.endResetModel()
+        self.total_changed.emit(len(slugs))
+
+    def check_for_updates(self):
+        """目录被其他连接修改时重新查询，由界面定时调用"""
+        version = self.catalog.data_version()
+        if version != self.version:
+            self.version = version
+            self.refresh()
+
+    def festival(self, row):
+        """某一行的电影节显示数据"""
+        if 0 <= row < self.loaded:
+            return self.rows.get(self.slugs[row])
+        return None
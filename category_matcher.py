@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 投递类别匹配
+一次性读取表单上所有复选框标签，建立规范化的内存索引（大小写折叠、分词、别名），
+按可配置的模糊阈值匹配配置的类别，再一次性勾选所有匹配的复选框
+"""
+
+import re
+from difflib import SequenceMatcher
+from loguru import logger
+
+# 读取表单上所有带复选框的标签
+COLLECT_LABELS_JS = """
+() => Array.from(document.querySelectorAll('label')).map((label, index) => {
+    const input = label.control || label.querySelector('input');
+    return {
+        index,
+        text: (label.innerText || '').trim(),
+        checkbox: !!input && input.type === 'checkbox',
+        checked: !!input && input.checked,
+    };
+}).filter(item => item.checkbox && item.text)
+"""
+
+# 批量点击指定序号的标签
+CLICK_LABELS_JS = """
+(indices) => {
+    const labels = document.querySelectorAll('label');
+    indices.forEach(i => labels[i] && labels[i].click());
+    return indices.length;
+}
+"""
+
+
+def normalize(text):
+    """规范化标签文本：大小写折叠、去掉标点、合并空白"""
+    return " ".join(re.findall(r"\w+", text.casefold()))
+
+
+def parse_aliases(value):
+    """解析类别别名，如"Short=Short Film|Short Subject;Doc=Documentary" """
+    aliases = {}
+    for item in (value or "").split(";"):
+        if "=" not in item:
+            continue
+        name, targets = item.split("=", 1)
+        aliases[normalize(name)] = [normalize(t) for t in targets.split("|") if t.strip()]
+    return aliases
+
+
+class CategoryMatcher:
+    """类别匹配器
+
+    匹配顺序：规范化后完全相同(1.0) > 别名完全相同(0.95) > 标签以类别的词开头(0.9~0.99)
+    > 类别的所有词出现在标签其他位置(0.8~0.89) > 模糊相似度，最终置信度不低于 threshold 才算匹配。
+
+    以类别开头的标签优先于只包含类别的标签，即使后者更短：
+
+    >>> labels = [
+    ...     {"index": 0, "text": "Documentary Short", "checkbox": True, "checked": False},
+    ...     {"index": 1, "text": "Short Film (under 40 min)", "checkbox": True, "checked": False},
+    ... ]
+    >>> [m["label"] for m in CategoryMatcher(["Short"]).match(labels)[0]]
+    ['Short Film (under 40 min)']
+    >>> [m["label"] for m in CategoryMatcher(["Documentary"]).match(labels)[0]]
+    ['Documentary Short']
+    """
+
+    def __init__(self, categories, aliases=None, threshold=0.75):
+        self.categories = [c.strip() for c in categories if c.strip()]
+        self.aliases = aliases or {}
+        self.threshold = threshold
+
+    def _build_index(self, labels):
+        """为标签建立规范化文本表和词索引"""
+        normalized = {}
+        tokens = {}
+        for label in labels:
+            text = normalize(label["text"])
+            normalized[label["index"]] = text
+            for token in text.split():
+                tokens.setdefault(token, set()).add(label["index"])
+        return normalized, tokens
+
+    def _score(self, label_text, normalized_names):
+        """计算一个类别与一个标签的置信度"""
+        if label_text in normalized_names[:1]:
+            return 1.0
+        if label_text in normalized_names[1:]:
+            return 0.95
+
+        best = 0.0
+        label_tokens = label_text.split()
+        for name in normalized_names:
+            name_tokens = name.split()
+            # 类别的所有词都出现在标签中，如 "Short" -> "Short Film (under 40 min)"；
+            # 标签以类别开头时得分更高，"Short" 选 "Short Film" 而不是更短的 "Documentary Short"
+            if name_tokens and all(t in label_tokens for t in name_tokens):
+                coverage = 0.09 * len(name_tokens) / len(label_tokens)
+                starts = label_tokens[:len(name_tokens)] == name_tokens
+                best = max(best, (0.9 if starts else 0.8) + coverage)
+            # 与标签整体及同样长度的开头部分做模糊比较，容忍拼写和单复数差异
+            prefix = " ".join(label_tokens[:len(name_tokens)])
+            ratio = max(SequenceMatcher(None, name, label_text).ratio(), SequenceMatcher(None, name, prefix).ratio())
+            best = max(best, ratio * 0.9)
+        return best
+
+    def match(self, labels):
+        """匹配所有类别，返回 (匹配列表, 未匹配类别列表)
+
+        匹配列表的元素为 {category, index, label, confidence}。
+        """
+        normalized, tokens = self._build_index(labels)
+        texts = {label["index"]: label["text"] for label in labels}
+
+        matches = []
+        misses = []
+        for category in self.categories:
+            names = [normalize(category)] + self.aliases.get(normalize(category), [])
+
+            # 先用词索引缩小范围，没有共同词时再对所有标签做模糊比较
+            candidates = set()
+            for name in names:
+                for token in name.split():
+                    candidates |= tokens.get(token, set())
+            candidates = candidates or set(normalized)
+
+            scored = [(self._score(normalized[idx], names), -idx) for idx in candidates]
+            if not scored:
+                misses.append(category)
+                continue
+            confidence, neg_idx = max(scored)
+            if confidence >= self.threshold:
+                matches.append({
+                    "category": category,
+                    "index": -neg_idx,
+                    "label": texts[-neg_idx],
+                    "confidence": round(confidence, 2),
+                })
+            else:
+                misses.append(category)
+        return matches, misses
+
+    def plan(self, labels):
+        """根据页面上的标签（COLLECT_LABELS_JS 的结果）规划要点击的标签，返回 (标签序号列表, 匹配列表, 未匹配类别列表)"""
+        if not self.categories:
+            return [], [], []
+        matches, misses = self.match(labels)
+
+        # 已勾选的不再点击，避免反向取消
+        checked = {label["index"] for label in labels if label["checked"]}
+        to_click = sorted({m["index"] for m in matches} - checked)
+
+        for m in matches:
+            logger.info(f"类别匹配: {m['category']} -> {m['label']} (置信度 {m['confidence']})")
+        if misses:
+            logger.info(f"未匹配的类别: {', '.join(misses)}（共 {len(labels)} 个可选类别）")
+        return to_click, matches, misses
+
+    def apply(self, page):
+        """读取页面上的类别标签，勾选所有匹配项，返回 (匹配列表, 未匹配类别列表)"""
+        if not self.categories:
+            return [], []
+
+        to_click, matches, misses = self.plan(page.evaluate(COLLECT_LABELS_JS))
+        if to_click:
+            page.evaluate(CLICK_LABELS_JS, to_click)
+        return matches, misses
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 统一命令行入口
+子命令在真正需要时才导入Playwright、loguru、PyQt6等较重的依赖，
+status、report 等只读命令只依赖标准库，可以快速启动
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+from paths import CATALOG_FILE, PLAN_FILE, QUOTA_FILE, SCHEDULER_STATE_FILE
+
+# 只读命令不应导入的重量级模块
+HEAVY_MODULES = ("playwright", "loguru", "PyQt6", "dotenv")
+
+# 只读命令的启动耗时上限(毫秒)
+STARTUP_BUDGET_MS = 100
+
+# 启动耗时探针：在子进程中执行命令，输出耗时和已导入的重量级模块
+STARTUP_PROBE = """
+import contextlib, io, sys, time
+start = time.perf_counter()
+import cli
+with contextlib.redirect_stdout(io.StringIO()):
+    cli.main({argv!r})
+elapsed = (time.perf_counter() - start) * 1000
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def _read_json(path, default):
+    """读取JSON状态文件，不存在或损坏时返回默认值"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _catalog_counts():
+    """目录中的电影节总数和已投递数量"""
+    if not os.path.exists(CATALOG_FILE):
+        return 0, 0
+    import sqlite3
+    conn = sqlite3.connect(CATALOG_FILE)
+    try:
+        return conn.execute("SELECT COUNT(*), COUNT(submitted_at) FROM festivals").fetchone()
+    except sqlite3.Error:
+        return 0, 0
+    finally:
+        conn.close()
+
+
+def cmd_run(args):
+    """运行投递：默认以定时任务方式常驻，--once 只运行一次"""
+    if args.gui:
+        import gui
+        gui.main()
+        return 0
+    if args.simple:
+        import simple_submit
+        simple_submit.main()
+        return 0
+
+    from config import ConfigError, reload_settings
+    import filmfreeway_auto_submit
+    try:
+        if args.record or args.replay is not None:
+            # 命令行参数等同于设置 HAR_MODE / HAR_PATH 环境变量，优先级最高
+            os.environ["HAR_MODE"] = "record" if args.record else "replay"
+            if args.replay:
+                os.environ["HAR_PATH"] = args.replay
+        if args.profiler:
+            os.environ["PROFILE_MODE"] = args.profiler
+        if args.query is not None:
+            os.environ["CATALOG_QUERY"] = args.query
+        if args.record or args.replay is not None or args.profiler or args.query is not None:
+            reload_settings()
+        if args.once:
+            filmfreeway_auto_submit.setup_logging()
+            submitted = filmfreeway_auto_submit.run_daily_submission(quota=args.limit)
+            print(f"本次成功投递 {submitted} 个电影节")
+            return 0
+    except ConfigError as e:
+        print(f"配置错误: {str(e)}", file=sys.stderr)
+        return 2
+
+    filmfreeway_auto_submit.main()
+    return 0
+
+
+def cmd_crawl(args):
+    """抓取电影节目录，不投递"""
+    import filmfreeway_auto_submit
+    filmfreeway_auto_submit.setup_logging()
+
+    submitter = filmfreeway_auto_submit.FilmFreewaySubmitter()
+    if args.full:
+        submitter.discovery_full_crawl = True
+    if args.max_pages:
+        submitter.discovery_max_pages = args.max_pages
+
+    if args.workers > 1:
+        # 多进程分片抓取整个目录
+        from crawler import ShardedCrawler
+        found = ShardedCrawler(submitter, workers=args.workers, pages_per_task=args.pages_per_task).run()
+    else:
+        found = submitter.crawl()
+    print(f"写入 {found} 个电影节，目录共 {submitter.catalog.count()} 个")
+    return 0
+
+
+def cmd_status(args):
+    """显示调度、配额、计划和目录状态"""
+    today = date.today().isoformat()
+    scheduler_state = _read_json(SCHEDULER_STATE_FILE, {})
+    quota = _read_json(QUOTA_FILE, {})
+    plan = _read_json(PLAN_FILE, {"days": {}, "targets": {}})
+    catalog_total, catalog_submitted = _catalog_counts()
+
+    day_state = scheduler_state.get("days", {}).get(today, {})
+    status = {
+        "next_run": scheduler_state.get("next_run"),
+        "last_run": scheduler_state.get("last_run"),
+        "completed_today": day_state.get("completed", []),
+        "quota_used_today": {k.rsplit("|", 1)[0]: v for k, v in quota.items() if k.endswith(f"|{today}")},
+        "planned_today": len(plan.get("days", {}).get(today, [])),
+        "planned_total": sum(len(v) for v in plan.get("days", {}).values()),
+        "catalog_total": catalog_total,
+        "catalog_submitted": catalog_submitted,
+    }
+
+    if args.json:
+        print(json.dumps(status, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"下一次运行: {status['next_run'] or '未在运行'}")
+    print(f"上一次运行: {status['last_run'] or '无'}")
+    print(f"今日已完成窗口: {', '.join(status['completed_today']) or '无'}")
+    if status["quota_used_today"]:
+        for key, used in status["quota_used_today"].items():
+            print(f"今日已投递 ({key}): {used}")
+    else:
+        print("今日已投递: 0")
+    print(f"投递计划: 今日 {status['planned_today']} 个，共 {status['planned_total']} 个待投递")
+    print(f"电影节目录: {status['catalog_total']} 个，已投递 {status['catalog_submitted']} 个")
+    return 0
+
+
+def cmd_projects(args):
+    """列出账户中的项目"""
+    import filmfreeway_auto_submit
+    filmfreeway_auto_submit.setup_logging()
+
+    projects = filmfreeway_auto_submit.FilmFreewaySubmitter(require_project=False).get_projects()
+    if args.json:
+        print(json.dumps(projects, ensure_ascii=False, indent=2))
+    else:
+        for project in projects:
+            print(f"{project['id']}\t{project['name']}")
+    return 0
+
+
+def cmd_search(args):
+    """在本地电影节目录中全文查询，如 documentary AND Europe"""
+    if not os.path.exists(CATALOG_FILE):
+        print("电影节目录为空，请先运行 crawl 抓取目录", file=sys.stderr)
+        return 1
+    import time
+    from catalog import FestivalCatalog
+
+    catalog = FestivalCatalog()
+    started = time.perf_counter()
+    try:
+        slugs = catalog.match_slugs(args.query)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    if args.pending:
+        rows = catalog.summaries(slugs)
+        festivals = [rows[slug] for slug in slugs if slug in rows and not rows[slug]["submitted_at"]]
+        total = len(festivals)
+        festivals = festivals[:args.limit]
+    else:
+        total = len(slugs)
+        rows = catalog.summaries(slugs[:args.limit])
+        festivals = [rows[slug] for slug in slugs[:args.limit] if slug in rows]
+    elapsed = (time.perf_counter() - started) * 1000
+    catalog.close()
+
+    if args.json:
+        print(json.dumps({"query": args.query, "total": total, "festivals": festivals}, ensure_ascii=False, indent=2))
+        return 0
+    for festival in festivals:
+        fee = f"${festival['fee']:.2f}" if festival["fee"] else "免费"
+        submitted = "已投递" if festival["submitted_at"] else ""
+        print(f"{festival['slug']}\t{festival['name']}\t{fee}\t{festival['deadline'] or '-'}\t"
+              f"{festival['location'] or '-'}\t{submitted}".rstrip())
+    print(f"匹配 {total} 个电影节，显示 {len(festivals)} 个（{'全文索引' if catalog.fts else '关键词匹配'}，{elapsed:.1f} ms）")
+    return 0
+
+
+def cmd_report(args):
+    """按日期汇总投递数量和未来的投递计划，以及最近几次运行的趋势"""
+    quota = _read_json(QUOTA_FILE, {})
+    plan = _read_json(PLAN_FILE, {"days": {}, "targets": {}})
+
+    daily = {}
+    for key, used in quota.items():
+        day = key.rsplit("|", 1)[-1]
+        daily[day] = daily.get(day, 0) + used
+
+    print("日期\t\t已投递")
+    for day in sorted(daily)[-args.days:]:
+        print(f"{day}\t{daily[day]}")
+
+    print("\n日期\t\t计划投递")
+    for day, slugs in sorted(plan.get("days", {}).items())[:args.days]:
+        print(f"{day}\t{len(slugs)}")
+
+    # 最近几次运行的趋势：结果分类和各阶段耗时
+    from report import load_summaries, trend_tables
+    summaries = load_summaries(limit=args.runs)
+    if summaries:
+        for header, rows in trend_tables(summaries):
+            print()
+            print("\t".join(header))
+            for row in rows:
+                print("\t".join(str(value) for value in row))
+    return 0
+
+
+def cmd_bench(args):
+    """测量只读命令的启动耗时，--check 时超出预算或导入了重量级模块返回非零退出码"""
+    import statistics
+    import subprocess
+
+    failed = False
+    for argv in (["status"], ["report"]):
+        probe = STARTUP_PROBE.format(argv=argv, heavy=HEAVY_MODULES)
+        timings = []
+        heavy = ""
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, "-c", probe],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            timings.append(float(output[0]))
+            heavy = output[1] if len(output) > 1 else ""
+
+        median = statistics.median(timings)
+        ok = median < STARTUP_BUDGET_MS and not heavy
+        failed = failed or not ok
+        print(f"{' '.join(argv):<10} 中位数 {median:6.1f} ms  最大 {max(timings):6.1f} ms  "
+              f"重量级模块: {heavy or '无'}  {'通过' if ok else '超出预算'}")
+
+    return 1 if args.check and failed else 0
+
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="cli.py", description="FilmFreeway自动投递工具")
+    parser.add_argument("--profile", help="使用配置文件中的 profile（项目/账号）")
+    parser.add_argument("--config", help="配置文件路径（TOML 或 YAML）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="运行投递（默认按定时任务常驻）")
+    run.add_argument("--once", action="store_true", help="只运行一次")
+    run.add_argument("--limit", type=int, help="本次最多投递数量（仅 --once）")
+    run.add_argument("--simple", action="store_true", help="运行简易版（手动登录）")
+    run.add_argument("--gui", action="store_true", help="启动图形界面")
+    run.add_argument("--query", metavar="QUERY", help="只投递目录中匹配全文查询的电影节，如 \"documentary AND Europe\"")
+    run.add_argument("--profiler", choices=("cprofile", "sample"), help="分析本次运行的性能，结果写在运行报告旁边")
+    har = run.add_mutually_exclusive_group()
+    har.add_argument("--record", action="store_true", help="把本次运行的网络请求录制为HAR")
+    har.add_argument("--replay", nargs="?", const="", metavar="DIR", help="从HAR录制回放，不访问网络（默认最近一次录制）")
+    run.set_defaults(func=cmd_run)
+
+    crawl = subparsers.add_parser("crawl", help="抓取电影节目录，不投递")
+    crawl.add_argument("--full", action="store_true", help="忽略水位线，完整抓取")
+    crawl.add_argument("--max-pages", type=int, help="最多翻页数")
+    crawl.add_argument("--workers", type=int, default=1, help="并行抓取的工作进程数，大于1时按页码分片抓取整个目录")
+    crawl.add_argument("--pages-per-task", type=int, default=5, help="每个分片包含的页数")
+    crawl.set_defaults(func=cmd_crawl)
+
+    status = subparsers.add_parser("status", help="显示运行状态")
+    status.add_argument("--json", action="store_true", help="以JSON格式输出")
+    status.set_defaults(func=cmd_status)
+
+    projects = subparsers.add_parser("projects", help="列出账户中的项目")
+    projects.add_argument("--json", action="store_true", help="以JSON格式输出")
+    projects.set_defaults(func=cmd_projects)
+
+    search = subparsers.add_parser("search", help="在本地电影节目录中全文查询")
+    search.add_argument("query", help="查询，支持 AND、OR、NOT（short NOT horror、NOT horror NOT thriller）、括号、引号短语、前缀* 和 location: 等列前缀")
+    search.add_argument("--limit", type=int, default=50, help="最多显示的数量")
+    search.add_argument("--pending", action="store_true", help="只显示尚未投递的电影节")
+    search.add_argument("--json", action="store_true", help="以JSON格式输出")
+    search.set_defaults(func=cmd_search)
+
+    report = subparsers.add_parser("report", help="汇总投递记录和计划")
+    report.add_argument("--days", type=int, default=14, help="显示的天数")
+    report.add_argument("--runs", type=int, default=10, help="趋势表显示的最近运行次数")
+    report.set_defaults(func=cmd_report)
+
+    bench = subparsers.add_parser("bench", help="测量只读命令的启动耗时")
+    bench.add_argument("--repeat", type=int, default=5, help="重复次数")
+    bench.add_argument("--check", action="store_true", help="超出预算时返回非零退出码")
+    bench.set_defaults(func=cmd_bench)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行主函数"""
+    args = build_parser().parse_args(argv)
+    if args.profile or args.config:
+        # 只在指定时才导入配置模块，只读命令保持快速启动
+        from config import ConfigError, configure
+        try:
+            configure(profile=args.profile, config_file=args.config)
+        except ConfigError as e:
+            print(f"配置错误: {str(e)}", file=sys.stderr)
+            return 2
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
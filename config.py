@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 配置
+所有入口共用的配置对象：从 .env、YAML/TOML 配置文件和环境变量解析一次并校验类型，
+配置文件支持多个 profile（多项目、多账号），长时间运行的进程可以监视文件变化并热加载
+"""
+
+import os
+import threading
+from loguru import logger
+
+from scheduler import CATCHUP_POLICIES, parse_run_times
+
+# .env 文件位置
+ENV_FILE = ".env"
+
+# 未通过 CONFIG_FILE 指定时依次查找的配置文件
+CONFIG_FILES = ("config.toml", "config.yaml", "config.yml")
+
+# 配置项：(属性名, 环境变量名, 类型, 默认值)
+# 配置文件中的键可以使用属性名或环境变量名
+FIELDS = (
+    ("email", "FF_EMAIL", "str", ""),
+    ("password", "FF_PASSWORD", "str", ""),
+    ("login_method", "LOGIN_METHOD", ("email", "google"), "email"),
+    ("project_id", "PROJECT_ID", "str", ""),
+    ("max_submissions", "MAX_SUBMISSION_PER_DAY", "int", 5),
+    ("max_fee", "MAX_ENTRY_FEE", "float", 0.0),
+    ("categories", "CATEGORIES", "list", "Short,Documentary"),
+    ("category_aliases", "CATEGORY_ALIASES", "str", ""),
+    ("category_match_threshold", "CATEGORY_MATCH_THRESHOLD", "float", 0.75),
+    ("rank_weights", "RANK_WEIGHTS", "str", ""),
+    ("preferred_festivals", "PREFERRED_FESTIVALS", "list", ""),
+    ("rank_pool_size", "RANK_POOL_SIZE", "int", 0),
+    ("discovery_max_pages", "DISCOVERY_MAX_PAGES", "int", 50),
+    ("discovery_full_crawl", "DISCOVERY_FULL_CRAWL", "bool", False),
+    ("catalog_query", "CATALOG_QUERY", "str", ""),
+    ("plan_horizon_days", "PLAN_HORIZON_DAYS", "int", 28),
+    ("run_times", "RUN_TIMES", "times", "10:00"),
+    ("catchup_policy", "CATCHUP_POLICY", CATCHUP_POLICIES, "latest"),
+    ("control_port", "CONTROL_PORT", "int", 0),
+    ("headless", "HEADLESS", "bool", False),
+    ("recycle_every", "RECYCLE_EVERY", "int", 20),
+    ("recycle_memory_mb", "RECYCLE_MEMORY_MB", "int", 1500),
+    ("watchdog_enabled", "WATCHDOG_ENABLED", "bool", True),
+    ("watchdog_max_rss_mb", "WATCHDOG_MAX_RSS_MB", "int", 3000),
+    ("watchdog_max_cpu", "WATCHDOG_MAX_CPU", "int", 0),
+    ("watchdog_hang_seconds", "WATCHDOG_HANG_SECONDS", "int", 180),
+    ("prefetch_count", "PREFETCH_COUNT", "int", 2),
+    ("batch_form_steps", "BATCH_FORM_STEPS", "bool", True),
+    ("asset_cache_mb", "ASSET_CACHE_MB", "int", 200),
+    ("project_cache_hours", "PROJECT_CACHE_HOURS", "int", 12),
+    ("festival_budget_seconds", "FESTIVAL_BUDGET_SECONDS", "int", 120),
+    ("festival_budget_min_seconds", "FESTIVAL_BUDGET_MIN_SECONDS", "int", 30),
+    ("profile_mode", "PROFILE_MODE", ("off", "cprofile", "sample"), "off"),
+    ("profile_interval_ms", "PROFILE_INTERVAL_MS", "int", 10),
+    ("har_mode", "HAR_MODE", ("off", "record", "replay"), "off"),
+    ("har_path", "HAR_PATH", "str", ""),
+    ("replay_latency_ms", "REPLAY_LATENCY_MS", "int", 0),
+    ("replay_jitter_ms", "REPLAY_JITTER_MS", "int", 0),
+    ("use_installed_browser", "USE_INSTALLED_BROWSER", "bool", True),
+    ("chrome_user_data_dir", "CHROME_USER_DATA_DIR", "str", ""),
+)
+
+# 旧版本使用的配置名
+LEGACY_KEYS = {"RUN_TIME": "RUN_TIMES"}
+
+# 修改后需要重新启动浏览器才能生效的配置
+BROWSER_FIELDS = ("headless", "use_installed_browser", "chrome_user_data_dir", "login_method", "email", "password")
+
+
+class ConfigError(Exception):
+    """配置缺失或取值无效"""
+
+
+def _convert(name, kind, value):
+    """把配置值转换为声明的类型，无效时抛出 ConfigError"""
+    if isinstance(value, str):
+        value = value.strip()
+    try:
+        if isinstance(kind, tuple):
+            if value not in kind:
+                raise ValueError(f"可选: {', '.join(kind)}")
+            return value
+        if kind == "str":
+            return "" if value is None else str(value)
+        if kind == "int":
+            value = int(value)
+            if value < 0:
+                raise ValueError("不能为负数")
+            return value
+        if kind == "float":
+            value = float(value)
+            if value < 0:
+                raise ValueError("不能为负数")
+            return value
+        if kind == "bool":
+            if isinstance(value, bool):
+                return value
+            if str(value).lower() in ("true", "1", "yes", "on"):
+                return True
+            if str(value).lower() in ("false", "0", "no", "off", ""):
+                return False
+            raise ValueError("应为 True 或 False")
+        if kind == "list":
+            items = value if isinstance(value, list) else str(value).split(",")
+            return [str(item).strip() for item in items if str(item).strip()]
+        if kind == "times":
+            if isinstance(value, list):
+                value = ",".join(str(item) for item in value)
+            return parse_run_times(str(value))
+    except (TypeError, ValueError) as e:
+        raise ConfigError(f"配置项 {name} 的值无效: {value!r} ({str(e)})")
+    raise ConfigError(f"未知的配置类型: {kind}")
+
+
+def _read_config_file(path):
+    """读取 TOML 或 YAML 配置文件，返回字典"""
+    try:
+        if path.endswith(".toml"):
+            try:
+                import tomllib
+            except ImportError:
+                import tomli as tomllib
+            with open(path, "rb") as f:
+                return tomllib.load(f)
+
+        try:
+            import yaml
+        except ImportError:
+            raise ConfigError(f"读取 {path} 需要安装 PyYAML")
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except ConfigError:
+        raise
+    except Exception as e:
+        raise ConfigError(f"无法解析配置文件 {path}: {str(e)}")
+
+
+def _normalize_keys(values):
+    """把配置文件中的键统一为环境变量名"""
+    by_attr = {attr: env for attr, env, _, _ in FIELDS}
+    normalized = {}
+    for key, value in values.items():
+        if key == "profiles":
+            continue
+        key = LEGACY_KEYS.get(key, key)
+        env_key = by_attr.get(key, key)
+        if env_key not in by_attr.values():
+            raise ConfigError(f"未知的配置项: {key}")
+        normalized[env_key] = value
+    return normalized
+
+
+def find_config_file():
+    """查找配置文件：CONFIG_FILE 环境变量，或当前目录下的 config.toml/config.yaml"""
+    path = os.environ.get("CONFIG_FILE")
+    if path:
+        if not os.path.exists(path):
+            raise ConfigError(f"配置文件不存在: {path}")
+        return path
+    for path in CONFIG_FILES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class Settings:
+    """校验后的配置
+
+    每个配置项都是同名属性。合并顺序（后者覆盖前者）：默认值、.env、配置文件顶层、
+    所选 profile、进程环境变量。profile 由参数、FF_PROFILE 环境变量或配置文件中的 profile 键指定。
+    """
+
+    def __init__(self, values, profile=None, sources=()):
+        for attr, env_key, kind, default in FIELDS:
+            setattr(self, attr, _convert(env_key, kind, values.get(env_key, default)))
+        self.profile = profile
+        self.sources = tuple(sources)
+
+    @classmethod
+    def load(cls, profile=None, config_file=None, env_file=ENV_FILE):
+        """从所有配置来源解析一次配置"""
+        from dotenv import dotenv_values
+
+        sources = []
+        values = {}
+        if env_file and os.path.exists(env_file):
+            sources.append(env_file)
+            env_values = {k: v for k, v in dotenv_values(env_file).items() if v is not None}
+            values.update(_normalize_env(env_values))
+
+        config_file = config_file or find_config_file()
+        profiles = {}
+        if config_file:
+            sources.append(config_file)
+            data = _read_config_file(config_file)
+            if not isinstance(data, dict):
+                raise ConfigError(f"配置文件 {config_file} 的顶层应为键值表")
+            file_profile = data.pop("profile", None)
+            profile = profile or os.environ.get("FF_PROFILE") or file_profile
+            profiles = data.get("profiles") or {}
+            values.update(_normalize_keys(data))
+
+        profile = profile or os.environ.get("FF_PROFILE")
+        if profile:
+            if profile not in profiles:
+                raise ConfigError(f"配置文件中没有名为 {profile} 的 profile")
+            values.update(_normalize_keys(profiles[profile]))
+
+        values.update(_normalize_env({k: v for k, v in os.environ.items() if k in _ENV_KEYS}))
+        return cls(values, profile=profile, sources=sources)
+
+    def validate(self, require_project=True):
+        """检查自动投递必需的配置，缺失时抛出 ConfigError；获取项目列表时不要求 PROJECT_ID"""
+        if self.login_method == "email" and not (self.email and self.password) and not self.use_installed_browser:
+            raise ConfigError("请检查配置，确保设置了FF_EMAIL, FF_PASSWORD")
+        if require_project and not self.project_id:
+            raise ConfigError("请检查配置，确保设置了PROJECT_ID")
+        if self.catalog_query:
+            # 查询在启动时检查，不要等到运行中发现阶段结束后才出错
+            from catalog import check_query
+            try:
+                check_query(self.catalog_query)
+            except ValueError as e:
+                raise ConfigError(f"CATALOG_QUERY 无效: {str(e)}")
+        if self.rank_weights:
+            from ranking import parse_weights
+            try:
+                parse_weights(self.rank_weights)
+            except ValueError as e:
+                raise ConfigError(f"RANK_WEIGHTS 无效: {str(e)}")
+        return self
+
+    def changed_fields(self, other):
+        """与另一份配置相比取值不同的配置项"""
+        return [attr for attr, _, _, _ in FIELDS if getattr(self, attr) != getattr(other, attr)]
+
+    def to_dict(self):
+        """以属性名为键导出配置，密码不导出"""
+        return {attr: getattr(self, attr) for attr, _, _, _ in FIELDS if attr != "password"}
+
+
+# 所有可从环境变量读取的配置名（包括旧名称）
+_ENV_KEYS = {env_key for _, env_key, _, _ in FIELDS} | set(LEGACY_KEYS)
+
+
+def _normalize_env(values):
+    """把旧的环境变量名映射为新名称，新名称优先"""
+    normalized = {}
+    for key, value in values.items():
+        if key in LEGACY_KEYS:
+            normalized.setdefault(LEGACY_KEYS[key], value)
+        elif key in _ENV_KEYS:
+            normalized[key] = value
+    return normalized
+
+
+# 进程内共享的配置及其加载参数
+_settings = None
+_options = {"profile": None, "config_file": None}
+_lock = threading.Lock()
+
+
+def configure(profile=None, config_file=None):
+    """指定之后加载配置使用的 profile 和配置文件，并立即重新加载；无效时保持原设置"""
+    global _settings
+    settings = Settings.load(profile=profile, config_file=config_file)
+    with _lock:
+        _options.update(profile=profile, config_file=config_file)
+        _settings = settings
+    return settings
+
+
+def get_settings():
+    """返回进程内共享的配置，第一次调用时解析"""
+    global _settings
+    with _lock:
+        if _settings is None:
+            _settings = Settings.load(**_options)
+        return _settings
+
+
+def reload_settings():
+    """重新解析配置并替换共享的配置对象，解析失败时保留原配置并抛出 ConfigError"""
+    global _settings
+    settings = Settings.load(**_options)
+    with _lock:
+        _settings = settings
+    return settings
+
+
+class ConfigWatcher(threading.Thread):
+    """配置文件监视线程
+
+    定期检查 .env 和配置文件的修改时间，变化后重新加载共享配置并调用 on_change(settings, changed)。
+    新配置无效时记录错误并继续使用原配置。
+    """
+
+    def __init__(self, on_change=None, interval=5):
+        super().__init__(name="config-watcher", daemon=True)
+        self.on_change = on_change
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self._mtimes = self._snapshot()
+
+    def _snapshot(self):
+        """当前所有配置来源的修改时间"""
+        paths = [ENV_FILE, _options["config_file"] or os.environ.get("CONFIG_FILE")] + list(CONFIG_FILES)
+        mtimes = {}
+        for path in filter(None, paths):
+            try:
+                mtimes[path] = os.path.getmtime(path)
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+
+    def check(self):
+        """配置文件有变化时重新加载，返回新配置；没有变化或新配置无效时返回 None"""
+        mtimes = self._snapshot()
+        if mtimes == self._mtimes:
+            return None
+        self._mtimes = mtimes
+
+        previous = get_settings()
+        try:
+            settings = reload_settings()
+        except ConfigError as e:
+            logger.error(f"配置文件已修改但无效，继续使用原配置: {str(e)}")
+            return None
+
+        changed = settings.changed_fields(previous)
+        if changed:
+            logger.info(f"配置已重新加载，变更: {', '.join(changed)}")
+            if self.on_change:
+                try:
+                    self.on_change(settings, changed)
+                except Exception as e:
+                    logger.error(f"应用新配置时出错: {str(e)}")
+        return settings
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        """停止监视"""
+        self.stop_event.set()
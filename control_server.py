@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 本地控制接口
+守护进程设置 CONTROL_PORT 后在 127.0.0.1 上提供一个 HTTP 接口：查看调度状态、下一次运行时间、
+当前运行的进度和剩余配额，导出 Prometheus 指标，以及立即运行或取消当前运行。
+接口在自己的线程中处理请求；指标由进度事件的订阅回调累计，回调只做计数，不会拖慢投递循环
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loguru import logger
+
+from config import get_settings
+from events import FAILED, RUN_FINISHED, RUN_STARTED, SKIPPED, SubmissionResult
+from quota import QuotaStore
+
+# 只监听本机
+CONTROL_HOST = "127.0.0.1"
+
+# 指标名称前缀
+METRIC_PREFIX = "filmfreeway"
+
+
+def _label(value):
+    """Prometheus 标签值的转义"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ControlServer:
+    """调度守护进程的本地控制接口
+
+    attach(submitter) 在每次运行开始前调用，订阅该运行的进度事件；detach() 在运行结束后调用。
+    """
+
+    def __init__(self, scheduler, port, host=CONTROL_HOST):
+        self.scheduler = scheduler
+        self.port = port
+        self.host = host
+        self.quota = QuotaStore()
+        self.started = time.time()
+
+        self._server = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self.submitter = None
+        self._unsubscribe = None
+
+        # 当前（或最近一次）运行的进度
+        self.live = None
+        self.run_started = None
+        self.run_max_submissions = None
+        self.current_festival = None
+
+        # 累计指标：事件计数、跳过原因、失败结果、各步骤耗时
+        self.runs = 0
+        self.events = {}
+        self.skipped = {}
+        self.failed = {}
+        self.stage_seconds = {}
+        self.stage_count = {}
+
+    def start(self):
+        """在后台线程中启动接口，端口被占用等错误只记录日志，不影响调度"""
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self))
+        except (OSError, OverflowError) as e:
+            logger.error(f"本地控制接口启动失败 ({self.host}:{self.port}): {str(e)}")
+            return False
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="control-server", daemon=True)
+        self._thread.start()
+        logger.info(f"本地控制接口已启动: http://{self.host}:{self.port}/status")
+        return True
+
+    def stop(self):
+        """停止接口"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def attach(self, submitter):
+        """订阅一次运行的进度事件"""
+        self.detach()
+        self.submitter = submitter
+        self._unsubscribe = submitter.subscribe(self.record)
+
+    def detach(self):
+        """取消订阅"""
+        if self._unsubscribe:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self.submitter = None
+
+    def record(self, event):
+        """订阅回调：在投递线程中调用，只更新计数"""
+        with self._lock:
+            kind = event.kind
+            self.events[kind] = self.events.get(kind, 0) + 1
+            if kind == RUN_STARTED:
+                self.runs += 1
+                self.live = SubmissionResult(event.data.get("run_id"))
+                self.run_started = event.ts
+                self.run_max_submissions = event.data.get("max_submissions")
+                self.current_festival = None
+            elif kind == RUN_FINISHED:
+                self.current_festival = None
+            elif kind == SKIPPED:
+                self.skipped[event.reason] = self.skipped.get(event.reason, 0) + 1
+            elif kind == FAILED:
+                self.failed[event.outcome] = self.failed.get(event.outcome, 0) + 1
+
+            if event.stage and event.duration is not None:
+                self.stage_seconds[event.stage] = self.stage_seconds.get(event.stage, 0.0) + event.duration
+                self.stage_count[event.stage] = self.stage_count.get(event.stage, 0) + 1
+            if event.festival and event.stage not in (None, "filter"):
+                self.current_festival = event.festival
+            if self.live is not None:
+                self.live.add(event)
+
+    def quota_remaining(self):
+        """当前账户和项目今天剩余的配额"""
+        settings = get_settings()
+        return self.quota.remaining(settings.email, settings.project_id, settings.max_submissions)
+
+    def status(self):
+        """状态：调度、当前运行的进度和剩余配额"""
+        running = bool(self.submitter and self.submitter.running)
+        with self._lock:
+            live = self.live.to_dict() if self.live else None
+            if live:
+                live["started"] = self.run_started
+                live["max_submissions"] = self.run_max_submissions
+                live["current_festival"] = self.current_festival if running else None
+        return {
+            "scheduler": self.scheduler.status(),
+            "running": running,
+            "run": live,
+            "quota_remaining": self.quota_remaining(),
+        }
+
+    def metrics(self):
+        """Prometheus 文本格式的指标"""
+        status = self.scheduler.status()
+        running = bool(self.submitter and self.submitter.running)
+        next_run = datetime.fromisoformat(status["next_run"]).timestamp() if status["next_run"] else 0
+        last_run = datetime.fromisoformat(status["last_run"]).timestamp() if status["last_run"] else 0
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{METRIC_PREFIX}_{name} {value}")
+
+        with self._lock:
+            live = self.live
+            metric("up_seconds", "gauge", "Seconds since the daemon started", [({}, round(time.time() - self.started, 1))])
+            metric("run_active", "gauge", "Whether a run is in progress", [({}, int(running))])
+            metric("runs_total", "counter", "Runs started", [({}, self.runs)])
+            metric("events_total", "counter", "Progress events by kind",
+                   [({"kind": k}, v) for k, v in sorted(self.events.items())])
+            metric("skipped_total", "counter", "Skipped festivals by reason",
+                   [({"reason": k or "unknown"}, v) for k, v in sorted(self.skipped.items(), key=lambda i: str(i[0]))])
+            metric("failed_total", "counter", "Failed festivals by outcome",
+                   [({"outcome": k or "unknown"}, v) for k, v in sorted(self.failed.items(), key=lambda i: str(i[0]))])
+            # 各步骤耗时按 summary 导出（只有 _sum 和 _count）
+            lines.append(f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each stage")
+            lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds summary")
+            for stage, seconds in sorted(self.stage_seconds.items()):
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{_label(stage)}"}} {round(seconds, 3)}')
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{_label(stage)}"}} {self.stage_count[stage]}')
+            if live:
+                metric("run_submitted", "gauge", "Festivals submitted in the current or last run", [({}, live.submitted)])
+                metric("run_discovered", "gauge", "Festivals discovered in the current or last run", [({}, live.discovered)])
+                metric("run_qualified", "gauge", "Festivals qualified in the current or last run", [({}, live.qualified)])
+
+        metric("submitted_today", "gauge", "Festivals submitted by the scheduler today", [({}, status["submitted_today"])])
+        metric("quota_remaining", "gauge", "Remaining daily quota", [({}, self.quota_remaining())])
+        metric("next_run_timestamp_seconds", "gauge", "Next scheduled run (unix time, 0 when none)", [({}, int(next_run))])
+        metric("last_run_timestamp_seconds", "gauge", "Last run (unix time, 0 when none)", [({}, int(last_run))])
+        return "\n".join(lines) + "\n"
+
+    def trigger(self):
+        """请求立即运行一次"""
+        queued = self.scheduler.running
+        self.scheduler.trigger()
+        logger.info("本地控制接口: 请求立即运行" + ("（当前运行结束后开始）" if queued else ""))
+        return {"accepted": True, "queued": queued}
+
+    def cancel(self):
+        """取消当前运行，当前电影节处理完后停止"""
+        submitter = self.submitter
+        cancelled = bool(submitter and submitter.request_cancel())
+        if cancelled:
+            logger.info("本地控制接口: 请求取消当前运行")
+        return {"accepted": cancelled}
+
+
+def _make_handler(control):
+    """创建绑定到控制接口的请求处理类"""
+
+    class ControlHandler(BaseHTTPRequestHandler):
+        server_version = "FilmFreewayControl"
+
+        def _send(self, code, body, content_type="application/json; charset=utf-8"):
+            if not isinstance(body, str):
+                body = json.dumps(body, ensure_ascii=False, indent=2)
+            data = body.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/") or "/"
+            try:
+                if path in ("/", "/status"):
+                    self._send(200, control.status())
+                elif path == "/metrics":
+                    self._send(200, control.metrics(), "text/plain; version=0.0.4; charset=utf-8")
+                else:
+                    self._send(404, {"error": "not found"})
+            except Exception as e:
+                logger.error(f"本地控制接口处理请求出错: {str(e)}")
+                self._send(500, {"error": str(e)})
+
+        def do_POST(self):
+            # 浏览器跨站请求带有 Origin，拒绝以免网页借用本机接口触发运行
+            if self.headers.get("Origin"):
+                self._send(403, {"error": "forbidden"})
+                return
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/run":
+                self._send(202, control.trigger())
+            elif path == "/cancel":
+                result = control.cancel()
+                self._send(202 if result["accepted"] else 409, result)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            logger.debug(f"本地控制接口: {self.address_string()} {format % args}")
+
+    return ControlHandler
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 分片并行抓取电影节目录
+主进程登录一次并导出会话cookies，把列表页按页码分片交给多个工作进程，
+每个工作进程使用自己的无头浏览器抓取，结果在主进程中去重后写入本地目录
+"""
+
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse, parse_qsl, urlencode
+
+from loguru import logger
+from playwright.sync_api import sync_playwright
+
+from asset_cache import AssetCache
+from catalog import festival_slug
+from filmfreeway_auto_submit import FESTIVAL_ITEMS_JS, WATERMARK_SIZE
+
+# 读取分页链接中的最大页码
+LAST_PAGE_JS = """
+links => Math.max(0, ...links.map(a => parseInt(a.innerText, 10)).filter(n => !isNaN(n)))
+"""
+
+# 工作进程中的浏览器，由进程初始化函数创建，整个进程生命周期内复用
+_worker = {}
+
+
+def page_url(listing_url, page_no):
+    """带页码的列表页地址，保留原有的筛选/排序参数"""
+    parsed = urlparse(listing_url)
+    query = [(k, v) for k, v in parse_qsl(parsed.query) if k != "page"] + [("page", str(page_no))]
+    return parsed._replace(query=urlencode(query)).geturl()
+
+
+def shard_pages(total_pages, pages_per_task):
+    """把页码切成连续的小段，便于各进程按完成速度领取任务"""
+    return [
+        list(range(start, min(start + pages_per_task, total_pages + 1)))
+        for start in range(1, total_pages + 1, pages_per_task)
+    ]
+
+
+def _init_worker(storage_state_path, asset_cache_mb=0):
+    """工作进程初始化：启动无头浏览器，载入共享的会话cookies，并共用静态资源缓存"""
+    import atexit
+
+    playwright = sync_playwright().start()
+    browser = playwright.chromium.launch(headless=True)
+    context = browser.new_context(storage_state=storage_state_path)
+    if asset_cache_mb:
+        AssetCache(max_mb=asset_cache_mb).attach(context)
+    _worker["page"] = context.new_page()
+
+    def shutdown():
+        browser.close()
+        playwright.stop()
+
+    atexit.register(shutdown)
+
+
+def _crawl_pages(listing_url, pages, item_selector):
+    """在工作进程中抓取一段页码，返回每页的原始电影节字段"""
+    page = _worker["page"]
+    results = []
+    for page_no in pages:
+        page.goto(page_url(listing_url, page_no))
+        page.wait_for_load_state("networkidle")
+        items = page.eval_on_selector_all(item_selector, FESTIVAL_ITEMS_JS)
+        results.append((page_no, items))
+        if not items:
+            # 超出最后一页，后面的页码不必再抓
+            break
+    return results
+
+
+class ShardedCrawler:
+    """分片并行抓取
+
+    使用 submitter 的登录、筛选和解析逻辑，保证与单进程发现阶段得到相同的记录。
+    """
+
+    def __init__(self, submitter, workers=None, pages_per_task=5, max_pages=None):
+        self.submitter = submitter
+        self.workers = workers or os.cpu_count() or 2
+        self.pages_per_task = pages_per_task
+        self.max_pages = max_pages or submitter.discovery_max_pages
+
+    def _prepare(self, storage_state_path):
+        """主进程登录并打开列表页，导出会话，返回 (列表页地址, 总页数, 电影节条目选择器)"""
+        with sync_playwright() as p:
+            session = self.submitter._new_session(p)
+            try:
+                page = session.open()
+                if not self.submitter.use_installed_browser:
+                    self.submitter._login(page)
+                self.submitter._open_festival_listing(page)
+
+                # 主进程确定命中的选择器，工作进程直接使用
+                selectors = self.submitter.selectors
+                listing_url = page.url
+                item_selector = selectors.pick(page, "festival_item", timeout=10000) or selectors.ordered("festival_item")[0]
+                pagination = selectors.pick(page, "pagination_links")
+                total_pages = (page.eval_on_selector_all(pagination, LAST_PAGE_JS) if pagination else 0) or self.max_pages
+                session.context.storage_state(path=storage_state_path)
+                selectors.save()
+            finally:
+                session.close()
+        return listing_url, min(total_pages, self.max_pages), item_selector
+
+    def run(self):
+        """执行分片抓取，返回写入目录的电影节数量"""
+        started = time.monotonic()
+        fd, storage_state_path = tempfile.mkstemp(suffix=".json", prefix="ff_state_")
+        os.close(fd)
+
+        try:
+            listing_url, total_pages, item_selector = self._prepare(storage_state_path)
+            shards = shard_pages(total_pages, self.pages_per_task)
+            logger.info(f"开始分片抓取: 共 {total_pages} 页，{len(shards)} 个分片，{self.workers} 个工作进程")
+
+            seen = set()
+            first_page = []
+            recorded = 0
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(storage_state_path, self.submitter.settings.asset_cache_mb),
+            ) as pool:
+                futures = [pool.submit(_crawl_pages, listing_url, pages, item_selector) for pages in shards]
+                for future in as_completed(futures):
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        logger.error(f"分片抓取出错: {str(e)}")
+                        continue
+
+                    batch = []
+                    for page_no, items in results:
+                        for item in items:
+                            if not item['href']:
+                                continue
+                            slug = festival_slug(item['href'])
+                            if page_no == 1:
+                                first_page.append(slug)
+                            # 相邻页之间可能因列表变化出现重复，按标识去重
+                            if slug in seen:
+                                continue
+                            seen.add(slug)
+                            record = self.submitter._parse_festival_item(item)
+                            if record:
+                                batch.append(record)
+                    self.submitter._record_discovered(batch)
+                    recorded += len(batch)
+
+            # 第一页的电影节作为水位线，之后的增量发现翻到这里即停止
+            if first_page:
+                key = self.submitter._watermark_key(listing_url)
+                self.submitter.catalog.set_watermark(key, first_page[:WATERMARK_SIZE])
+            self.submitter.planner.save()
+
+            elapsed = time.monotonic() - started
+            logger.info(f"分片抓取完成: 见到 {len(seen)} 个电影节，写入 {recorded} 个，耗时 {elapsed:.0f} 秒")
+            return recorded
+        finally:
+            os.remove(storage_state_path)
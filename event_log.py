@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 结构化事件日志
+每次运行写一个 JSON Lines 文件，每个电影节的每个决定（电影节、阶段、结果、耗时、原因）一行；
+写入由后台线程通过队列完成，不阻塞投递流程，运行结束后压缩为 .jsonl.gz
+"""
+
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+from loguru import logger
+
+from paths import RUN_LOG_DIR
+
+# 写入线程的结束标记
+_STOP = object()
+
+
+def new_run_id():
+    """生成运行ID：启动时间加进程号，多个实例同时运行时不会冲突"""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+def read_events(path):
+    """读取一个运行的事件文件（.jsonl 或 .jsonl.gz），逐条产出事件"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class RunEventLog:
+    """一次运行的结构化事件日志
+
+    event() 只把事件放入队列，由写入线程序列化并追加到 logs/runs/<run_id>.jsonl；
+    record() 作为进度事件的订阅回调使用；close() 等待队列写完后压缩文件。
+    本次运行的记录同时保留在 records 中，生成运行报告时不必重新读取文件。
+    """
+
+    def __init__(self, run_id=None, directory=RUN_LOG_DIR):
+        self.run_id = run_id or new_run_id()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{self.run_id}.jsonl")
+
+        self._queue = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="event-log", daemon=True)
+        self._writer.start()
+        self.closed = False
+        self.records = []
+
+    def event(self, festival, stage, outcome, duration=None, reason=None, **extra):
+        """记录一个决定；festival 为电影节记录或名称"""
+        if self.closed:
+            return
+        record = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "run_id": self.run_id,
+            "festival": festival.get("name") if isinstance(festival, dict) else festival,
+            "slug": festival.get("slug") if isinstance(festival, dict) else None,
+            "stage": stage,
+            "outcome": outcome,
+            "duration": round(duration, 3) if duration is not None else None,
+            "reason": reason,
+        }
+        record.update(extra)
+        self.records.append(record)
+        self._queue.put(record)
+
+    def record(self, progress_event):
+        """订阅回调：写入带阶段的进度事件（events.ProgressEvent），生命周期等事件忽略"""
+        if self.closed or progress_event.stage is None:
+            return
+        record = progress_event.to_record(self.run_id)
+        self.records.append(record)
+        self._queue.put(record)
+
+    def _write_loop(self):
+        """写入线程：批量取出队列中的事件追加到文件"""
+        with open(self.path, "a", encoding="utf-8") as f:
+            while True:
+                record = self._queue.get()
+                stop = record is _STOP
+                lines = [] if stop else [record]
+                # 一次取出已积压的事件，减少写入次数
+                while not stop:
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is _STOP:
+                        stop = True
+                    else:
+                        lines.append(record)
+                for record in lines:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+                f.flush()
+                if stop:
+                    return
+
+    def close(self, compress=True):
+        """等待所有事件写入，压缩文件，返回最终的文件路径"""
+        if self.closed:
+            return self.path
+        self.closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+
+        if compress and os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as src, gzip.open(f"{self.path}.gz", "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.remove(self.path)
+                self.path = f"{self.path}.gz"
+            except OSError as e:
+                logger.warning(f"压缩事件日志失败: {str(e)}")
+        return self.path
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 投递进度事件
+FilmFreewaySubmitter 在运行中发布 ProgressEvent，界面、事件日志、指标导出等通过 subscribe() 注册回调直接接收，
+不再解析日志文本；start() 返回 SubmissionResult 汇总本次运行的结果
+"""
+
+from datetime import datetime
+
+# 事件类型
+RUN_STARTED = "run_started"
+DISCOVERED = "discovered"      # 在电影节列表中见到一个电影节
+SKIPPED = "skipped"            # 筛选或投递时跳过，reason 为原因
+QUALIFIED = "qualified"        # 通过筛选，成为候选
+SUBMITTED = "submitted"        # 投递成功
+FAILED = "failed"              # 投递出错、超时或结果不确定，outcome 为具体结果
+QUOTA_REACHED = "quota_reached"
+CANCELLED = "cancelled"        # 运行被取消（如本地控制接口的取消命令）
+STAGE = "stage"                # 投递流程中一个步骤的耗时
+RUN_FINISHED = "run_finished"
+
+# 投递阶段中归为跳过的结果
+SUBMIT_SKIP_OUTCOMES = ("already_submitted", "no_button")
+
+
+class ProgressEvent:
+    """一个进度事件
+
+    stage/outcome 与结构化事件日志中的字段相同，to_record() 得到写入日志的记录；
+    生命周期事件和 DISCOVERED 没有 stage，不写入事件日志。
+    """
+
+    __slots__ = ("kind", "festival", "slug", "stage", "outcome", "reason", "duration", "ts", "data")
+
+    def __init__(self, kind, festival=None, stage=None, outcome=None, reason=None, duration=None, **data):
+        self.kind = kind
+        self.festival = festival.get("name") if isinstance(festival, dict) else festival
+        self.slug = festival.get("slug") if isinstance(festival, dict) else None
+        self.stage = stage
+        self.outcome = outcome
+        self.reason = reason
+        self.duration = duration
+        self.ts = datetime.now().isoformat(timespec="milliseconds")
+        self.data = data
+
+    @classmethod
+    def from_stage(cls, festival, stage, outcome, duration=None, reason=None, **data):
+        """由筛选/投递阶段的结果创建事件，按结果确定事件类型"""
+        if stage == "filter":
+            kind = QUALIFIED if outcome == "accepted" else SKIPPED
+        elif stage == "submit":
+            if outcome == "submitted":
+                kind = SUBMITTED
+            elif outcome in SUBMIT_SKIP_OUTCOMES:
+                kind = SKIPPED
+                reason = reason or outcome
+            elif outcome == "quota_reached":
+                kind = QUOTA_REACHED
+            else:
+                kind = FAILED
+        else:
+            kind = STAGE
+        return cls(kind, festival, stage, outcome, reason, duration, **data)
+
+    def to_record(self, run_id):
+        """转换为事件日志的记录"""
+        record = {
+            "ts": self.ts,
+            "run_id": run_id,
+            "festival": self.festival,
+            "slug": self.slug,
+            "stage": self.stage,
+            "outcome": self.outcome,
+            "duration": round(self.duration, 3) if self.duration is not None else None,
+            "reason": self.reason,
+        }
+        record.update(self.data)
+        return record
+
+    def __repr__(self):
+        return f"ProgressEvent({self.kind}, {self.festival!r}, outcome={self.outcome!r}, reason={self.reason!r})"
+
+
+class SubmissionResult:
+    """一次运行的结果，作为订阅者累计进度事件"""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.discovered = 0
+        self.qualified = 0
+        self.submitted = 0
+        self.failed = {}
+        self.skipped = {}
+        self.submitted_festivals = []
+        self.quota_reached = False
+        self.cancelled = False
+        self.wall_seconds = None
+        self.events_path = None
+        self.summary = None
+
+    def add(self, event):
+        """订阅回调：按事件类型累计"""
+        kind = event.kind
+        if kind == DISCOVERED:
+            self.discovered += 1
+        elif kind == QUALIFIED:
+            self.qualified += 1
+        elif kind == SUBMITTED:
+            self.submitted += 1
+            self.submitted_festivals.append(event.festival)
+        elif kind == SKIPPED:
+            self.skipped[event.reason] = self.skipped.get(event.reason, 0) + 1
+        elif kind == FAILED:
+            self.failed[event.outcome] = self.failed.get(event.outcome, 0) + 1
+        elif kind == QUOTA_REACHED:
+            self.quota_reached = True
+        elif kind == CANCELLED:
+            self.cancelled = True
+
+    def to_dict(self):
+        """结果字典"""
+        return {
+            "run_id": self.run_id,
+            "discovered": self.discovered,
+            "qualified": self.qualified,
+            "submitted": self.submitted,
+            "failed": dict(self.failed),
+            "skipped": dict(self.skipped),
+            "submitted_festivals": list(self.submitted_festivals),
+            "quota_reached": self.quota_reached,
+            "cancelled": self.cancelled,
+            "wall_seconds": self.wall_seconds,
+            "events_path": self.events_path,
+        }
+
+    def __repr__(self):
+        return (f"SubmissionResult({self.run_id}: submitted={self.submitted}, "
+                f"failed={sum(self.failed.values())}, skipped={sum(self.skipped.values())})")
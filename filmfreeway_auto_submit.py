@@ -9,41 +9,239 @@ FilmFreeway自动投递工具
 import os
 import time
 import random
-import schedule
 import re
 import subprocess
+import sys
 import platform
 from datetime import datetime
-from dotenv import load_dotenv
+from urllib.parse import urlparse, parse_qsl, urlencode
 from loguru import logger
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.sync_api import sync_playwright
 
-# 设置日志
-logger.add("filmfreeway_auto.log", rotation="10 MB", level="INFO")
+from category_matcher import CLICK_LABELS_JS, COLLECT_LABELS_JS, CategoryMatcher, parse_aliases
+from config import BROWSER_FIELDS, ConfigError, ConfigWatcher, get_settings
+from control_server import ControlServer
+from browser_session import BrowserSession
+from browser_watchdog import BrowserWatchdog
+from asset_cache import AssetCache
+from catalog import FestivalCatalog, festival_slug
+from event_log import RunEventLog, new_run_id
+from events import CANCELLED, DISCOVERED, QUOTA_REACHED, RUN_FINISHED, RUN_STARTED, ProgressEvent, SubmissionResult
+from form_steps import CLICK_JS, CONTINUE_TEXTS, form_step
+from har_replay import REDACTED, HarArchive
+from logging_setup import setup_logging
+from paths import CATALOG_FILE, PLAN_FILE, QUOTA_FILE, SELECTORS_FILE
+from planner import SubmissionPlanner
+from profiling import RunProfiler
+from project_cache import ProjectCache
+from quota import QuotaStore
+from ranking import CandidateRanker, parse_weights
+from report import format_summary, write_run_report
+from scheduler import DailyScheduler
+from selector_registry import SelectorRegistry
+from time_budget import AdaptiveBudget
+
+# 每个筛选/排序组合保存的水位线长度
+WATERMARK_SIZE = 20
+
+# 在页面中一次性读取列表页所有电影节的字段
+FESTIVAL_ITEMS_JS = """
+items => items.map(item => {
+    const text = selector => {
+        const el = item.querySelector(selector);
+        return el ? el.innerText.trim() : null;
+    };
+    const link = item.querySelector('a.title');
+    return {
+        name: text('.title'),
+        fee: text('.fee'),
+        href: link ? link.getAttribute('href') : null,
+        deadlines: Array.from(item.querySelectorAll('.deadline')).map(el => el.innerText.trim()),
+        categories: Array.from(item.querySelectorAll('.category')).map(el => el.innerText.trim()),
+        location: text('.location'),
+        description: text('.description'),
+    };
+})
+"""
+
+def parse_deadline(text):
+    """解析列表中的截止日期文本，如"Deadline: March 15, 2026"，无法解析时返回None"""
+    match = re.search(r'([A-Z][a-z]+)\.? (\d{1,2}), (\d{4})', text)
+    if not match:
+        return None
+    for fmt in ("%B %d %Y", "%b %d %Y"):
+        try:
+            return datetime.strptime(" ".join(match.groups()), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_deadline_tier(text, default_fee=0.0):
+    """解析一档截止日期，如"Early Deadline: March 1, 2026 - $10"，无法解析日期时返回None"""
+    deadline = parse_deadline(text)
+    if not deadline:
+        return None
+    
+    name = text.split("Deadline")[0].strip() if "Deadline" in text else ""
+    fee_match = re.search(r'\$\s*(\d+(?:\.\d+)?)', text)
+    if fee_match:
+        fee = float(fee_match.group(1))
+    else:
+        fee = 0.0 if 'Free' in text else default_fee
+    return {'name': name or "Regular", 'date': deadline, 'fee': fee}
 
 class FilmFreewaySubmitter:
-    def __init__(self):
-        # 加载环境变量
-        load_dotenv()
+    def __init__(self, settings=None, require_project=True):
+        # 所有入口共用同一份已校验的配置，配置缺失或无效时抛出 ConfigError；只获取项目列表时不要求 PROJECT_ID
+        self.settings = None
+        self.running = False
+        self.project_cache = None
+        self._project_refresh_requested = False
+        self._cancel_requested = False
+        self.quota = QuotaStore()
+        self.session = None
+        self.watchdog = None
+        
+        # 本次运行的结构化事件日志，start() 时创建
+        self.events = None
+        # 进度事件的订阅回调，订阅时整体替换，发布时无需加锁
+        self._subscribers = ()
+        
+        # 本次运行的指标
+        self.run_metrics = {"restarts": [], "recycles": 0}
+        
+        # 单个电影节的时间预算，按最近的耗时调整
+        self.budgets = None
+        self.asset_cache = None
+        self.har = None
+        self.actions = 0
+        
+        # 页面元素的候选选择器，记住上次命中的候选
+        self.selectors = SelectorRegistry()
+        
+        # 本地电影节目录
+        self.catalog = FestivalCatalog()
+        self.planner = None
+        self.apply_settings((settings or get_settings()).validate(require_project))
+        
+        logger.info(f"初始化完成: 将为项目ID {self.project_id} 进行投递")
+        logger.info(f"每日最大投递数: {self.max_submissions}, 最大入场费: {self.max_fee}")
+        logger.info(f"无头模式: {'开启' if self.headless else '关闭'}")
+        logger.info(f"登录方式: {self.login_method}")
+        logger.info(f"使用已安装的Chrome浏览器: {'是' if self.use_installed_browser else '否'}")
+        if self.use_installed_browser:
+            logger.info(f"Chrome用户数据目录: {self.chrome_user_data_dir}")
+        
+        # 存储项目列表
+        self.projects = []
+    
+    def apply_settings(self, settings):
+        """应用配置；运行中调用时不重启浏览器，从下一个电影节开始生效"""
+        # 先解析需要转换的设置，出错时不改动任何字段
+        try:
+            rank_weights = parse_weights(settings.rank_weights)
+        except ValueError as e:
+            raise ConfigError(f"RANK_WEIGHTS 无效: {str(e)}")
+        changed = settings.changed_fields(self.settings) if self.settings else []
+        self.settings = settings
+        
+        self.email = settings.email
+        self.password = settings.password
+        self.project_id = settings.project_id
+        self.max_fee = settings.max_fee
+        self.categories = settings.categories
+        
+        # 运行中保留本次运行的投递上限（如调度窗口分摊的配额），每日配额立即生效
+        if not self.running:
+            self.max_submissions = settings.max_submissions
+        
+        # 类别匹配：支持别名和模糊匹配，低于阈值的视为未匹配
+        self.category_matcher = CategoryMatcher(
+            self.categories,
+            aliases=parse_aliases(settings.category_aliases),
+            threshold=settings.category_match_threshold,
+        )
+        
+        # 每日配额在所有运行实例之间共享，max_submissions 仅限制单次运行
+        self.daily_limit = settings.max_submissions
         
-        self.email = os.getenv("FF_EMAIL")
-        self.password = os.getenv("FF_PASSWORD")
-        self.project_id = os.getenv("PROJECT_ID")
-        self.max_submissions = int(os.getenv("MAX_SUBMISSION_PER_DAY", "5"))
-        self.max_fee = float(os.getenv("MAX_ENTRY_FEE", "0"))
-        self.categories = os.getenv("CATEGORIES", "").split(",")
+        # 候选排序设置：权重、偏好电影节列表、候选池大小（0表示按投递数自动确定）
+        self.rank_weights = rank_weights
+        self.preferred_festivals = settings.preferred_festivals
+        self.rank_pool_size = settings.rank_pool_size
+        
+        # 增量发现设置：最多翻页数；DISCOVERY_FULL_CRAWL=True 时忽略水位线完整抓取
+        self.discovery_max_pages = settings.discovery_max_pages
+        self.discovery_full_crawl = settings.discovery_full_crawl
+        
+        # 目录全文查询，如"documentary AND Europe"，设置后只投递匹配的电影节
+        self.catalog_query = settings.catalog_query
+        
+        # 页面回收策略：每处理 N 个电影节或浏览器内存超过阈值(MB)时回收，0表示不启用
+        self.recycle_every = settings.recycle_every
+        self.recycle_memory_mb = settings.recycle_memory_mb
+        
+        # 预加载接下来的详情页数量，0表示不预加载
+        self.prefetch_count = settings.prefetch_count
+        
+        # 表单步骤的操作合并为一个页面脚本执行
+        self.batch_form_steps = settings.batch_form_steps
+        
+        # 项目列表缓存的有效期
+        self.project_cache = ProjectCache(ttl_hours=settings.project_cache_hours)
+        
+        # 静态资源磁盘缓存，0表示不缓存
+        if settings.asset_cache_mb and self.asset_cache is None:
+            self.asset_cache = AssetCache(max_mb=settings.asset_cache_mb)
+        elif self.asset_cache:
+            self.asset_cache.max_bytes = settings.asset_cache_mb * 1024 * 1024
+        if self.session:
+            self.session.recycle_every = self.recycle_every
+            self.session.memory_limit_mb = self.recycle_memory_mb
+            self.session.prefetch_count = self.prefetch_count
+        
+        # 浏览器看门狗：内存(MB)、持续CPU占用(%)、无响应秒数的阈值，0表示不检查该项
+        self.watchdog_enabled = settings.watchdog_enabled
+        self.watchdog_max_rss_mb = settings.watchdog_max_rss_mb
+        self.watchdog_max_cpu = settings.watchdog_max_cpu
+        self.watchdog_hang_seconds = settings.watchdog_hang_seconds
+        # 单个电影节处理期间可能长时间没有心跳，无响应阈值不能短于电影节时间预算
+        if 0 < self.watchdog_hang_seconds < settings.festival_budget_seconds:
+            logger.warning(f"WATCHDOG_HANG_SECONDS ({self.watchdog_hang_seconds}) 小于 FESTIVAL_BUDGET_SECONDS "
+                           f"({settings.festival_budget_seconds})，已调整为 {settings.festival_budget_seconds}")
+            self.watchdog_hang_seconds = settings.festival_budget_seconds
+        
+        # 单个电影节的时间预算上下限(秒)
+        if self.budgets is None:
+            self.budgets = AdaptiveBudget(settings.festival_budget_seconds, settings.festival_budget_min_seconds)
+        else:
+            self.budgets.max_seconds = settings.festival_budget_seconds
+            self.budgets.min_seconds = min(settings.festival_budget_min_seconds, settings.festival_budget_seconds)
+        
+        # 多日投递计划
+        if self.planner is None:
+            self.planner = SubmissionPlanner(self.daily_limit, self.max_fee, horizon_days=settings.plan_horizon_days)
+        else:
+            self.planner.daily_quota = self.daily_limit
+            self.planner.max_fee = self.max_fee
+            self.planner.horizon_days = settings.plan_horizon_days
+        
+        # 浏览器相关的设置在运行中修改时，下次启动浏览器才生效
+        if self.running and any(field in BROWSER_FIELDS for field in changed):
+            logger.info("浏览器和登录相关的设置将在下次运行时生效")
+            return
         
         # 无头模式设置，默认为False（可见浏览器）
-        self.headless = os.getenv("HEADLESS", "False") == "True"
+        self.headless = settings.headless
         
         # 登录方式设置，默认为邮箱密码
-        self.login_method = os.getenv("LOGIN_METHOD", "email")
+        self.login_method = settings.login_method
         
         # 使用已安装的Chrome浏览器
-        self.use_installed_browser = os.getenv("USE_INSTALLED_BROWSER", "True") == "True"
+        self.use_installed_browser = settings.use_installed_browser
         
         # Chrome用户配置目录
-        self.chrome_user_data_dir = os.getenv("CHROME_USER_DATA_DIR", "")
+        self.chrome_user_data_dir = settings.chrome_user_data_dir
         if not self.chrome_user_data_dir and self.use_installed_browser:
             # 尝试使用默认路径
             if platform.system() == "Windows":
@@ -52,50 +250,209 @@ class FilmFreewaySubmitter:
                 self.chrome_user_data_dir = os.path.join(os.environ["HOME"], "Library", "Application Support", "Google", "Chrome")
             else:  # Linux
                 self.chrome_user_data_dir = os.path.join(os.environ["HOME"], ".config", "google-chrome")
+    
+    def _refresh_settings(self):
+        """配置被热加载后，在两个电影节之间应用新配置"""
+        settings = get_settings()
+        if settings is not self.settings:
+            try:
+                self.apply_settings(settings.validate())
+            except ConfigError as e:
+                logger.error(f"新配置无效，继续使用原配置: {str(e)}")
         
-        # 验证必要的环境变量
-        if self.login_method == "email" and not all([self.email, self.password]) and not self.use_installed_browser:
-            logger.error("请检查.env文件，确保设置了FF_EMAIL, FF_PASSWORD")
-            exit(1)
-            
-        if not self.project_id:
-            logger.error("请检查.env文件，确保设置了PROJECT_ID")
-            exit(1)
-            
-        logger.info(f"初始化完成: 将为项目ID {self.project_id} 进行投递")
-        logger.info(f"每日最大投递数: {self.max_submissions}, 最大入场费: {self.max_fee}")
-        logger.info(f"无头模式: {'开启' if self.headless else '关闭'}")
-        logger.info(f"登录方式: {self.login_method}")
-        logger.info(f"使用已安装的Chrome浏览器: {'是' if self.use_installed_browser else '否'}")
-        if self.use_installed_browser:
-            logger.info(f"Chrome用户数据目录: {self.chrome_user_data_dir}")
+    def subscribe(self, callback):
+        """注册进度事件回调 callback(ProgressEvent)，返回取消订阅的函数
+
+        回调在投递线程中同步调用，应尽快返回；界面等需要在其他线程处理的订阅者自行转发。
+        """
+        self._subscribers = self._subscribers + (callback,)
         
-        # 存储项目列表
-        self.projects = []
+        def unsubscribe():
+            self._subscribers = tuple(c for c in self._subscribers if c is not callback)
+        return unsubscribe
+    
+    def _publish(self, event):
+        """把进度事件发给所有订阅者，回调出错不影响投递"""
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.warning(f"进度事件回调出错: {str(e)}")
+    
+    def request_cancel(self):
+        """请求正在运行的投递在当前电影节处理完后停止（可从其他线程调用）"""
+        if self.running:
+            self._cancel_requested = True
+        return self.running
+
+    def start(self, max_submissions=None):
+        """启动浏览器并开始投递流程，返回本次运行的结果 SubmissionResult
+
+        max_submissions 用于覆盖本次运行的投递上限（如调度窗口分摊的配额）
+        """
+        if max_submissions is not None:
+            self.max_submissions = max_submissions
+        
+        # HAR 录制或回放，回放没有录制文件时抛出 ConfigError
+        run_id = new_run_id()
+        self.har = HarArchive.for_run(self.settings, run_id)
+        live_stores = None
+        if self.har and self.har.mode == "replay":
+            live_stores = self._open_replay_stores(self.har.restore_state())
+        
+        submitted_count = 0
+        self._cancel_requested = False
+        self.run_metrics = {"restarts": [], "recycles": 0, "selector_drift": [], "prefetch_hits": 0}
+        self.running = True
+        run_started = time.monotonic()
+        self.events = RunEventLog(run_id)
+        logger.info(f"运行ID: {self.events.run_id}")
+        
+        # 运行结果和事件日志都通过订阅进度事件获得
+        result = SubmissionResult(run_id)
+        unsubscribe_result = self.subscribe(result.add)
+        unsubscribe_log = self.subscribe(self.events.record)
+        self._publish(ProgressEvent(RUN_STARTED, run_id=run_id, max_submissions=self.max_submissions))
         
-    def start(self):
-        """启动浏览器并开始投递流程"""
+        # 性能分析覆盖整个运行，包括运行期间启动的线程
+        profiler = None
+        if self.settings.profile_mode != "off":
+            profiler = RunProfiler(self.settings.profile_mode, run_id, interval_ms=self.settings.profile_interval_ms)
+            profiler.start()
+        try:
+            with sync_playwright() as p:
+                self.session = self._new_session(p)
+                try:
+                    page = self.session.open()
+                
+                    # 如果使用已安装的浏览器，假设用户已登录
+                    if not self.use_installed_browser:
+                        # 登录
+                        self._login(page)
+                        self.session.snapshot_state()
+                
+                    # 项目列表缓存过期时顺便用已打开的浏览器刷新
+                    if self.project_cache.is_stale(self.email):
+                        self._refresh_projects(page)
+                
+                    # 启动看门狗，浏览器失去响应时结束进程，由投递循环重启
+                    if self.watchdog_enabled:
+                        self.watchdog = BrowserWatchdog(
+                            self.session.processes,
+                            max_rss_mb=self.watchdog_max_rss_mb,
+                            max_cpu_percent=self.watchdog_max_cpu,
+                            hang_seconds=self.watchdog_hang_seconds,
+                        )
+                        self.watchdog.start()
+                
+                    # 搜索并投递电影节
+                    submitted_count = self._submit_to_festivals(page)
+                
+                    logger.info(f"完成任务，本次成功投递 {submitted_count} 个电影节")
+                
+                except Exception as e:
+                    logger.error(f"执行过程中出错: {str(e)}")
+                finally:
+                    if self.watchdog:
+                        self.watchdog.stop()
+                        self.watchdog = None
+                    self.run_metrics["recycles"] = len(self.session.recycles)
+                    self.run_metrics["selector_drift"] = list(self.selectors.drift)
+                    if self.asset_cache:
+                        self.run_metrics["asset_cache"] = dict(self.asset_cache.stats)
+                    self.selectors.save()
+                    self.session.close()
+                    if self.har:
+                        # 上下文关闭后 HAR 文件才写入完成
+                        self.run_metrics["har"] = self.har.stats()
+                        if self.har.mode == "replay":
+                            logger.info(f"回放完成，录制中没有而被中止的请求 {self.har.aborted} 个")
+                            self._close_replay_stores(live_stores)
+                            self.har.cleanup()
+                        else:
+                            self.har.redact([self.password])
+                            logger.info(f"录制完成，共 {self.har.contexts} 个HAR文件（密码和Cookie已脱敏）: {self.har.path}")
+                        self.har = None
+                    self.running = False
+                    unsubscribe_log()
+                    events_path = self.events.close()
+        finally:
+            # 运行中抛出的异常也要停止分析，否则线程分析钩子和采样线程会一直留在进程中
+            if profiler:
+                try:
+                    output_path, hotspots_path = profiler.stop()
+                    logger.info(f"性能分析结果已保存: {output_path}，热点汇总: {hotspots_path}")
+                except Exception as e:
+                    logger.error(f"保存性能分析结果失败: {str(e)}")
+        
+        if self.run_metrics["selector_drift"]:
+            drifted = ", ".join(d["element"] for d in self.run_metrics["selector_drift"])
+            logger.warning(f"本次运行有页面元素的选择器发生变化: {drifted}（详见 selectors.json）")
+        
+        if self.run_metrics["restarts"]:
+            causes = "; ".join(r["cause"] for r in self.run_metrics["restarts"])
+            logger.info(f"本次运行浏览器重启 {len(self.run_metrics['restarts'])} 次: {causes}")
+        
+        # 根据本次运行的事件生成报告
+        result.wall_seconds = round(time.monotonic() - run_started, 1)
+        result.events_path = events_path
+        try:
+            result.summary, json_path, csv_path = write_run_report(
+                events_path,
+                wall_seconds=result.wall_seconds,
+                run_metrics=self.run_metrics,
+                events=self.events.records,
+            )
+            logger.info(f"运行报告:\n{format_summary(result.summary)}")
+            logger.info(f"运行报告已保存: {json_path}, {csv_path}")
+        except Exception as e:
+            logger.error(f"生成运行报告失败: {str(e)}")
+        
+        unsubscribe_result()
+        self._publish(ProgressEvent(RUN_FINISHED, run_id=run_id, result=result))
+        return result
+    
+    def crawl(self):
+        """只抓取电影节列表并写入本地目录，不进行投递，返回新发现的数量"""
+        found = 0
         with sync_playwright() as p:
-            browser = self._launch_browser(p)
+            self.session = self._new_session(p)
             try:
-                context = browser.new_context() if not self.use_installed_browser else browser.contexts[0]
-                
-                page = context.new_page()
+                page = self.session.open()
                 
                 # 如果使用已安装的浏览器，假设用户已登录
                 if not self.use_installed_browser:
-                    # 登录
                     self._login(page)
                 
-                # 搜索并投递电影节
-                submitted_count = self._submit_to_festivals(page)
-                
-                logger.info(f"完成任务，本次成功投递 {submitted_count} 个电影节")
+                batch = []
+                for candidate in self._discover_festivals(page):
+                    batch.append(candidate)
+                    found += 1
+                    if len(batch) >= 100:
+                        self._record_discovered(batch)
+                        batch = []
+                self._record_discovered(batch)
+                self.planner.save()
                 
+                logger.info(f"抓取完成，新发现 {found} 个电影节，目录共 {self.catalog.count()} 个")
             except Exception as e:
-                logger.error(f"执行过程中出错: {str(e)}")
+                logger.error(f"抓取过程中出错: {str(e)}")
             finally:
-                browser.close()
+                self.session.close()
+        
+        return found
+    
+    def _new_session(self, playwright):
+        """创建浏览器会话，按配置的策略回收页面"""
+        return BrowserSession(
+            playwright,
+            self._launch_browser,
+            recycle_every=self.recycle_every,
+            memory_limit_mb=self.recycle_memory_mb,
+            prefetch_count=self.prefetch_count,
+            asset_cache=self.asset_cache,
+            har=self.har,
+        )
     
     def _launch_browser(self, playwright):
         """启动浏览器，根据设置决定是否使用已安装的Chrome"""
@@ -110,6 +467,7 @@ class FilmFreewaySubmitter:
                         "--disable-blink-features=AutomationControlled",
                         "--disable-features=IsolateOrigins,site-per-process",
                     ],
+                    **(self.har.context_options() if self.har else {}),
                 )
             except Exception as e:
                 logger.error(f"启动已安装的Chrome失败: {str(e)}")
@@ -118,90 +476,113 @@ class FilmFreewaySubmitter:
         else:
             return playwright.chromium.launch(headless=self.headless)
     
-    def get_projects(self):
-        """获取用户账户中的项目列表"""
+    def get_projects(self, page=None):
+        """获取用户账户中的项目列表并写入缓存
+
+        传入 page 时使用已打开的浏览器（需已登录），否则启动新的浏览器。
+        """
         logger.info("开始获取账户中的项目列表...")
         
-        projects = []
+        if page is not None:
+            return self._fetch_projects(page)
         
+        projects = []
         with sync_playwright() as p:
-            browser = self._launch_browser(p)
-            
+            session = self._new_session(p)
             try:
-                context = browser.new_context() if not self.use_installed_browser else browser.contexts[0]
-                
-                page = context.new_page()
+                page = session.open()
                 
                 # 如果使用已安装的浏览器，假设用户已登录
                 if not self.use_installed_browser:
                     # 登录
                     self._login(page)
                 
-                # 前往项目页面
-                logger.info("正在前往项目页面...")
-                page.goto("https://filmfreeway.com/projects")
-                page.wait_for_load_state("networkidle")
-                
-                # 检查是否需要登录（即使使用已安装浏览器，有时也可能需要再次登录）
-                if page.url.find("login") > -1:
-                    logger.info("检测到需要登录...")
-                    if self.use_installed_browser:
-                        # 如果使用已安装浏览器但需要登录，让用户手动登录
-                        logger.info("请在打开的浏览器窗口中手动登录，然后程序将继续...")
-                        # 等待用户登录完成
-                        page.wait_for_selector('a[href="/dashboard"]', timeout=120000)  # 等待2分钟
-                    else:
-                        # 使用程序自动登录
-                        self._login(page)
-                    
-                    # 登录后再次前往项目页面
-                    page.goto("https://filmfreeway.com/projects")
-                    page.wait_for_load_state("networkidle")
-                
-                # 等待项目列表加载
-                page.wait_for_selector('.project-item', timeout=10000)
+                projects = self._fetch_projects(page)
+            except Exception as e:
+                logger.error(f"获取项目列表过程中出错: {str(e)}")
+            finally:
+                session.close()
+            
+        return projects
+    
+    def request_project_refresh(self):
+        """请求正在运行的投递在下一个电影节之前用当前浏览器刷新项目列表（可从其他线程调用）"""
+        self._project_refresh_requested = True
+    
+    def _refresh_projects(self, page):
+        """用已打开的浏览器刷新项目列表缓存，失败时不影响投递"""
+        self._project_refresh_requested = False
+        try:
+            self.get_projects(page)
+        except Exception as e:
+            logger.warning(f"刷新项目列表失败: {str(e)}")
+    
+    def _fetch_projects(self, page):
+        """在已登录的页面上读取项目列表，成功时写入缓存"""
+        projects = []
+        
+        # 前往项目页面
+        logger.info("正在前往项目页面...")
+        page.goto("https://filmfreeway.com/projects")
+        page.wait_for_load_state("networkidle")
+        
+        # 检查是否需要登录（即使使用已安装浏览器，有时也可能需要再次登录）
+        if page.url.find("login") > -1:
+            logger.info("检测到需要登录...")
+            if self.use_installed_browser:
+                # 如果使用已安装浏览器但需要登录，让用户手动登录
+                logger.info("请在打开的浏览器窗口中手动登录，然后程序将继续...")
+                # 等待用户登录完成
+                self.selectors.wait(page, "logged_in", timeout=120000)  # 等待2分钟
+            else:
+                # 使用程序自动登录
+                self._login(page)
+            
+            # 登录后再次前往项目页面
+            page.goto("https://filmfreeway.com/projects")
+            page.wait_for_load_state("networkidle")
+        
+        # 等待项目列表加载
+        item_selector = self.selectors.pick(page, "project_item", timeout=10000)
+        
+        # 获取项目列表
+        project_items = page.query_selector_all(item_selector) if item_selector else []
+        logger.info(f"找到 {len(project_items)} 个项目")
+        
+        for item in project_items:
+            try:
+                # 获取项目名称
+                title_element = item.query_selector('.project-title')
+                if not title_element:
+                    continue
                 
-                # 获取项目列表
-                project_items = page.query_selector_all('.project-item')
-                logger.info(f"找到 {len(project_items)} 个项目")
+                title = title_element.inner_text().strip()
                 
-                for item in project_items:
-                    try:
-                        # 获取项目名称
-                        title_element = item.query_selector('.project-title')
-                        if not title_element:
-                            continue
-                        
-                        title = title_element.inner_text().strip()
-                        
-                        # 获取项目链接（包含ID）
-                        link_element = item.query_selector('a[href*="/projects/"]')
-                        if not link_element:
-                            continue
-                        
-                        project_url = link_element.get_attribute('href')
-                        # 从URL中提取项目ID
-                        project_id_match = re.search(r'/projects/(\d+)', project_url)
-                        project_id = project_id_match.group(1) if project_id_match else None
-                        
-                        if project_id:
-                            projects.append({
-                                'id': project_id,
-                                'name': title,
-                                'url': project_url
-                            })
-                            logger.info(f"获取到项目: {title} (ID: {project_id})")
-                    except Exception as e:
-                        logger.error(f"解析项目时出错: {str(e)}")
+                # 获取项目链接（包含ID）
+                link_element = item.query_selector('a[href*="/projects/"]')
+                if not link_element:
+                    continue
                 
-                logger.info(f"共获取到 {len(projects)} 个项目")
-                self.projects = projects
+                project_url = link_element.get_attribute('href')
+                # 从URL中提取项目ID
+                project_id_match = re.search(r'/projects/(\d+)', project_url)
+                project_id = project_id_match.group(1) if project_id_match else None
                 
+                if project_id:
+                    projects.append({
+                        'id': project_id,
+                        'name': title,
+                        'url': project_url
+                    })
+                    logger.info(f"获取到项目: {title} (ID: {project_id})")
             except Exception as e:
-                logger.error(f"获取项目列表过程中出错: {str(e)}")
-            finally:
-                browser.close()
-            
+                logger.error(f"解析项目时出错: {str(e)}")
+        
+        logger.info(f"共获取到 {len(projects)} 个项目")
+        self.projects = projects
+        
+        if projects:
+            self.project_cache.put(self.email, projects)
         return projects
     
     def _login(self, page):
@@ -220,37 +601,27 @@ class FilmFreewaySubmitter:
         """使用邮箱和密码登录"""
         logger.info("使用邮箱和密码登录...")
         
-        # 等待加载
-        page.wait_for_selector('input[name="email"]')
-        
-        # 输入登录信息
-        page.fill('input[name="email"]', self.email)
-        page.fill('input[name="password"]', self.password)
+        # 等待加载并输入登录信息
+        self.selectors.wait(page, "email_input").fill(self.email)
+        # 回放时填写录制中替换密码的占位符，登录请求才能与录制匹配
+        password = REDACTED if self.har and self.har.mode == "replay" else self.password
+        self.selectors.wait(page, "password_input", timeout=5000).fill(password)
         
         # 点击登录按钮
-        page.click('button[type="submit"]')
+        self.selectors.wait(page, "login_button", timeout=5000).click()
         
         # 等待登录完成
-        try:
-            page.wait_for_selector('a[href="/dashboard"]', timeout=30000)
-            logger.info("登录成功")
-        except PlaywrightTimeoutError:
+        if not self.selectors.find(page, "logged_in", timeout=30000):
             raise Exception("登录失败，请检查账号密码或者网站可能有验证码阻止登录")
+        logger.info("登录成功")
     
     def _login_with_google(self, page):
         """使用Google账号登录"""
         logger.info("使用Google账号登录...")
         
         try:
-            # 寻找Google登录按钮并点击
-            google_btn = page.locator('text="Sign in with Google"').first
-            if not google_btn:
-                google_btn = page.locator('.google-login-button').first
-            
-            if not google_btn:
-                # 尝试其他可能的选择器
-                google_btn = page.locator('a:has-text("Google")').first
-            
+            # 寻找Google登录按钮并点击：同时等待所有候选，不为猜错的写法等待超时
+            google_btn = self.selectors.find(page, "google_login", timeout=10000)
             if not google_btn:
                 raise Exception("无法找到Google登录按钮")
             
@@ -290,7 +661,7 @@ class FilmFreewaySubmitter:
             page.wait_for_url("**/filmfreeway.com/**", timeout=30000)
             
             # 检查是否登录成功
-            page.wait_for_selector('a[href="/dashboard"]', timeout=30000)
+            self.selectors.wait(page, "logged_in")
             logger.info("Google登录成功")
             
         except Exception as e:
@@ -300,163 +671,588 @@ class FilmFreewaySubmitter:
             page.goto("https://filmfreeway.com/login")
             self._login_with_email(page)
     
-    def _submit_to_festivals(self, page):
-        """搜索并投递到电影节"""
+    def _discover_festivals(self, page):
+        """浏览电影节列表，逐个产出符合费用条件的候选电影节"""
         logger.info("开始搜索可投递的电影节...")
+        self._open_festival_listing(page)
+        
+        # 水位线按筛选/排序组合区分，记录最近见过的电影节
+        watermark_key = self._watermark_key(page.url)
+        watermark = [] if self.discovery_full_crawl else self.catalog.get_watermark(watermark_key)
+        known = set(watermark)
+        newest = []
+        
+        # 看门狗在翻页时结束浏览器的，重启后重新打开当前列表页继续；同一页只重启一次
+        step = time.monotonic()
+        page_no = 1
+        listing_url = page.url
+        festivals = None
+        restarted_at = None
+        while True:
+            self._heartbeat()
+            try:
+                if festivals is None:
+                    # 一次性读取当前页所有电影节的字段，不持有任何 ElementHandle
+                    item_selector = self.selectors.pick(page, "festival_item", timeout=10000)
+                    festivals = page.eval_on_selector_all(item_selector, FESTIVAL_ITEMS_JS) if item_selector else []
+                    step = self._stage(None, "listing", step)
+                    logger.info(f"第 {page_no} 页找到 {len(festivals)} 个潜在的电影节")
+                    
+                    reached_known = False
+                    for festival in festivals:
+                        try:
+                            slug = festival_slug(festival['href']) if festival['href'] else None
+                            
+                            # 遇到已见过的电影节，说明后面都是上次运行已处理过的
+                            if slug in known:
+                                reached_known = True
+                                break
+                            if slug and len(newest) < WATERMARK_SIZE:
+                                newest.append(slug)
+                            
+                            candidate = self._parse_festival_item(festival)
+                            if candidate:
+                                candidate['new'] = True
+                                yield candidate
+                        except Exception as e:
+                            logger.error(f"处理电影节时出错: {str(e)}")
+                    
+                    if reached_known:
+                        logger.info(f"已到达上次运行的位置，停止翻页（共 {page_no} 页）")
+                        break
+                    if page_no >= self.discovery_max_pages:
+                        break
+                
+                # 翻到下一页
+                next_link = self.selectors.find(page, "next_page")
+                if not next_link:
+                    break
+                next_link.click()
+                page.wait_for_load_state("networkidle")
+            except Exception:
+                cause = self.watchdog.consume_trip() if self.watchdog else None
+                if not cause or restarted_at == page_no:
+                    raise
+                restarted_at = page_no
+                page = self._restart_browser(cause, f"列表第 {page_no} 页", listing_url)
+                continue
+            
+            page_no += 1
+            listing_url = page.url
+            festivals = None
         
+        # 更新水位线：本次新见到的最新电影节在前
+        if newest:
+            self.catalog.set_watermark(watermark_key, (newest + watermark)[:WATERMARK_SIZE])
+        logger.info(f"自上次运行以来新增 {len(newest)} 个电影节")
+    
+    def _open_festival_listing(self, page):
+        """打开电影节列表页并应用筛选条件"""
         # 前往电影节页面
         page.goto("https://filmfreeway.com/festivals")
         page.wait_for_load_state("networkidle")
         
         # 等待过滤器加载
-        page.wait_for_selector('.filters-container')
+        self.selectors.wait(page, "listing_filters")
         
         # 点击"Free"过滤选项（如果只需要免费的）
         if self.max_fee == 0:
             try:
-                page.click('text="Free"')
+                self.selectors.wait(page, "free_filter", timeout=5000).click()
                 page.wait_for_load_state("networkidle")
                 logger.info("已筛选免费电影节")
             except:
                 logger.warning("无法筛选免费电影节，继续进行...")
+    
+    @staticmethod
+    def _watermark_key(url):
+        """水位线的键：列表页的筛选/排序参数（去掉页码）"""
+        parsed = urlparse(url)
+        query = sorted((k, v) for k, v in parse_qsl(parsed.query) if k != "page")
+        return f"{parsed.path}?{urlencode(query)}"
+    
+    def _parse_festival_item(self, festival):
+        """解析列表中的一个电影节（FESTIVAL_ITEMS_JS 读取的字段），不符合费用条件或信息不全时返回None"""
+        if self._subscribers:
+            self._publish(ProgressEvent(DISCOVERED, festival['name'] or festival['href']))
+        
+        # 获取电影节名称
+        if not festival['name']:
+            self._event(festival['href'], "filter", "skipped", reason="no_name")
+            return None
+            
+        festival_name = festival['name']
+        
+        # 检查是否有entry fee信息
+        fee_value = 0.0
+        fee_text = festival['fee']
+        if fee_text:
+            if 'Free' not in fee_text and self.max_fee == 0:
+                logger.info(f"跳过付费电影节: {festival_name}")
+                self._event(festival_name, "filter", "skipped", reason="paid")
+                return None
+                
+            # 尝试解析费用
+            if 'Free' not in fee_text:
+                try:
+                    fee_value = float(fee_text.replace('$', '').strip())
+                    if fee_value > self.max_fee:
+                        logger.info(f"跳过费用({fee_value})超出限制的电影节: {festival_name}")
+                        self._event(festival_name, "filter", "skipped", reason="over_fee", fee=fee_value)
+                        return None
+                except:
+                    logger.warning(f"无法解析电影节费用: {fee_text}, 跳过: {festival_name}")
+                    self._event(festival_name, "filter", "skipped", reason="unparsable", fee=fee_text)
+                    return None
+        
+        # 获取详情链接
+        url = festival['href']
+        if not url:
+            self._event(festival_name, "filter", "skipped", reason="no_link")
+            return None
+        
+        # 各档截止日期和类别用于排序和投递计划，缺失时不影响投递
+        deadlines = []
+        for deadline_text in festival['deadlines']:
+            tier = parse_deadline_tier(deadline_text, fee_value)
+            if tier:
+                deadlines.append(tier)
+        deadlines.sort(key=lambda d: d['date'])
+        upcoming = [d['date'] for d in deadlines if d['date'] >= datetime.now().date()]
+        
+        candidate = {
+            'slug': festival_slug(url),
+            'name': festival_name,
+            'url': url,
+            'fee': fee_value,
+            'deadline': upcoming[0] if upcoming else None,
+            'deadlines': deadlines,
+            'categories': festival['categories'],
+            'location': festival.get('location') or "",
+            'description': festival.get('description') or "",
+        }
+        self._event(candidate, "filter", "accepted", fee=fee_value)
+        return candidate
+    
+    def _open_replay_stores(self, paths):
+        """回放时配额、目录、投递计划和选择器改用录制备份的临时副本，返回原来的对象以便运行结束后换回"""
+        live_stores = (self.quota, self.catalog, self.planner, self.selectors)
+        self.quota = QuotaStore(paths[QUOTA_FILE])
+        self.catalog = FestivalCatalog(paths[CATALOG_FILE])
+        self.planner = SubmissionPlanner(
+            self.daily_limit, self.max_fee, path=paths[PLAN_FILE], horizon_days=self.settings.plan_horizon_days
+        )
+        self.selectors = SelectorRegistry(paths[SELECTORS_FILE])
+        return live_stores
+    
+    def _close_replay_stores(self, live_stores):
+        """回放结束，关闭临时副本并换回工作目录中的状态"""
+        self.catalog.close()
+        self.quota, self.catalog, self.planner, self.selectors = live_stores
+    
+    def _submit_to_festivals(self, page):
+        """搜索电影节，按得分排序后依次投递"""
+        run_started = datetime.now().isoformat(timespec="seconds")
+        
+        # 发现阶段只翻到上次运行的水位线，边解析边打分；新发现的电影节分批写入本地目录并加入投递计划
+        new_ranker = self._new_ranker()
+        batch = []
+        for candidate in self._discover_festivals(page):
+            batch.append(candidate)
+            if len(batch) >= 100:
+                for festival in self._record_discovered(batch):
+                    new_ranker.push(festival)
+                batch = []
+        for festival in self._record_discovered(batch):
+            new_ranker.push(festival)
         
-        # 获取电影节列表
-        festivals = page.query_selector_all('.festival-item')
-        logger.info(f"找到 {len(festivals)} 个潜在的电影节")
+        # 设置了目录查询时，积压和计划中的候选也只保留匹配的电影节（一次本地查询）
+        matching = None
+        if self.catalog_query:
+            matching = set(self.catalog.match_slugs(self.catalog_query))
+            logger.info(f"目录查询 \"{self.catalog_query}\" 匹配 {len(matching)} 个电影节")
+        
+        # 目录中以前发现但尚未投递的电影节同样流式打分，作为新增部分之后的候选
+        backlog_ranker = self._new_ranker()
+        for candidate in self.catalog.iter_pending(self.max_fee, seen_before=run_started):
+            if matching is None or candidate['slug'] in matching:
+                backlog_ranker.push(candidate)
+        
+        # 依次投递：今天计划的部分、自上次运行以来的新增、目录中积压的候选
+        planned = [
+            f for f in (self.catalog.get(slug) for slug in self.planner.today_slice())
+            if f and (matching is None or f['slug'] in matching)
+        ]
+        planned_slugs = {f['slug'] for f in planned}
+        candidates = list(planned)
+        for festival in new_ranker.ranked() + backlog_ranker.ranked():
+            if festival['slug'] not in planned_slugs:
+                candidates.append(festival)
+        logger.info(
+            f"今日计划 {len(planned)} 个，新增 {new_ranker.seen} 个（保留 {len(new_ranker)} 个），"
+            f"目录积压 {backlog_ranker.seen} 个（保留 {len(backlog_ranker)} 个）"
+        )
+        
+        # 列表页已不再需要，释放其内存
+        self.session.park_listing()
         
         submitted_count = 0
         
-        # 循环处理每个电影节
-        for idx, festival in enumerate(festivals):
+        # 按得分顺序处理每个电影节
+        for index, festival in enumerate(candidates):
+            self._refresh_settings()
+            if self._project_refresh_requested:
+                self._refresh_projects(self.session.page)
+                self.session.park_listing()
+            if self._cancel_requested:
+                logger.info(f"运行已被取消，本次已投递 {submitted_count} 个")
+                self._publish(ProgressEvent(CANCELLED))
+                break
             if submitted_count >= self.max_submissions:
-                logger.info(f"已达到每日最大投递数 {self.max_submissions}")
+                logger.info(f"已达到本次最大投递数 {self.max_submissions}")
+                self._publish(ProgressEvent(QUOTA_REACHED, reason="run_limit"))
                 break
-                
+            
+            if not self.quota.remaining(self.email, self.project_id, self.daily_limit):
+                logger.info(f"已达到每日最大投递数 {self.daily_limit}")
+                self._publish(ProgressEvent(QUOTA_REACHED, reason="daily_limit"))
+                break
+            
+            # 处理当前电影节的同时，在后台标签页中加载接下来的几个详情页；当前是最后一个名额时不预加载
             try:
-                # 获取电影节名称
-                name_el = festival.query_selector('.title')
-                if not name_el:
-                    continue
-                    
-                festival_name = name_el.inner_text().strip()
-                
-                # 检查是否有entry fee信息
-                fee_el = festival.query_selector('.fee')
-                if fee_el:
-                    fee_text = fee_el.inner_text().strip()
-                    if 'Free' not in fee_text and self.max_fee == 0:
-                        logger.info(f"跳过付费电影节: {festival_name}")
-                        continue
-                        
-                    # 尝试解析费用
-                    if 'Free' not in fee_text:
-                        try:
-                            fee_value = float(fee_text.replace('$', '').strip())
-                            if fee_value > self.max_fee:
-                                logger.info(f"跳过费用({fee_value})超出限制的电影节: {festival_name}")
-                                continue
-                        except:
-                            logger.warning(f"无法解析电影节费用: {fee_text}, 跳过: {festival_name}")
-                            continue
-                
-                # 获取详情链接并访问
-                detail_link = festival.query_selector('a.title')
-                if not detail_link:
-                    continue
-                
-                # 在新标签页中打开详情页
-                with page.context.new_page() as detail_page:
-                    detail_url = detail_link.get_attribute('href')
-                    detail_page.goto(f"https://filmfreeway.com{detail_url}")
-                    detail_page.wait_for_load_state("networkidle")
-                    
-                    # 检查是否已经提交过
-                    if detail_page.query_selector('text="Already Submitted"'):
-                        logger.info(f"已经提交过: {festival_name}")
-                        continue
-                    
-                    # 寻找提交按钮
-                    submit_button = detail_page.query_selector('a:text("Submit Now")')
-                    if not submit_button:
-                        logger.info(f"无法找到提交按钮: {festival_name}")
-                        continue
-                    
-                    # 点击提交按钮
-                    submit_button.click()
-                    detail_page.wait_for_load_state("networkidle")
-                    
-                    # 选择项目
-                    try:
-                        # 等待项目选择页面加载
-                        detail_page.wait_for_selector(f'a[href*="{self.project_id}"]', timeout=10000)
-                        detail_page.click(f'a[href*="{self.project_id}"]')
-                        detail_page.wait_for_load_state("networkidle")
-                        
-                        # 选择类别（如果有）
-                        if len(self.categories) > 0:
-                            for category in self.categories:
-                                category_checkbox = detail_page.query_selector(f'label:text-is("{category.strip()}")')
-                                if category_checkbox:
-                                    category_checkbox.click()
-                        
-                        # 点击继续
-                        continue_button = detail_page.query_selector('button:text("Continue")')
-                        if continue_button:
-                            continue_button.click()
-                            detail_page.wait_for_load_state("networkidle")
-                            
-                            # 最终提交
-                            submit_final = detail_page.query_selector('button:text("Submit")')
-                            if submit_final:
-                                submit_final.click()
-                                detail_page.wait_for_load_state("networkidle")
-                                
-                                # 检查是否成功提交
-                                if detail_page.url.find("thank-you") > -1 or detail_page.query_selector('text="Thank you"'):
-                                    submitted_count += 1
-                                    logger.info(f"成功投递 [{submitted_count}]: {festival_name}")
-                                else:
-                                    logger.warning(f"可能未成功投递: {festival_name}")
-                            else:
-                                logger.warning(f"未找到最终提交按钮: {festival_name}")
-                        else:
-                            logger.warning(f"未找到继续按钮: {festival_name}")
-                    except Exception as e:
-                        logger.error(f"投递过程出错 - {festival_name}: {str(e)}")
-                
-                # 随机延迟，避免被检测为机器人
-                time.sleep(random.uniform(2, 5))
+                last_slot = submitted_count + 1 >= self.max_submissions
+                upcoming = [] if last_slot else candidates[index + 1:index + 1 + self.prefetch_count]
+                self.session.prefetch(self._festival_url(f) for f in upcoming)
+            except Exception as e:
+                logger.warning(f"预加载详情页出错: {str(e)}")
+            
+            if festival['slug'] in planned_slugs:
+                logger.info(f"正在处理电影节 (今日计划): {festival['name']}")
+            else:
+                logger.info(f"正在处理电影节 (得分 {festival['score']:.2f}): {festival['name']}")
+            
+            # 看门狗重启浏览器后，从当前电影节重新开始
+            started = time.monotonic()
+            self.actions = 0
+            queries = self.selectors.queries
+            for attempt in range(2):
+                self._heartbeat()
+                reason = None
+                budget = self.budgets.start()
+                try:
+                    outcome = self._submit_festival(festival, budget)
+                except Exception as e:
+                    if budget.expired:
+                        logger.warning(f"超过时间预算 ({budget.seconds:.0f} 秒)，跳过: {festival['name']}")
+                        outcome = "timed_out"
+                    else:
+                        logger.error(f"处理电影节时出错: {str(e)}")
+                        outcome = "error"
+                    reason = str(e)
                 
+                cause = self.watchdog.consume_trip() if self.watchdog else None
+                if not cause:
+                    break
+                outcome = "error"
+                reason = f"browser restarted: {cause}"
+                self._restart_browser(cause, festival['name'])
+            self._event(festival, "submit", outcome, time.monotonic() - started, reason,
+                        attempts=attempt + 1, budget=round(budget.seconds, 1),
+                        actions=self.actions + self.selectors.queries - queries)
+            
+            # 超时的电影节关闭详情页，结束仍在进行的页面加载；只有走完整个表单的耗时用于调整之后的预算，
+            # 超时按整个预算计入，预算偏小时能重新放宽
+            if outcome == "timed_out":
+                self.session.discard_detail_page()
+                self.budgets.observe(budget.seconds)
+            elif outcome in ("submitted", "uncertain"):
+                self.budgets.observe(budget.elapsed())
+            
+            # 按回收策略替换标签页/上下文，控制浏览器内存
+            try:
+                self.session.after_festival()
             except Exception as e:
-                logger.error(f"处理电影节时出错: {str(e)}")
+                logger.error(f"回收浏览器页面时出错: {str(e)}")
+            
+            if outcome in ("submitted", "already_submitted"):
+                self.planner.mark_done(festival['slug'])
+                self.catalog.mark_submitted(festival['slug'])
+            elif outcome == "no_button":
+                # 连续几次运行都找不到投递按钮（已截止或关闭投递）时移出积压和计划
+                if self.catalog.record_no_button(festival['slug']):
+                    logger.info(f"多次找不到投递按钮，不再作为候选: {festival['name']}")
+                    self.planner.mark_done(festival['slug'])
+            elif outcome != "error" and outcome != "timed_out":
+                self.catalog.reset_no_button(festival['slug'])
+            
+            if outcome == "submitted":
+                submitted_count += 1
+                logger.info(f"成功投递 [{submitted_count}]: {festival['name']}")
+            elif outcome == "quota_reached":
+                logger.info(f"已达到每日最大投递数 {self.daily_limit}")
+                break
+            
+            # 随机延迟，避免被检测为机器人
+            time.sleep(random.uniform(2, 5))
+        
+        # 配额已满或候选已处理完，预加载的页面不再需要
+        self.session.drop_prefetched()
+        self.run_metrics["prefetch_hits"] = self.session.prefetch_hits
         
+        self.planner.save()
         return submitted_count
+    
+    @staticmethod
+    def _festival_url(festival):
+        """电影节详情页的完整地址"""
+        return f"https://filmfreeway.com{festival['url']}"
+    
+    def _event(self, festival, stage, outcome, duration=None, reason=None, **extra):
+        """发布一个筛选/投递阶段的进度事件，事件日志作为订阅者写入；没有订阅者时直接返回"""
+        if self._subscribers:
+            self._publish(ProgressEvent.from_stage(festival, stage, outcome, duration, reason, **extra))
+    
+    def _stage(self, festival, name, started):
+        """记录一个步骤的耗时，返回下一个步骤的开始时间"""
+        now = time.monotonic()
+        self._event(festival, name, "ok", now - started)
+        self.budgets.observe_step(name, now - started)
+        return now
+    
+    def _click(self, locator, timeout):
+        """点击元素；批量模式下在页面内直接点击，不做可操作性等待"""
+        self.actions += 1
+        if self.batch_form_steps:
+            locator.evaluate(CLICK_JS, timeout=timeout)
+        else:
+            locator.click(timeout=timeout)
+    
+    def _fill_categories_and_continue(self, page, budget):
+        """勾选匹配的类别并点击继续，返回是否找到继续按钮
+
+        批量模式下类别和继续按钮在一个页面脚本中点击；页面上找不到继续按钮时改用选择器注册表查找。
+        """
+        labels = []
+        if self.category_matcher.categories:
+            self.actions += 1
+            labels = page.evaluate(COLLECT_LABELS_JS)
+        to_click, _, _ = self.category_matcher.plan(labels)
+        
+        if self.batch_form_steps:
+            self.actions += 1
+            clicked_button, missing = form_step(page, to_click, CONTINUE_TEXTS)
+            if missing:
+                logger.warning(f"页面上找不到 {len(missing)} 个类别标签，已跳过: {missing}")
+            if clicked_button:
+                return True
+        elif to_click:
+            self.actions += 1
+            page.evaluate(CLICK_LABELS_JS, to_click)
+        
+        continue_button = self.selectors.find(page, "continue_button")
+        if not continue_button:
+            return False
+        self.actions += 1
+        continue_button.click(timeout=budget.timeout("continue"))
+        return True
+    
+    def _heartbeat(self):
+        """向看门狗报告投递循环仍在推进"""
+        if self.watchdog:
+            self.watchdog.heartbeat()
+    
+    def _restart_browser(self, cause, festival_name, listing_url=None):
+        """看门狗结束浏览器后重新启动，必要时重新登录，返回列表页
+
+        发现阶段传入 listing_url，重新打开当时的列表页；投递阶段不再需要列表页，跳转到空白页。
+        """
+        self.run_metrics["restarts"].append({
+            'time': datetime.now().isoformat(timespec="seconds"),
+            'cause': cause,
+            'festival': festival_name,
+        })
+        page = self.session.restart(cause)
+        if not self.use_installed_browser and not self.session.storage_state:
+            self._login(page)
+            self.session.snapshot_state()
+        if listing_url:
+            page.goto(listing_url)
+            page.wait_for_load_state("networkidle")
+            logger.info(f"浏览器已重启，从{festival_name}继续")
+        else:
+            self.session.park_listing()
+            logger.info(f"浏览器已重启，从当前电影节继续: {festival_name}")
+        return page
+    
+    def _new_ranker(self):
+        """创建候选排序堆，保留数量留出余量给已投递、无按钮等情况"""
+        return CandidateRanker(
+            self.rank_pool_size or self.max_submissions * 4,
+            weights=self.rank_weights,
+            categories=self.categories,
+            preferred=self.preferred_festivals,
+            max_fee=self.max_fee,
+        )
+    
+    def _record_discovered(self, festivals):
+        """把发现的电影节写入本地目录，并增量更新投递计划，返回其中符合目录查询的电影节
 
-def run_daily_submission():
-    """每日定时执行的投递任务"""
+        没有设置 CATALOG_QUERY 时全部符合；不符合的只写入目录，不加入投递计划。
+        """
+        if not festivals:
+            return []
+        self.catalog.upsert_many(festivals)
+        if self.catalog_query:
+            matching = set(self.catalog.match_slugs(self.catalog_query, slugs=[f['slug'] for f in festivals]))
+            festivals = [f for f in festivals if f['slug'] in matching]
+        self.planner.add(festivals)
+        return festivals
+    
+    def _submit_festival(self, festival, budget):
+        """在复用的详情标签页中完成一个电影节的投递流程，返回结果标识
+
+        只使用 Locator 定位元素，不持有 ElementHandle，页面导航后不会残留远程对象。
+        每次等待的超时时间都从 budget 中取，预算用完时返回 timed_out。
+        """
+        festival_name = festival['name']
+        url = self._festival_url(festival)
+        detail_page, prefetched = self.session.take_detail_page(url)
+        
+        # 每个步骤的耗时写入事件日志，用于运行报告中的分阶段统计；预加载的页面通常已加载完成
+        step = time.monotonic()
+        if prefetched:
+            detail_page.wait_for_load_state("networkidle", timeout=budget.timeout("open"))
+        if not prefetched or festival['url'] not in detail_page.url:
+            detail_page.goto(url, timeout=budget.timeout("open"))
+            detail_page.wait_for_load_state("networkidle", timeout=budget.timeout("open"))
+        step = self._stage(festival, "open", step)
+        
+        # 检查是否已经提交过
+        if self.selectors.find(detail_page, "already_submitted"):
+            logger.info(f"已经提交过: {festival_name}")
+            return "already_submitted"
+        
+        # 寻找提交按钮
+        submit_button = self.selectors.find(detail_page, "submit_now")
+        if not submit_button:
+            logger.info(f"无法找到提交按钮: {festival_name}")
+            return "no_button"
+        
+        # 点击提交按钮
+        self._click(submit_button, budget.timeout("entry"))
+        detail_page.wait_for_load_state("networkidle", timeout=budget.timeout("entry"))
+        step = self._stage(festival, "entry", step)
+        
+        # 选择项目
+        try:
+            # 等待项目选择页面加载
+            project_link = self.selectors.wait(
+                detail_page, "project_link", timeout=budget.timeout("project", cap=10000), project_id=self.project_id
+            )
+            self._click(project_link, budget.timeout("project"))
+            detail_page.wait_for_load_state("networkidle", timeout=budget.timeout("project"))
+            step = self._stage(festival, "project", step)
+            
+            # 选择类别（如果有）并点击继续：一次读取所有类别标签，在 Python 中匹配后批量点击
+            if not self._fill_categories_and_continue(detail_page, budget):
+                logger.warning(f"未找到继续按钮: {festival_name}")
+                return "no_button"
+            step = self._stage(festival, "categories", step)
+            
+            detail_page.wait_for_load_state("networkidle", timeout=budget.timeout("continue"))
+            step = self._stage(festival, "continue", step)
+            
+            # 最终提交；找到提交按钮也说明上一步已成功进入确认页
+            submit_final = self.selectors.find(detail_page, "final_submit")
+            if not submit_final:
+                logger.warning(f"未找到最终提交按钮: {festival_name}")
+                return "no_button"
+            
+            if not self.quota.reserve(self.email, self.project_id, self.daily_limit,
+                                      lambda: self._click(submit_final, budget.timeout("confirm"))):
+                return "quota_reached"
+            # 已经点击提交，预算用完时不再等待，直接检查结果
+            try:
+                detail_page.wait_for_load_state("networkidle", timeout=budget.timeout("confirm"))
+            except Exception:
+                pass
+            self._stage(festival, "confirm", step)
+            
+            # 检查是否成功提交
+            if detail_page.url.find("thank-you") > -1 or self.selectors.find(detail_page, "thank_you"):
+                return "submitted"
+            
+            logger.warning(f"可能未成功投递: {festival_name}")
+            return "uncertain"
+        except Exception as e:
+            if budget.expired:
+                logger.warning(f"超过时间预算 ({budget.seconds:.0f} 秒)，跳过: {festival_name}")
+                return "timed_out"
+            logger.error(f"投递过程出错 - {festival_name}: {str(e)}")
+            return "error"
+
+def run_daily_submission(window=None, quota=None, control=None):
+    """每日定时执行的投递任务，返回本次成功投递的数量；control 为本地控制接口，运行期间订阅进度事件"""
     logger.info(f"开始每日投递任务: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     submitter = FilmFreewaySubmitter()
-    submitter.start()
+    if control:
+        control.attach(submitter)
+    try:
+        return submitter.start(max_submissions=quota).submitted
+    finally:
+        if control:
+            control.detach()
 
 def main():
     """主函数"""
+    setup_logging()
     logger.info("FilmFreeway自动投递工具已启动")
     
-    # 加载环境变量
-    load_dotenv()
+    # 配置只在这里解析一次，缺失或无效时直接退出
+    try:
+        settings = get_settings().validate()
+    except ConfigError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    
+    # 本地控制接口在调度器创建后启动，投递任务运行时由它订阅进度事件
+    control = None
+    
+    def job(window, quota):
+        return run_daily_submission(window, quota, control=control)
+    
+    # 设置每日运行窗口 - RUN_TIMES 支持多个时间（逗号分隔），兼容旧的 RUN_TIME
+    scheduler = DailyScheduler(
+        settings.run_times,
+        job,
+        settings.max_submissions,
+        catchup_policy=settings.catchup_policy,
+    )
+    logger.info(f"已设置定时任务，将在每天 {', '.join(scheduler.status()['run_times'])} 自动运行")
+    
+    # CONTROL_PORT 非0时在本机提供状态、指标和运行控制接口
+    if settings.control_port:
+        control = ControlServer(scheduler, settings.control_port)
+        if not control.start():
+            control = None
     
-    # 首次运行
-    run_daily_submission()
+    # 监视配置文件：运行时间和每日配额变化时重新调度，其他设置由正在运行的投递在下一个电影节应用
+    def on_config_change(new_settings, changed):
+        if "run_times" in changed or "max_submissions" in changed:
+            scheduler.reschedule(new_settings.run_times, new_settings.max_submissions)
     
-    # 设置每日定时任务 - 从环境变量获取时间，默认为上午10点
-    run_time = os.getenv("RUN_TIME", "10:00")
-    schedule.every().day.at(run_time).do(run_daily_submission)
-    logger.info(f"已设置定时任务，将在每天 {run_time} 自动运行")
+    watcher = ConfigWatcher(on_change=on_config_change)
+    watcher.start()
     
-    # 保持程序运行并执行定时任务
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    # 先按策略补跑今天错过的窗口，然后休眠到下一个窗口
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        watcher.stop()
+        scheduler.stop()
+        if control:
+            control.stop()
+        logger.info("FilmFreeway自动投递工具已退出")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
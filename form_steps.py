@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 批量表单步骤
+一个表单步骤中的操作（勾选类别、点击继续）先在 Python 中规划好，再由一个页面脚本一次完成，
+省去每次点击的往返和可操作性等待；步骤的结果（页面跳转、下一步的元素出现）仍由 Playwright 检查
+"""
+
+# 在页面内点击元素，不做可操作性等待（用于 Locator.evaluate）
+CLICK_JS = "el => el.click()"
+
+# 按顺序点击标签（页面上已不存在的序号跳过并报告），然后点击文字匹配的按钮；
+# 按钮可能触发页面跳转，因此总是最后一个操作
+FORM_STEP_JS = """
+({labels, buttons}) => {
+    const all = document.querySelectorAll('label');
+    const clicked = [];
+    const missing = [];
+    for (const i of labels) {
+        if (!all[i]) {
+            missing.push(i);
+            continue;
+        }
+        all[i].click();
+        clicked.push(i);
+    }
+    if (!buttons.length) return {clicked, missing, button: true};
+
+    const wanted = buttons.map(t => t.toLowerCase());
+    const button = Array.from(document.querySelectorAll('button, input[type="submit"], a')).find(el => {
+        if (el.disabled || el.offsetParent === null) return false;
+        const text = (el.tagName === 'INPUT' ? el.value : el.innerText || '').trim().toLowerCase();
+        return wanted.includes(text);
+    });
+    if (!button) return {clicked, missing, button: false};
+    button.click();
+    return {clicked, missing, button: true};
+}
+"""
+
+# 表单按钮的文字，与选择器注册表中的候选对应
+CONTINUE_TEXTS = ["Continue"]
+
+
+def form_step(page, labels=(), buttons=()):
+    """执行一个批量表单步骤，返回 (按钮是否已点击（没有按钮时为 True）, 页面上不存在的标签序号)
+
+    按钮未找到时标签已经全部点击过，调用方只需要另外查找按钮，不要重复点击标签。
+    """
+    result = page.evaluate(FORM_STEP_JS, {"labels": list(labels), "buttons": list(buttons)})
+    return result["button"], result["missing"]
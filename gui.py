@@ -7,19 +7,28 @@ FilmFreeway自动投递工具 - GUI界面
 
 import os
 import sys
-import time
 import threading
 from datetime import datetime
-from dotenv import load_dotenv, set_key
+from dotenv import set_key
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                             QLabel, QLineEdit, QPushButton, QTextEdit, QSpinBox, QDoubleSpinBox,
                             QCheckBox, QGroupBox, QTabWidget, QFileDialog, QMessageBox, QComboBox,
                             QProgressBar, QTimeEdit, QRadioButton, QButtonGroup, QListWidget,
-                            QListWidgetItem, QSplashScreen)
-from PyQt6.QtCore import Qt, QTime, pyqtSignal, QObject
+                            QListWidgetItem, QSplashScreen, QTableView, QHeaderView,
+                            QAbstractItemView)
+from PyQt6.QtCore import Qt, QTime, QTimer, pyqtSignal, QObject
 from PyQt6.QtGui import QIcon, QFont, QTextCursor
 
+from catalog_model import COLUMNS as CATALOG_COLUMNS, CatalogTableModel
+from config import ConfigError, get_settings, reload_settings
+from events import FAILED, QUALIFIED, RUN_FINISHED, RUN_STARTED, SKIPPED, SUBMITTED
 from filmfreeway_auto_submit import FilmFreewaySubmitter, run_daily_submission
+from logging_setup import setup_logging
+from project_cache import ProjectCache
+from scheduler import DailyScheduler
+
+# 界面显示的进度事件类型
+PROGRESS_KINDS = (RUN_STARTED, RUN_FINISHED, SUBMITTED, SKIPPED, FAILED, QUALIFIED)
 
 # 自定义日志处理器，将日志输出到GUI
 class GUILogHandler(QObject):
@@ -29,12 +38,17 @@ class GUILogHandler(QObject):
         super().__init__()
         
     def write(self, message):
-        self.log_signal.emit(message)
+        self.log_signal.emit(message.rstrip("\n"))
         
     def flush(self):
         pass
 
 class FilmFreewayGUI(QMainWindow):
+    # 后台获取到项目列表后通知界面线程：(项目列表, 是否由用户手动触发)
+    projects_signal = pyqtSignal(list, bool)
+    # 投递线程发布的进度事件转发到界面线程
+    progress_signal = pyqtSignal(object)
+    
     def __init__(self):
         super().__init__()
         # 设置窗口标题和大小
@@ -55,15 +69,18 @@ class FilmFreewayGUI(QMainWindow):
         # 创建各选项卡
         self.setup_tab = QWidget()
         self.projects_tab = QWidget()
+        self.catalog_tab = QWidget()
         self.log_tab = QWidget()
         
         self.tabs.addTab(self.setup_tab, "设置")
         self.tabs.addTab(self.projects_tab, "项目选择")
+        self.tabs.addTab(self.catalog_tab, "电影节目录")
         self.tabs.addTab(self.log_tab, "日志")
         
         # 初始化各选项卡界面
         self.init_setup_tab()
         self.init_projects_tab()
+        self.init_catalog_tab()
         self.init_log_tab()
         
         # 初始化数据
@@ -76,11 +93,38 @@ class FilmFreewayGUI(QMainWindow):
         # 初始化线程变量
         self.submission_thread = None
         self.projects_thread = None
+        self.scheduler = None
         self.is_running = False
         
         # 存储项目列表
         self.projects = []
         
+        # 正在运行的投递任务，刷新项目列表时复用其浏览器
+        self.active_submitter = None
+        
+        # 投递进度：直接订阅投递器的进度事件
+        self.progress_counts = {}
+        self.progress_signal.connect(self.on_progress)
+        
+        # 启动时直接显示缓存的项目列表，过期时在后台刷新
+        self.projects_signal.connect(self.update_projects_list)
+        self.project_cache = ProjectCache()
+        self.projects_cache_mtime = None
+        try:
+            settings = get_settings()
+            self.project_cache = ProjectCache(ttl_hours=settings.project_cache_hours)
+            self.load_cached_projects()
+            # 账号设置完整时才自动刷新
+            if self.project_cache.is_stale(settings.email) and settings.validate(require_project=False):
+                self.refresh_projects_in_background()
+        except ConfigError:
+            self.load_cached_projects()
+        
+        # 投递任务刷新缓存后同步更新列表
+        self.projects_timer = QTimer(self)
+        self.projects_timer.timeout.connect(self.load_cached_projects)
+        self.projects_timer.start(5000)
+        
     def init_setup_tab(self):
         """初始化设置选项卡"""
         layout = QVBoxLayout(self.setup_tab)
@@ -263,6 +307,52 @@ class FilmFreewayGUI(QMainWindow):
         project_details_group.setLayout(details_layout)
         layout.addWidget(project_details_group)
     
+    def init_catalog_tab(self):
+        """初始化电影节目录选项卡"""
+        layout = QVBoxLayout(self.catalog_tab)
+        
+        # 搜索栏
+        search_layout = QHBoxLayout()
+        search_label = QLabel("搜索:")
+        self.catalog_search_input = QLineEdit()
+        self.catalog_search_input.setPlaceholderText("电影节名称、标识或类别")
+        self.catalog_count_label = QLabel("")
+        search_layout.addWidget(search_label)
+        search_layout.addWidget(self.catalog_search_input)
+        search_layout.addWidget(self.catalog_count_label)
+        layout.addLayout(search_layout)
+        
+        # 目录表格，行按需分批加载
+        self.catalog_model = CatalogTableModel(parent=self)
+        self.catalog_model.total_changed.connect(
+            lambda total: self.catalog_count_label.setText(f"共 {total} 个电影节")
+        )
+        self.catalog_view = QTableView()
+        self.catalog_view.setModel(self.catalog_model)
+        self.catalog_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.catalog_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.catalog_view.verticalHeader().setVisible(False)
+        self.catalog_view.verticalHeader().setDefaultSectionSize(22)
+        self.catalog_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.catalog_view.setSortingEnabled(True)
+        sort_column = [column for column, _ in CATALOG_COLUMNS].index("last_seen")
+        self.catalog_view.sortByColumn(sort_column, Qt.SortOrder.DescendingOrder)
+        layout.addWidget(self.catalog_view)
+        
+        # 输入停顿后再查询，避免每个字符都查询一次
+        self.catalog_search_timer = QTimer(self)
+        self.catalog_search_timer.setSingleShot(True)
+        self.catalog_search_timer.setInterval(300)
+        self.catalog_search_timer.timeout.connect(
+            lambda: self.catalog_model.set_search(self.catalog_search_input.text())
+        )
+        self.catalog_search_input.textChanged.connect(self.catalog_search_timer.start)
+        
+        # 投递运行期间目录有变化时自动刷新
+        self.catalog_timer = QTimer(self)
+        self.catalog_timer.timeout.connect(self.catalog_model.check_for_updates)
+        self.catalog_timer.start(3000)
+    
     def toggle_login_method(self):
         """切换登录方式时的界面调整"""
         if self.google_login_radio.isChecked():
@@ -298,36 +388,36 @@ class FilmFreewayGUI(QMainWindow):
         layout.addLayout(log_buttons_layout)
     
     def load_settings(self):
-        """从.env文件加载设置"""
+        """从配置文件加载设置"""
         try:
-            load_dotenv()
+            settings = reload_settings()
             
             # 加载登录方式
-            login_method = os.getenv("LOGIN_METHOD", "email")
-            if login_method == "google":
+            if settings.login_method == "google":
                 self.google_login_radio.setChecked(True)
             else:
                 self.email_login_radio.setChecked(True)
             
-            self.email_input.setText(os.getenv("FF_EMAIL", ""))
-            self.password_input.setText(os.getenv("FF_PASSWORD", ""))
-            self.project_input.setText(os.getenv("PROJECT_ID", ""))
+            self.email_input.setText(settings.email)
+            self.password_input.setText(settings.password)
+            self.project_input.setText(settings.project_id)
             
-            self.daily_input.setValue(int(os.getenv("MAX_SUBMISSION_PER_DAY", "5")))
-            self.fee_input.setValue(float(os.getenv("MAX_ENTRY_FEE", "0")))
-            self.category_input.setText(os.getenv("CATEGORIES", "Short,Documentary"))
+            self.daily_input.setValue(settings.max_submissions)
+            self.fee_input.setValue(settings.max_fee)
+            self.category_input.setText(",".join(settings.categories))
             
-            # 加载运行时间
-            run_time = os.getenv("RUN_TIME", "10:00")
-            hour, minute = run_time.split(":")
-            self.time_input.setTime(QTime(int(hour), int(minute)))
+            # 加载运行时间（界面只设置第一个运行时间）
+            hour, minute = settings.run_times[0]
+            self.time_input.setTime(QTime(hour, minute))
             
             # 加载无头模式设置
-            headless = os.getenv("HEADLESS", "False") == "True"
-            self.headless_checkbox.setChecked(headless)
+            self.headless_checkbox.setChecked(settings.headless)
             
-            self.append_log("设置已加载")
-        except Exception as e:
+            if settings.profile:
+                self.append_log(f"设置已加载 (profile: {settings.profile})")
+            else:
+                self.append_log("设置已加载")
+        except ConfigError as e:
             self.append_log(f"加载设置时出错: {str(e)}")
     
     def save_settings(self):
@@ -356,7 +446,7 @@ class FilmFreewayGUI(QMainWindow):
                 
                 # 保存运行时间
                 time_str = self.time_input.time().toString("HH:mm")
-                env_data["RUN_TIME"] = time_str
+                env_data["RUN_TIMES"] = time_str
                 
                 # 保存无头模式设置
                 env_data["HEADLESS"] = str(self.headless_checkbox.isChecked())
@@ -365,6 +455,8 @@ class FilmFreewayGUI(QMainWindow):
                 for key, value in env_data.items():
                     set_key(".env", key, value)
             
+            # 重新加载共享配置，正在运行的投递从下一个电影节开始使用新设置
+            reload_settings()
             self.append_log("设置已保存")
             QMessageBox.information(self, "保存成功", "设置已成功保存")
         except Exception as e:
@@ -390,67 +482,95 @@ class FilmFreewayGUI(QMainWindow):
         # 保存当前设置
         self.save_settings()
         
+        self.append_log("开始获取账户中的项目列表...")
+        self.refresh_projects_in_background(manual=True)
+    
+    def refresh_projects_in_background(self, manual=False):
+        """在后台刷新项目列表，刷新期间继续显示当前列表；有投递任务在运行时复用其浏览器"""
+        if self.projects_thread and self.projects_thread.is_alive():
+            return
+        
+        if self.active_submitter and self.active_submitter.running:
+            # 由投递任务在处理下一个电影节之前刷新，写入缓存后由定时器更新列表
+            self.active_submitter.request_project_refresh()
+            self.append_log("将由正在运行的投递任务刷新项目列表")
+            return
+        
         # 禁用按钮，避免重复操作
         self.fetch_projects_btn.setEnabled(False)
         self.refresh_projects_btn.setEnabled(False)
         self.status_label.setText("正在获取项目列表...")
-        self.append_log("开始获取账户中的项目列表...")
-        
-        # 清空项目列表
-        self.projects_list.clear()
-        self.project_details_text.clear()
-        self.use_selected_btn.setEnabled(False)
         
         # 启动线程获取项目列表
-        self.projects_thread = threading.Thread(target=self.fetch_projects_thread)
+        self.projects_thread = threading.Thread(target=self.fetch_projects_thread, args=(manual,))
         self.projects_thread.daemon = True
         self.projects_thread.start()
     
-    def fetch_projects_thread(self):
+    def fetch_projects_thread(self, manual=False):
         """在线程中获取项目列表"""
         try:
-            # 创建提交器实例
-            submitter = FilmFreewaySubmitter()
+            # 创建提交器实例，获取项目列表时不要求已设置项目ID
+            submitter = FilmFreewaySubmitter(require_project=False)
             
-            # 设置无头模式
-            submitter.headless = False  # 获取项目列表时最好不要使用无头模式，以便于处理可能的验证
+            # 手动获取时不使用无头模式，以便于处理可能的验证；后台刷新按界面设置
+            submitter.headless = False if manual else self.headless_checkbox.isChecked()
             
-            # 获取项目列表
+            # 获取项目列表，结果写入缓存
             projects = submitter.get_projects()
             
-            # 在UI线程中更新界面
-            self.update_projects_list(projects)
+            # 通过信号在UI线程中更新界面
+            self.projects_signal.emit(projects, manual)
             
         except Exception as e:
-            self.append_log(f"获取项目列表过程中出错: {str(e)}")
-        finally:
-            # 恢复按钮状态
-            self.fetch_projects_btn.setEnabled(True)
-            self.refresh_projects_btn.setEnabled(True)
-            self.status_label.setText("就绪")
+            self.log_handler.write(f"获取项目列表过程中出错: {str(e)}")
+            self.projects_signal.emit([], False)
     
-    def update_projects_list(self, projects):
-        """更新项目列表界面"""
-        self.projects = projects
+    def load_cached_projects(self):
+        """缓存文件有变化时显示缓存的项目列表"""
+        mtime = self.project_cache.mtime()
+        if mtime is None or mtime == self.projects_cache_mtime:
+            return
+        self.projects_cache_mtime = mtime
         
-        # 清空列表
-        self.projects_list.clear()
+        projects, fetched_at = self.project_cache.get(self.email_input.text())
+        if projects:
+            self.show_projects(projects)
+            self.status_label.setText(f"项目列表更新于 {fetched_at.strftime('%Y-%m-%d %H:%M')}")
+    
+    def update_projects_list(self, projects, manual=False):
+        """后台获取完成后更新项目列表界面"""
+        # 恢复按钮状态
+        self.fetch_projects_btn.setEnabled(True)
+        self.refresh_projects_btn.setEnabled(True)
+        self.status_label.setText("就绪")
         
         if not projects:
-            self.append_log("未找到任何项目")
-            QMessageBox.warning(self, "提示", "未从您的账户中获取到任何项目。")
+            if manual:
+                self.append_log("未找到任何项目")
+                QMessageBox.warning(self, "提示", "未从您的账户中获取到任何项目。")
             return
         
-        # 添加项目到列表
+        self.projects_cache_mtime = self.project_cache.mtime()
+        self.show_projects(projects)
+        self.append_log(f"成功获取到 {len(projects)} 个项目")
+        
+        # 手动获取时切换到项目选择选项卡
+        if manual:
+            self.tabs.setCurrentWidget(self.projects_tab)
+    
+    def show_projects(self, projects):
+        """原地更新项目列表，保留当前选中的项目"""
+        selected = self.projects_list.selectedItems()
+        selected_id = selected[0].data(Qt.ItemDataRole.UserRole)['id'] if selected else None
+        self.projects = projects
+        
+        self.projects_list.clear()
         for project in projects:
             item = QListWidgetItem(f"{project['name']} (ID: {project['id']})")
             item.setData(Qt.ItemDataRole.UserRole, project)
             self.projects_list.addItem(item)
-        
-        self.append_log(f"成功获取到 {len(projects)} 个项目")
-        
-        # 切换到项目选择选项卡
-        self.tabs.setCurrentWidget(self.projects_tab)
+            if project['id'] == selected_id:
+                item.setSelected(True)
     
     def select_project(self, item):
         """选择项目时的操作"""
@@ -540,14 +660,15 @@ class FilmFreewayGUI(QMainWindow):
             # 设置无头模式
             submitter.headless = self.headless_checkbox.isChecked()
             
-            # 运行
+            # 运行，进度事件通过信号在界面线程中处理
+            self.active_submitter = submitter
+            submitter.subscribe(self.forward_progress)
             submitter.start()
-            
-            self.append_log("投递任务完成")
         except Exception as e:
             self.append_log(f"投递过程出错: {str(e)}")
         finally:
             # 恢复界面状态
+            self.active_submitter = None
             self.is_running = False
             self.run_once_btn.setEnabled(True)
             self.run_auto_btn.setEnabled(True)
@@ -585,27 +706,68 @@ class FilmFreewayGUI(QMainWindow):
         else:
             # 关闭定时任务
             self.is_running = False
+            if self.scheduler:
+                self.scheduler.stop()
             self.run_auto_btn.setText("开始定时任务")
             self.status_label.setText("就绪")
             self.append_log("定时任务已停止")
     
     def run_scheduled_task(self):
         """运行定时任务"""
-        import schedule
-        
-        # 清除之前的所有定时任务
-        schedule.clear()
-        
         # 获取定时运行时间
         time_str = self.time_input.time().toString("HH:mm")
-        
-        # 设置定时任务
-        schedule.every().day.at(time_str).do(self.run_submission_task)
-        
-        # 保持线程运行并检查定时任务
-        while self.is_running:
-            schedule.run_pending()
-            time.sleep(10)  # 每10秒检查一次
+        hour, minute = time_str.split(":")
+        
+        # 休眠到运行窗口，停止定时任务时立即唤醒
+        self.scheduler = DailyScheduler(
+            [(int(hour), int(minute))],
+            self.run_scheduled_window,
+            self.daily_input.value(),
+            catchup_policy=get_settings().catchup_policy,
+        )
+        self.scheduler.run_forever()
+    
+    def run_scheduled_window(self, window, quota):
+        """在定时窗口中执行投递任务，返回本次投递数量"""
+        # 在调度线程中调用，日志通过信号交给界面线程显示
+        self.log_handler.write(f"定时任务开始运行 ({window})，本次配额: {quota}")
+        
+        submitter = FilmFreewaySubmitter()
+        submitter.headless = self.headless_checkbox.isChecked()
+        self.active_submitter = submitter
+        submitter.subscribe(self.forward_progress)
+        try:
+            result = submitter.start(max_submissions=quota)
+        finally:
+            self.active_submitter = None
+        return result.submitted
+    
+    def forward_progress(self, event):
+        """投递线程中的订阅回调：只把界面关心的事件转发到界面线程"""
+        if event.kind in PROGRESS_KINDS:
+            self.progress_signal.emit(event)
+    
+    def on_progress(self, event):
+        """处理投递进度事件：更新进度条和状态栏"""
+        if event.kind == RUN_STARTED:
+            self.progress_counts = {SUBMITTED: 0, SKIPPED: 0, FAILED: 0, QUALIFIED: 0}
+            self.progress_bar.setRange(0, max(event.data["max_submissions"], 1))
+            self.progress_bar.setValue(0)
+        elif event.kind == RUN_FINISHED:
+            result = event.data["result"]
+            failed = sum(result.failed.values())
+            skipped = sum(result.skipped.values())
+            self.append_log(f"投递任务完成: 成功 {result.submitted}，失败 {failed}，跳过 {skipped}，耗时 {result.wall_seconds:.0f} 秒")
+            return
+        else:
+            self.progress_counts[event.kind] = self.progress_counts.get(event.kind, 0) + 1
+            if event.kind == SUBMITTED:
+                self.progress_bar.setValue(self.progress_counts[SUBMITTED])
+        
+        counts = self.progress_counts
+        self.status_label.setText(
+            f"正在运行: 候选 {counts[QUALIFIED]}，已投递 {counts[SUBMITTED]}，跳过 {counts[SKIPPED]}，失败 {counts[FAILED]}"
+        )
     
     def append_log(self, message):
         """添加日志到显示区域"""
@@ -644,6 +806,8 @@ class FilmFreewayGUI(QMainWindow):
             
             if reply == QMessageBox.StandardButton.Yes:
                 self.is_running = False
+                if self.scheduler:
+                    self.scheduler.stop()
                 event.accept()
             else:
                 event.ignore()
@@ -651,6 +815,8 @@ class FilmFreewayGUI(QMainWindow):
 def main():
     app = QApplication(sys.argv)
     window = FilmFreewayGUI()
+    # 日志同时输出到日志选项卡，界面自带时间戳，只显示级别和消息
+    setup_logging(console=window.log_handler.write, console_format="{level: <7} | {message}")
     window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - HAR 录制与回放
+录制模式把一次运行中每个浏览器上下文的全部网络请求保存为 HAR 文件（密码和 Cookie 脱敏），并备份运行开始时的本地状态；
+回放模式完全由 HAR 响应请求，未录制的请求直接中止，不会访问真实网站，也不会产生真实投递；
+回放时配额、目录、投递计划和选择器使用从录制备份恢复的临时副本，不读写工作目录中的文件；
+可以为页面和接口请求注入固定延迟加抖动，便于在相同条件下比较改动前后的耗时
+"""
+
+import glob
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from urllib.parse import quote, quote_plus
+from loguru import logger
+
+from config import ConfigError
+from paths import CATALOG_FILE, HAR_DIR, PLAN_FILE, QUOTA_FILE, SELECTORS_FILE
+
+# 录制开始时备份的本地状态，回放前恢复它们可以得到与录制时相同的候选和水位线
+STATE_FILES = (CATALOG_FILE, PLAN_FILE, QUOTA_FILE, SELECTORS_FILE)
+
+# 注入延迟的请求类型；静态资源不延迟，否则同步接口下逐个等待会远慢于真实情况
+DELAYED_RESOURCE_TYPES = ("document", "xhr", "fetch")
+
+# 录制中的密码替换为该占位符；回放时登录表单填写同一个占位符，请求体与录制一致
+REDACTED = "REDACTED"
+
+# 录制中值被脱敏的请求/响应头
+SECRET_HEADERS = ("cookie", "set-cookie", "authorization")
+
+
+def _copy_state_file(src, dst):
+    """复制一个状态文件；SQLite 数据库用备份接口复制，包含尚未合并的 WAL 内容"""
+    if src.endswith(".db"):
+        source = sqlite3.connect(src)
+        target = sqlite3.connect(dst)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+    else:
+        shutil.copy2(src, dst)
+
+
+def latest_recording(directory=HAR_DIR):
+    """最近一次录制的目录，没有录制时返回None"""
+    recordings = [d for d in glob.glob(os.path.join(directory, "*")) if os.path.isdir(d)]
+    return max(recordings, key=os.path.getmtime) if recordings else None
+
+
+class HarArchive:
+    """一次运行的 HAR 录制或回放
+
+    mode 为 "record" 或 "replay"。录制时每个上下文写一个 context-<序号>.har（回收页面会新建上下文）；
+    回放时按顺序加载目录中的全部 HAR，先录制的优先匹配。
+    """
+
+    def __init__(self, mode, path, latency_ms=0, jitter_ms=0):
+        self.mode = mode
+        self.path = path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.contexts = 0
+        self.aborted = 0
+        self.state_dir = None
+
+    @classmethod
+    def for_run(cls, settings, run_id):
+        """根据配置创建本次运行的录制或回放，HAR_MODE=off 时返回None"""
+        if settings.har_mode == "record":
+            path = settings.har_path or os.path.join(HAR_DIR, run_id)
+            os.makedirs(path, exist_ok=True)
+            archive = cls("record", path)
+            archive.snapshot_state()
+            logger.info(f"录制模式: 网络请求保存到 {path}")
+            return archive
+        if settings.har_mode == "replay":
+            path = settings.har_path or latest_recording()
+            if not path or not glob.glob(os.path.join(path, "*.har")):
+                raise ConfigError(f"没有可回放的HAR录制，请先用 HAR_MODE=record 录制或设置 HAR_PATH: {path or HAR_DIR}")
+            logger.info(f"回放模式: 从 {path} 回放，延迟 {settings.replay_latency_ms}±{settings.replay_jitter_ms} ms")
+            return cls("replay", path, settings.replay_latency_ms, settings.replay_jitter_ms)
+        return None
+
+    def snapshot_state(self):
+        """备份录制开始时的本地状态到 state/ 子目录"""
+        state_dir = os.path.join(self.path, "state")
+        os.makedirs(state_dir, exist_ok=True)
+        for path in STATE_FILES:
+            if os.path.exists(path):
+                _copy_state_file(path, os.path.join(state_dir, os.path.basename(path)))
+
+    def restore_state(self):
+        """回放前把录制时备份的本地状态复制到临时目录，返回 {工作目录中的文件: 临时副本}
+
+        录制中没有备份的文件对应一个尚不存在的临时路径，由各模块按空状态创建；运行结束后调用 cleanup()。
+        """
+        self.state_dir = tempfile.mkdtemp(prefix="filmfreeway-replay-")
+        backup_dir = os.path.join(self.path, "state")
+        paths = {}
+        for path in STATE_FILES:
+            src = os.path.join(backup_dir, os.path.basename(path))
+            dst = os.path.join(self.state_dir, os.path.basename(path))
+            if os.path.exists(src):
+                _copy_state_file(src, dst)
+            paths[path] = dst
+        if not os.path.isdir(backup_dir):
+            logger.warning(f"录制中没有本地状态备份，回放从空状态开始: {backup_dir}")
+        return paths
+
+    def cleanup(self):
+        """删除回放使用的临时状态"""
+        if self.state_dir:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+            self.state_dir = None
+
+    def redact(self, secrets):
+        """录制结束后（上下文已关闭）从 HAR 文件中去掉密码和 Cookie，返回脱敏的条目数"""
+        if self.mode != "record":
+            return 0
+        variants = set()
+        for secret in secrets:
+            if secret:
+                variants.update((secret, quote_plus(secret), quote(secret, safe=""), json.dumps(secret)[1:-1]))
+        # 长的先替换，避免编码后的形式被部分替换
+        variants = sorted(variants, key=len, reverse=True)
+
+        def scrub(text):
+            for variant in variants:
+                text = text.replace(variant, REDACTED)
+            return text
+
+        redacted = 0
+        for har in glob.glob(os.path.join(self.path, "*.har")):
+            with open(har, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for entry in data.get("log", {}).get("entries", []):
+                changed = False
+                for message in (entry.get("request", {}), entry.get("response", {})):
+                    for header in message.get("headers", []):
+                        if header.get("name", "").lower() in SECRET_HEADERS and header.get("value") != REDACTED:
+                            header["value"] = REDACTED
+                            changed = True
+                    for cookie in message.get("cookies", []):
+                        cookie["value"] = REDACTED
+                        changed = True
+                post_data = entry.get("request", {}).get("postData")
+                if post_data and variants:
+                    text = post_data.get("text") or ""
+                    if any(variant in text for variant in variants):
+                        post_data["text"] = scrub(text)
+                        changed = True
+                    for param in post_data.get("params", []):
+                        if param.get("value") and any(variant in param["value"] for variant in variants):
+                            param["value"] = scrub(param["value"])
+                            changed = True
+                redacted += changed
+            tmp_file = f"{har}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, har)
+        return redacted
+
+    def context_options(self):
+        """创建上下文时的参数：录制模式下为每个上下文指定一个 HAR 文件"""
+        if self.mode != "record":
+            return {}
+        self.contexts += 1
+        return {
+            "record_har_path": os.path.join(self.path, f"context-{self.contexts:03d}.har"),
+            "record_har_mode": "full",
+        }
+
+    def attach(self, context):
+        """回放模式下让上下文的所有请求由 HAR 响应
+
+        路由按注册的相反顺序匹配：延迟最先执行，然后依次尝试各个 HAR，都未命中时中止请求。
+        """
+        if self.mode != "replay":
+            return
+        context.route("**/*", self._abort)
+        for har in sorted(glob.glob(os.path.join(self.path, "*.har")), reverse=True):
+            context.route_from_har(har, not_found="fallback")
+        if self.latency_ms or self.jitter_ms:
+            context.route("**/*", self._delay)
+
+    def _delay(self, route):
+        """注入网络延迟后交给 HAR 路由"""
+        if route.request.resource_type in DELAYED_RESOURCE_TYPES:
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(delay, 0) / 1000)
+        route.fallback()
+
+    def _abort(self, route):
+        """录制中没有的请求直接中止，回放不访问网络"""
+        self.aborted += 1
+        logger.debug(f"回放中未录制的请求: {route.request.method} {route.request.url}")
+        route.abort()
+
+    def stats(self):
+        """本次录制或回放的统计"""
+        return {"mode": self.mode, "path": self.path, "contexts": self.contexts, "aborted": self.aborted}
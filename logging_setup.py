@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 日志设置
+日志在入口函数中配置一次，导入模块时不再注册日志输出。
+文件日志通过队列异步写入，不阻塞投递流程；控制台/GUI使用单独的简短格式输出
+"""
+
+from paths import LOG_FILE
+
+# 控制台和GUI的简短格式
+CONSOLE_FORMAT = "{time:HH:mm:ss} | {level: <7} | {message}"
+
+_configured = False
+
+
+def setup_logging(console=None, console_format=CONSOLE_FORMAT):
+    """配置日志输出，重复调用不会注册重复的输出
+
+    console 为控制台/GUI的输出目标（可调用对象或文件），默认输出到标准错误。
+    """
+    global _configured
+    if _configured:
+        return
+
+    import sys
+    from loguru import logger
+
+    # 替换默认的彩色输出，不做回溯诊断，开销更小
+    logger.remove()
+    logger.add(console or sys.stderr, format=console_format, level="INFO", colorize=False, backtrace=False, diagnose=False)
+
+    # 文件日志：后台线程写入并轮转
+    logger.add(LOG_FILE, rotation="10 MB", compression="zip", level="INFO", enqueue=True)
+    _configured = True
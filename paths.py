@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 运行时文件位置
+只包含常量，不导入任何依赖，供只读命令快速读取运行状态
+"""
+
+# 日志文件
+LOG_FILE = "filmfreeway_auto.log"
+
+# 调度状态
+SCHEDULER_STATE_FILE = "scheduler_state.json"
+
+# 每日配额记录
+QUOTA_FILE = "quota.json"
+
+# 本地电影节目录
+CATALOG_FILE = "festival_catalog.db"
+
+# 多日投递计划
+PLAN_FILE = "submission_plan.json"
+
+# 每次运行的结构化事件日志目录
+RUN_LOG_DIR = "logs/runs"
+
+# 选择器注册表记录的首选选择器
+SELECTORS_FILE = "selectors.json"
+
+# 静态资源磁盘缓存目录
+ASSET_CACHE_DIR = "asset_cache"
+
+# 账户项目列表缓存
+PROJECTS_FILE = "projects_cache.json"
+
+# HAR 录制目录，每次运行一个子目录
+HAR_DIR = "hars"
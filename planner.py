@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 投递计划
+根据电影节的各档截止日期（早鸟、常规、延期）和费用，把投递分散到未来几周，
+保证每天不超过配额，并在较便宜的一档截止前完成投递
+"""
+
+import json
+import os
+from datetime import date, timedelta
+from loguru import logger
+
+from paths import PLAN_FILE
+
+
+
+def target_deadline(festival, max_fee, today=None):
+    """选择电影节的目标截止档：尚未截止且费用不超过上限的档位中最便宜的一个
+
+    返回 (截止日期, 费用)，没有合适档位时返回None。
+    """
+    today = today or date.today()
+    tiers = [
+        d for d in festival.get("deadlines", [])
+        if d.get("date") and d["date"] >= today and (d.get("fee") or 0) <= max_fee
+    ]
+    if not tiers:
+        # 没有分档信息时退回到列表中的截止日期
+        deadline = festival.get("deadline")
+        fee = festival.get("fee") or 0
+        if deadline and deadline >= today and fee <= max_fee:
+            return deadline, fee
+        return None
+    best = min(tiers, key=lambda d: (d.get("fee") or 0, d["date"]))
+    return best["date"], best.get("fee") or 0
+
+
+class SubmissionPlanner:
+    """多日投递计划
+
+    每个目标电影节被安排在其目标截止日期之前、尽量早的有空余配额的一天。
+    新电影节出现时只对新增或截止档变化的电影节做插入，不重新计算整个计划。
+    """
+
+    def __init__(self, daily_quota, max_fee, path=PLAN_FILE, horizon_days=28, today=None):
+        self.daily_quota = daily_quota
+        self.max_fee = max_fee
+        self.path = path
+        self.horizon_days = horizon_days
+        self.today = today or date.today()
+        self.state = self._load()
+        self._roll_forward()
+
+    def _load(self):
+        """加载已保存的计划"""
+        if not os.path.exists(self.path):
+            return {"days": {}, "targets": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取投递计划失败，将重新生成: {str(e)}")
+            return {"days": {}, "targets": {}}
+
+    def save(self):
+        """保存计划"""
+        self.state["days"] = {day: slugs for day, slugs in self.state["days"].items() if slugs}
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def _day_slots(self, day):
+        """某天已安排的电影节列表"""
+        return self.state["days"].setdefault(day.isoformat(), [])
+
+    def _unschedule(self, slug):
+        """从计划中移除一个电影节"""
+        for slugs in self.state["days"].values():
+            if slug in slugs:
+                slugs.remove(slug)
+        self.state["days"] = {day: slugs for day, slugs in self.state["days"].items() if slugs}
+
+    def _roll_forward(self):
+        """把过去未完成的安排重新排入今天以后，已过期的目标移出计划"""
+        for slug, target in list(self.state["targets"].items()):
+            if target.get("done") and target["due"] < self.today.isoformat():
+                del self.state["targets"][slug]
+
+        overdue = []
+        for day in sorted(self.state["days"]):
+            if day < self.today.isoformat():
+                overdue.extend(self.state["days"].pop(day))
+        for slug in overdue:
+            target = self.state["targets"].get(slug)
+            if not target or target["due"] < self.today.isoformat():
+                self.state["targets"].pop(slug, None)
+                continue
+            if not self._place(slug, date.fromisoformat(target["due"])):
+                logger.warning(f"无法在截止日期前重新安排: {slug}")
+                self.state["targets"].pop(slug, None)
+
+    def _place(self, slug, due):
+        """把电影节安排到截止日期前最早有空余的一天，必要时挪后一个截止较晚的电影节"""
+        last_day = min(due, self.today + timedelta(days=self.horizon_days))
+        days = [self.today + timedelta(days=i) for i in range((last_day - self.today).days + 1)]
+
+        for day in days:
+            slots = self._day_slots(day)
+            if len(slots) < self.daily_quota:
+                slots.append(slug)
+                return True
+
+        # 所有天都已排满：找一个截止更晚的电影节，挪到它自己截止前的空位，腾出位置
+        for day in days:
+            slots = self._day_slots(day)
+            for other in sorted(slots, key=lambda s: self.state["targets"][s]["due"], reverse=True):
+                other_due = date.fromisoformat(self.state["targets"][other]["due"])
+                if other_due <= due:
+                    break
+                for later in range(days[-1].toordinal() + 1, min(other_due, self.today + timedelta(days=self.horizon_days)).toordinal() + 1):
+                    later_slots = self._day_slots(date.fromordinal(later))
+                    if len(later_slots) < self.daily_quota:
+                        slots.remove(other)
+                        later_slots.append(other)
+                        slots.append(slug)
+                        return True
+        return False
+
+    def add(self, festivals):
+        """增量加入电影节，只处理新出现或目标截止档发生变化的电影节，返回新安排的数量"""
+        added = 0
+        for festival in festivals:
+            slug = festival["slug"]
+            target = target_deadline(festival, self.max_fee, self.today)
+            current = self.state["targets"].get(slug)
+
+            if target is None:
+                if current and not current.get("done"):
+                    self._unschedule(slug)
+                    del self.state["targets"][slug]
+                continue
+
+            due, fee = target
+            if current and (current.get("done") or current["due"] == due.isoformat()):
+                continue
+
+            if current:
+                self._unschedule(slug)
+            self.state["targets"][slug] = {"due": due.isoformat(), "fee": fee}
+            if self._place(slug, due):
+                added += 1
+            else:
+                logger.info(f"投递计划已满，无法在截止日期({due})前安排: {festival['name']}")
+                del self.state["targets"][slug]
+
+        if added:
+            logger.info(f"投递计划新增 {added} 个电影节")
+        return added
+
+    def today_slice(self):
+        """今天计划投递的电影节标识"""
+        return list(self.state["days"].get(self.today.isoformat(), []))
+
+    def mark_done(self, slug):
+        """电影节已投递（或已提交过、不再接受投递），从计划中移除"""
+        if slug in self.state["targets"]:
+            self._unschedule(slug)
+            self.state["targets"][slug]["done"] = True
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 运行性能分析
+PROFILE_MODE=cprofile 用 cProfile 确定性地分析运行线程以及运行期间启动并已结束的线程，结果保存为 <运行ID>.prof；
+PROFILE_MODE=sample 由后台线程按固定间隔采样所有线程的调用栈（按墙钟时间，包括等待浏览器的时间），
+保存为火焰图工具（flamegraph.pl、speedscope）可直接读取的折叠栈 <运行ID>.folded；
+两种模式都在运行报告旁边写一份热点函数汇总 <运行ID>.hotspots.txt
+"""
+
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+from paths import RUN_LOG_DIR
+
+# 热点汇总中列出的函数数量
+TOP_FUNCTIONS = 25
+
+# 停止分析时等待运行期间启动的线程结束的最长时间(秒)
+THREAD_JOIN_SECONDS = 2
+
+
+def _frame_label(code):
+    """折叠栈中的函数名：模块文件名:函数名"""
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class RunProfiler:
+    """一次运行的性能分析
+
+    start() 在运行线程中调用，stop() 写入结果文件并返回热点汇总的路径。
+    """
+
+    def __init__(self, mode, run_id, directory=RUN_LOG_DIR, interval_ms=10):
+        self.mode = mode
+        self.run_id = run_id
+        self.directory = directory
+        self.interval = interval_ms / 1000
+
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self.samples = 0
+        self.stacks = Counter()
+        self.started = None
+
+    def start(self):
+        """开始分析"""
+        self.started = time.monotonic()
+        if self.mode == "cprofile":
+            self._enable_profile()
+            # 运行期间新启动的线程各用一个 cProfile，结束时合并
+            threading.setprofile(self._thread_hook)
+        elif self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name="profiler", daemon=True)
+            self._sampler.start()
+
+    def _enable_profile(self):
+        """为当前线程启用 cProfile"""
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # 新版本的 cProfile 对所有线程生效，只能同时启用一个
+            return
+        with self._lock:
+            self._profiles.append((threading.current_thread(), profile))
+
+    def _thread_hook(self, frame, event, arg):
+        """新线程的第一个事件：移除钩子，改用该线程自己的 cProfile"""
+        sys.setprofile(None)
+        self._enable_profile()
+
+    def _sample_loop(self):
+        """采样线程：记录除自身以外所有线程的调用栈"""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        """停止分析，写入结果文件，返回 (结果文件路径, 热点汇总路径)"""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.run_id)
+        elapsed = time.monotonic() - (self.started or time.monotonic())
+
+        if self.mode == "cprofile":
+            output_path = f"{base}.prof"
+            profiles, running = self._stop_profiles()
+            lines = self._cprofile_hotspots(profiles, output_path)
+            if running:
+                lines += ["", f"{len(running)} 个线程在分析结束时仍在运行，未计入: {', '.join(running)}"]
+        else:
+            self._stop.set()
+            if self._sampler:
+                self._sampler.join()
+            output_path = f"{base}.folded"
+            with open(output_path, "w", encoding="utf-8") as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            lines = self._sample_hotspots()
+
+        header = [
+            f"运行 {self.run_id} 性能分析 ({self.mode})，耗时 {elapsed:.1f} 秒",
+            f"完整结果: {output_path}",
+            "",
+        ]
+        hotspots_path = f"{base}.hotspots.txt"
+        with open(hotspots_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(header + lines) + "\n")
+        return output_path, hotspots_path
+
+    def _stop_profiles(self):
+        """停止各线程的 cProfile，返回 (已停止的分析器, 仍在运行而未计入的线程名)
+
+        cProfile 的钩子只能由启用它的线程自己移除，在这里对其他线程的分析器调用 disable() 并不能停止它。
+        因此运行线程的分析器在这里停止，运行期间启动的线程等待其结束（线程结束时钩子随之移除），
+        超时仍在运行的线程的结果不读取，避免读取时仍被写入。
+        """
+        threading.setprofile(None)
+        with self._lock:
+            entries = list(self._profiles)
+
+        current = threading.current_thread()
+        deadline = time.monotonic() + THREAD_JOIN_SECONDS
+        profiles, running = [], []
+        for thread, profile in entries:
+            if thread is current:
+                profile.disable()
+            else:
+                thread.join(max(deadline - time.monotonic(), 0))
+                if thread.is_alive():
+                    running.append(thread.name)
+                    continue
+            profiles.append(profile)
+        return profiles, running
+
+    @staticmethod
+    def _cprofile_hotspots(profiles, output_path):
+        """合并各线程的结果，保存为 .prof，返回按自身耗时排序的热点"""
+        stats = None
+        for profile in profiles:
+            profile.create_stats()
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        if stats is None:
+            return ["没有分析数据"]
+        stats.dump_stats(output_path)
+
+        lines = [f"{'自身耗时(s)':>12} {'累计耗时(s)':>12} {'调用次数':>10}  函数"]
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_FUNCTIONS]
+        for (filename, line, name), (_, calls, self_time, total_time, _) in rows:
+            lines.append(f"{self_time:12.3f} {total_time:12.3f} {calls:10d}  {os.path.basename(filename)}:{line}({name})")
+        return lines
+
+    def _sample_hotspots(self):
+        """按采样次数统计热点：自身为栈顶的次数和出现在栈中的次数"""
+        if not self.samples:
+            return ["没有采样数据"]
+        own = Counter()
+        inclusive = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for frame in set(frames):
+                inclusive[frame] += count
+
+        # 每个线程每次采样计一次，占比按线程采样总数计算
+        total = sum(self.stacks.values())
+        lines = [f"共 {self.samples} 次采样，间隔 {self.interval * 1000:.0f} ms", "",
+                 f"{'自身占比':>8} {'包含占比':>8}  函数"]
+        for frame, count in own.most_common(TOP_FUNCTIONS):
+            lines.append(f"{count / total:8.1%} {inclusive[frame] / total:8.1%}  {frame}")
+        return lines
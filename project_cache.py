@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 项目列表缓存
+按账号保存账户中的项目列表和获取时间，界面启动时直接显示缓存，超过有效期后在后台刷新
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+from paths import PROJECTS_FILE
+
+
+class ProjectCache:
+    """项目列表缓存，ttl_hours 内的缓存视为新鲜"""
+
+    def __init__(self, path=PROJECTS_FILE, ttl_hours=12):
+        self.path = path
+        self.ttl = timedelta(hours=ttl_hours)
+
+    def _read(self):
+        """读取所有账号的缓存"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def mtime(self):
+        """缓存文件的修改时间，文件不存在时返回None"""
+        try:
+            return os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def get(self, account):
+        """返回 (项目列表, 获取时间)，没有缓存时返回 ([], None)"""
+        entry = self._read().get(account or "default")
+        if not entry:
+            return [], None
+        return entry["projects"], datetime.fromisoformat(entry["fetched_at"])
+
+    def is_stale(self, account):
+        """缓存不存在或已超过有效期"""
+        _, fetched_at = self.get(account)
+        return fetched_at is None or datetime.now() - fetched_at > self.ttl
+
+    def put(self, account, projects):
+        """保存账号的项目列表"""
+        records = self._read()
+        records[account or "default"] = {
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+            "projects": projects,
+        }
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.path)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 每日配额记录
+按 账号 + 项目 + 日期 持久化已投递数量，通过文件锁在多个进程之间原子地检查和扣减配额
+"""
+
+import json
+import os
+import time
+from datetime import date, timedelta
+from loguru import logger
+
+from paths import QUOTA_FILE
+
+
+# 配额记录保留天数
+KEEP_DAYS = 30
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """基于锁文件的跨进程互斥锁"""
+
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._fd = None
+
+    def acquire(self):
+        """获取锁，超时抛出 TimeoutError"""
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    msvcrt.locking(self._fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    os.close(self._fd)
+                    self._fd = None
+                    raise TimeoutError(f"等待文件锁超时: {self.path}")
+                time.sleep(0.05)
+
+    def release(self):
+        """释放锁"""
+        if self._fd is None:
+            return
+        try:
+            if os.name == "nt":
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class QuotaStore:
+    """跨进程共享的每日投递配额
+
+    投递前调用 acquire() 预占一个名额，投递失败时调用 release() 归还（点击提交时用 reserve() 完成这一过程），
+    所有读写都在文件锁内完成，多个运行实例可以安全地共享同一份配额。
+    """
+
+    def __init__(self, path=QUOTA_FILE):
+        self.path = path
+        self.lock = FileLock(f"{path}.lock")
+
+    @staticmethod
+    def _key(account, project, day=None):
+        """配额记录的键：账号|项目|日期"""
+        day = day or date.today()
+        return f"{account or 'default'}|{project}|{day.isoformat()}"
+
+    def _read(self):
+        """读取配额记录（调用方需持有锁）"""
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取配额记录失败: {str(e)}")
+            return {}
+
+    def _write(self, records):
+        """写入配额记录并清理过期数据（调用方需持有锁）"""
+        oldest = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+        records = {k: v for k, v in records.items() if k.rsplit("|", 1)[-1] >= oldest}
+
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def used(self, account, project, day=None):
+        """某天已使用的配额"""
+        with self.lock:
+            return self._read().get(self._key(account, project, day), 0)
+
+    def remaining(self, account, project, limit):
+        """今天剩余的配额"""
+        return max(limit - self.used(account, project), 0)
+
+    def acquire(self, account, project, limit):
+        """原子地预占一个名额，配额已满时返回 False"""
+        with self.lock:
+            records = self._read()
+            key = self._key(account, project)
+            if records.get(key, 0) >= limit:
+                return False
+            records[key] = records.get(key, 0) + 1
+            self._write(records)
+            return True
+
+    def release(self, account, project):
+        """归还一个预占但未成功使用的名额"""
+        with self.lock:
+            records = self._read()
+            key = self._key(account, project)
+            if records.get(key, 0) > 0:
+                records[key] -= 1
+                self._write(records)
+
+    def reserve(self, account, project, limit, click):
+        """预占一个名额后调用 click() 点击提交，配额已满（其他运行实例已用完）时不点击并返回 False
+
+        click() 抛出异常时归还名额并重新抛出；点击后结果不确定的仍计入配额，避免超投。
+        """
+        if not self.acquire(account, project, limit):
+            return False
+        try:
+            click()
+        except Exception:
+            self.release(account, project)
+            raise
+        return True
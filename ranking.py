@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 候选电影节排序
+按可配置的权重给候选电影节打分，用有界堆只保留得分最高的 K 个，按得分顺序投递
+"""
+
+import heapq
+import itertools
+from datetime import date
+
+# 默认权重：截止日期临近程度、入场费、类别匹配数、用户偏好列表
+DEFAULT_WEIGHTS = {
+    "deadline": 1.0,
+    "fee": 1.0,
+    "category": 1.0,
+    "preference": 2.0,
+}
+
+
+def parse_weights(value):
+    """解析权重设置，如"deadline=1,fee=0.5,preference=3"，未设置的项使用默认值"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            name, weight = item.split("=")
+            name, weight = name.strip(), float(weight)
+        except ValueError:
+            raise ValueError(f"无法解析排序权重: {item}")
+        if name not in DEFAULT_WEIGHTS:
+            raise ValueError(f"未知的排序权重: {name}，可选: {', '.join(DEFAULT_WEIGHTS)}")
+        weights[name] = weight
+    return weights
+
+
+class CandidateRanker:
+    """有界候选堆
+
+    发现阶段每解析出一个电影节就调用 push()，堆中最多保留 capacity 个候选，
+    得分低于堆顶的候选直接丢弃，因此不需要在内存中保存整个目录。
+    """
+
+    def __init__(self, capacity, weights=None, categories=(), preferred=(), max_fee=0, today=None):
+        self.capacity = capacity
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+        self.categories = [c.strip().lower() for c in categories if c.strip()]
+        self.preferred = [p.strip().lower() for p in preferred if p.strip()]
+        self.max_fee = max_fee
+        self.today = today or date.today()
+
+        self._heap = []
+        self._counter = itertools.count()
+        self.seen = 0
+
+    def _deadline_score(self, festival):
+        """截止日期越近得分越高，已过期或未知为0"""
+        deadline = festival.get("deadline")
+        if not deadline:
+            return 0.0
+        days_left = (deadline - self.today).days
+        if days_left < 0:
+            return 0.0
+        return 1.0 / (1.0 + days_left / 7.0)
+
+    def _fee_score(self, festival):
+        """入场费越低得分越高，免费为1"""
+        fee = festival.get("fee") or 0.0
+        if fee <= 0:
+            return 1.0
+        if self.max_fee <= 0:
+            return 0.0
+        return max(1.0 - fee / self.max_fee, 0.0)
+
+    def _category_score(self, festival):
+        """电影节类别中匹配到的配置类别比例"""
+        if not self.categories:
+            return 0.0
+        labels = [c.lower() for c in festival.get("categories", [])]
+        matched = sum(1 for c in self.categories if any(c in label for label in labels))
+        return matched / len(self.categories)
+
+    def _preference_score(self, festival):
+        """命中偏好列表时得分，越靠前的偏好得分越高"""
+        name = festival.get("name", "").lower()
+        for idx, preferred in enumerate(self.preferred):
+            if preferred in name:
+                return (len(self.preferred) - idx) / len(self.preferred)
+        return 0.0
+
+    def score(self, festival):
+        """计算候选电影节的加权得分"""
+        return (
+            self.weights["deadline"] * self._deadline_score(festival)
+            + self.weights["fee"] * self._fee_score(festival)
+            + self.weights["category"] * self._category_score(festival)
+            + self.weights["preference"] * self._preference_score(festival)
+        )
+
+    def push(self, festival):
+        """加入一个候选，返回它是否进入了前 K 名"""
+        self.seen += 1
+        score = self.score(festival)
+        festival["score"] = score
+        # 计数器保证同分时先发现的排在前面，也避免比较 dict
+        entry = (score, -next(self._counter), festival)
+
+        # 容量为0（如本次投递数为0）时不保留任何候选
+        if self.capacity <= 0:
+            return False
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, entry)
+            return True
+        if entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def ranked(self):
+        """按得分从高到低返回保留的候选"""
+        return [festival for _, _, festival in sorted(self._heap, reverse=True)]
+
+    def __len__(self):
+        return len(self._heap)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 运行报告
+根据一次运行的结构化事件生成汇总（结果分类、各阶段耗时的 p50/p95/最大值、总耗时），
+写成 JSON 和 CSV 放在事件日志旁边；只依赖标准库，命令行的 report 命令可以快速汇总多次运行
+"""
+
+import csv
+import glob
+import json
+import math
+import os
+from datetime import datetime
+
+from paths import RUN_LOG_DIR
+
+# 汇总中的跳过原因，筛选阶段和投递阶段的结果都归入其中
+SKIP_REASONS = ("paid", "over_fee", "unparsable", "already_submitted", "no_button")
+
+# 汇总文件的后缀
+SUMMARY_SUFFIX = ".summary.json"
+
+
+def percentile(values, fraction):
+    """按最近秩法计算分位数，没有数据时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def build_summary(events, run_id=None, wall_seconds=None, run_metrics=None):
+    """从一次运行的事件生成汇总字典"""
+    skipped = dict.fromkeys(SKIP_REASONS, 0)
+    outcomes = {"submitted": 0, "uncertain": 0, "error": 0, "timed_out": 0}
+    durations = {}
+    actions = []
+    seen = set()
+    first_ts = last_ts = None
+
+    for event in events:
+        run_id = run_id or event.get("run_id")
+        first_ts = first_ts or event["ts"]
+        last_ts = event["ts"]
+
+        stage = event["stage"]
+        outcome = event["outcome"]
+        if event.get("duration") is not None:
+            durations.setdefault(stage, []).append(event["duration"])
+
+        if stage == "filter":
+            seen.add(event.get("slug") or event.get("festival"))
+            if outcome == "skipped":
+                reason = event.get("reason")
+                skipped[reason] = skipped.get(reason, 0) + 1
+        elif stage == "submit":
+            seen.add(event.get("slug") or event.get("festival"))
+            if outcome in SKIP_REASONS:
+                skipped[outcome] += 1
+            else:
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            # 只统计走完表单流程的投递
+            if outcome in ("submitted", "uncertain") and event.get("actions") is not None:
+                actions.append(event["actions"])
+
+    if wall_seconds is None and first_ts:
+        wall_seconds = (datetime.fromisoformat(last_ts) - datetime.fromisoformat(first_ts)).total_seconds()
+
+    run_metrics = run_metrics or {}
+    return {
+        "run_id": run_id,
+        "started": first_ts,
+        "wall_seconds": round(wall_seconds or 0, 1),
+        "seen": len(seen),
+        "submitted": outcomes.pop("submitted"),
+        "uncertain": outcomes.pop("uncertain"),
+        "errored": outcomes.pop("error"),
+        "timed_out": outcomes.pop("timed_out"),
+        "other": outcomes,
+        "skipped": skipped,
+        "stages": {
+            stage: {
+                "count": len(values),
+                "p50": round(percentile(values, 0.5), 3),
+                "p95": round(percentile(values, 0.95), 3),
+                "max": round(max(values), 3),
+            }
+            for stage, values in durations.items()
+        },
+        "actions_per_submission": {
+            "mean": round(sum(actions) / len(actions), 1),
+            "p50": percentile(actions, 0.5),
+            "max": max(actions),
+        } if actions else None,
+        "restarts": len(run_metrics.get("restarts", [])),
+        "recycles": run_metrics.get("recycles", 0),
+        "selector_drift": len(run_metrics.get("selector_drift", [])),
+        "prefetch_hits": run_metrics.get("prefetch_hits", 0),
+        "asset_cache": run_metrics.get("asset_cache", {}),
+        "har_mode": run_metrics.get("har", {}).get("mode", "off"),
+    }
+
+
+def _flatten(summary, prefix=""):
+    """把嵌套的汇总展开为 (键, 值) 列表，供 CSV 使用"""
+    rows = []
+    for key, value in summary.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            rows.extend(_flatten(value, f"{name}."))
+        else:
+            rows.append((name, value))
+    return rows
+
+
+def write_run_report(events_path, wall_seconds=None, run_metrics=None, events=None):
+    """生成本次运行的报告，返回 (汇总, JSON路径, CSV路径)
+
+    events 为运行中收集的事件记录，没有时读取事件日志。
+    """
+    if events is None:
+        from event_log import read_events
+        events = read_events(events_path)
+
+    summary = build_summary(events, wall_seconds=wall_seconds, run_metrics=run_metrics)
+    base = events_path
+    for suffix in (".gz", ".jsonl"):
+        base = base[:-len(suffix)] if base.endswith(suffix) else base
+
+    json_path = f"{base}{SUMMARY_SUFFIX}"
+    tmp_file = f"{json_path}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, json_path)
+
+    csv_path = f"{base}.summary.csv"
+    with open(csv_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["metric", "value"])
+        writer.writerows(_flatten(summary))
+    return summary, json_path, csv_path
+
+
+def format_summary(summary):
+    """单次运行汇总的可读文本"""
+    skipped = ", ".join(f"{k} {v}" for k, v in summary["skipped"].items() if v) or "无"
+    lines = [
+        f"运行 {summary['run_id']}: 耗时 {summary['wall_seconds']:.0f} 秒，见到 {summary['seen']} 个电影节",
+        f"成功 {summary['submitted']}，不确定 {summary['uncertain']}，出错 {summary['errored']}，"
+        f"超时 {summary.get('timed_out', 0)}，跳过: {skipped}",
+    ]
+    if summary.get("actions_per_submission"):
+        actions = summary["actions_per_submission"]
+        lines.append(f"每次投递的页面操作: 平均 {actions['mean']}，p50 {actions['p50']}，最多 {actions['max']}")
+    for stage, stats in summary["stages"].items():
+        lines.append(f"  {stage:<10} {stats['count']:>4} 次  p50 {stats['p50']:6.2f}s  p95 {stats['p95']:6.2f}s  最大 {stats['max']:6.2f}s")
+    return "\n".join(lines)
+
+
+def load_summaries(directory=RUN_LOG_DIR, limit=None):
+    """按时间顺序读取多次运行的汇总"""
+    summaries = []
+    for path in sorted(glob.glob(os.path.join(directory, f"*{SUMMARY_SUFFIX}"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    summaries.sort(key=lambda s: s.get("started") or "")
+    return summaries[-limit:] if limit else summaries
+
+
+def trend_tables(summaries, stages=None):
+    """多次运行的趋势表：结果分类一张，各阶段 p50/p95 一张，返回 (表头, 行) 列表"""
+    outcome_header = ["run_id", "wall_s", "seen", "submitted", "uncertain", "errored", "timed_out", "skipped", "actions", "restarts"]
+    outcome_rows = [
+        [s["run_id"], s["wall_seconds"], s["seen"], s["submitted"], s["uncertain"], s["errored"],
+         s.get("timed_out", 0), sum(s["skipped"].values()),
+         (s.get("actions_per_submission") or {}).get("mean", "-"), s.get("restarts", 0)]
+        for s in summaries
+    ]
+
+    stages = stages or sorted({stage for s in summaries for stage in s["stages"]})
+    stage_header = ["run_id"] + [f"{stage} p50/p95" for stage in stages]
+    stage_rows = []
+    for s in summaries:
+        row = [s["run_id"]]
+        for stage in stages:
+            stats = s["stages"].get(stage)
+            row.append(f"{stats['p50']:.2f}/{stats['p95']:.2f}" if stats else "-")
+        stage_rows.append(row)
+    return [(outcome_header, outcome_rows), (stage_header, stage_rows)]
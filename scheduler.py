@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 定时调度
+支持每天多个运行窗口，将每日配额分摊到各窗口，
+精确休眠到下一个窗口，并在启动时按策略补跑错过的窗口
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from loguru import logger
+
+from paths import SCHEDULER_STATE_FILE
+
+
+# 错过窗口的补跑策略：none=不补跑，latest=合并补跑一次，all=逐个补跑
+CATCHUP_POLICIES = ("none", "latest", "all")
+
+
+def parse_run_times(value):
+    """解析逗号分隔的运行时间，如"09:00,14:00,20:00"，返回排序后的(时, 分)列表"""
+    run_times = set()
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            hour, minute = item.split(":")
+            hour, minute = int(hour), int(minute)
+        except ValueError:
+            raise ValueError(f"无法解析运行时间: {item}")
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(f"运行时间超出范围: {item}")
+        run_times.add((hour, minute))
+
+    if not run_times:
+        raise ValueError("至少需要设置一个运行时间")
+    return sorted(run_times)
+
+
+class DailyScheduler:
+    """每日多窗口调度器
+
+    job(window, quota) 在每个窗口被调用，window 为窗口时间字符串(HH:MM)，
+    quota 为该窗口可用的投递数，返回本次实际投递数量。
+    """
+
+    def __init__(self, run_times, job, daily_quota, catchup_policy="latest", state_file=SCHEDULER_STATE_FILE):
+        if catchup_policy not in CATCHUP_POLICIES:
+            raise ValueError(f"未知的补跑策略: {catchup_policy}，可选: {', '.join(CATCHUP_POLICIES)}")
+
+        self.run_times = sorted(run_times)
+        self.job = job
+        self.daily_quota = daily_quota
+        self.catchup_policy = catchup_policy
+        self.state_file = state_file
+
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.run_requested = False
+        self.running = False
+        self.next_run = None
+        self.state = self._load_state()
+
+    @property
+    def last_run(self):
+        """上一次运行的时间"""
+        last_run = self.state.get("last_run")
+        return datetime.fromisoformat(last_run) if last_run else None
+
+    def _load_state(self):
+        """从状态文件加载已完成的窗口"""
+        if not os.path.exists(self.state_file):
+            return {"last_run": None, "days": {}}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取调度状态失败，将重新开始: {str(e)}")
+            return {"last_run": None, "days": {}}
+
+    def _save_state(self):
+        """保存调度状态，只保留最近几天的记录"""
+        days = self.state["days"]
+        for day in sorted(days)[:-7]:
+            del days[day]
+
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+    def _day_state(self, day):
+        """获取某一天的状态记录"""
+        return self.state["days"].setdefault(day.isoformat(), {"completed": [], "submitted": 0})
+
+    def _windows_for(self, day):
+        """某一天的所有窗口时间"""
+        return [datetime.combine(day, datetime.min.time()).replace(hour=h, minute=m) for h, m in self.run_times]
+
+    def next_window(self, now=None):
+        """下一个尚未运行的窗口时间"""
+        now = now or datetime.now()
+        for day in (now.date(), now.date() + timedelta(days=1)):
+            completed = self._day_state(day)["completed"]
+            for window in self._windows_for(day):
+                if window > now and window.strftime("%H:%M") not in completed:
+                    return window
+        # 今天和明天的窗口都已完成时，顺延到后天的第一个窗口
+        return self._windows_for(now.date() + timedelta(days=2))[0]
+
+    def missed_windows(self, now=None):
+        """今天已经错过且未运行的窗口"""
+        now = now or datetime.now()
+        completed = self._day_state(now.date())["completed"]
+        return [w for w in self._windows_for(now.date()) if w <= now and w.strftime("%H:%M") not in completed]
+
+    def window_quota(self, window, count=1):
+        """计算窗口的配额：当天剩余配额按剩余窗口数分摊，count 为本次合并运行的窗口数"""
+        day_state = self._day_state(window.date())
+        remaining = max(self.daily_quota - day_state["submitted"], 0)
+        windows_left = [
+            w for w in self._windows_for(window.date())
+            if w >= window and w.strftime("%H:%M") not in day_state["completed"]
+        ]
+        if not remaining or not windows_left:
+            return 0
+        # 向上取整，保证配额不会因为除不尽而浪费
+        return min(remaining, -(-remaining * count // len(windows_left)))
+
+    def _mark_completed(self, windows, submitted=0, ran=True):
+        """将窗口标记为已完成并记录投递数量"""
+        for window in windows:
+            day_state = self._day_state(window.date())
+            label = window.strftime("%H:%M")
+            if label not in day_state["completed"]:
+                day_state["completed"].append(label)
+        if windows:
+            self._day_state(windows[-1].date())["submitted"] += submitted
+        if ran:
+            self.state["last_run"] = datetime.now().isoformat(timespec="seconds")
+        self._save_state()
+
+    def manual_quota(self, now=None):
+        """手动运行的配额：当天剩余配额按剩余窗口数（含本次）分摊"""
+        now = now or datetime.now()
+        day_state = self._day_state(now.date())
+        remaining = max(self.daily_quota - day_state["submitted"], 0)
+        windows_left = [
+            w for w in self._windows_for(now.date())
+            if w > now and w.strftime("%H:%M") not in day_state["completed"]
+        ]
+        return min(remaining, -(-remaining // (len(windows_left) + 1)))
+
+    def _call_job(self, label, quota):
+        """调用投递任务，返回投递数量"""
+        self.running = True
+        try:
+            return self.job(label, quota) or 0
+        except Exception as e:
+            logger.error(f"窗口 {label} 运行出错: {str(e)}")
+            return 0
+        finally:
+            self.running = False
+
+    def run_manual(self):
+        """立即运行一次，不占用任何窗口，投递数量计入当天"""
+        self.run_requested = False
+        quota = self.manual_quota()
+        if quota <= 0:
+            logger.info("手动运行: 今日无剩余配额，跳过")
+            return 0
+
+        logger.info(f"开始手动运行，配额: {quota}")
+        submitted = self._call_job("manual", quota)
+        self._day_state(datetime.now().date())["submitted"] += submitted
+        self.state["last_run"] = datetime.now().isoformat(timespec="seconds")
+        self._save_state()
+        return submitted
+
+    def run_window(self, window, covers=None):
+        """运行一个窗口，covers 为本次运行一并覆盖的其他(错过的)窗口"""
+        covers = covers or []
+        quota = self.window_quota(covers[0] if covers else window, len(covers) + 1)
+        label = window.strftime("%H:%M")
+
+        if quota <= 0:
+            logger.info(f"窗口 {label} 无剩余配额，跳过")
+            self._mark_completed(covers + [window], ran=False)
+            return 0
+
+        logger.info(f"开始运行窗口 {label}，本窗口配额: {quota}")
+        submitted = 0
+        try:
+            submitted = self._call_job(label, quota)
+        finally:
+            self._mark_completed(covers + [window], submitted)
+        return submitted
+
+    def _run_missed(self, missed, run_latest=False):
+        """按补跑策略处理错过的窗口，run_latest 为真时最近的一个窗口总是运行"""
+        labels = ", ".join(w.strftime("%H:%M") for w in missed)
+        if self.catchup_policy == "all":
+            if len(missed) > 1:
+                logger.info(f"逐个补跑错过的窗口: {labels}")
+            for window in missed:
+                if self.stop_event.is_set():
+                    break
+                self.run_window(window)
+        elif self.catchup_policy == "latest":
+            if len(missed) > 1:
+                logger.info(f"合并补跑错过的窗口: {labels}")
+            self.run_window(missed[-1], covers=missed[:-1])
+        elif run_latest:
+            if len(missed) > 1:
+                self._mark_completed(missed[:-1], ran=False)
+                logger.info(f"跳过错过的窗口: {', '.join(w.strftime('%H:%M') for w in missed[:-1])}")
+            self.run_window(missed[-1])
+        else:
+            logger.info(f"跳过错过的窗口: {labels}")
+            self._mark_completed(missed, ran=False)
+
+    def catch_up(self, now=None):
+        """按补跑策略处理启动前错过的窗口"""
+        missed = self.missed_windows(now)
+        if missed:
+            self._run_missed(missed)
+
+    def run_forever(self):
+        """补跑错过的窗口后，休眠到下一个窗口再运行，直到 stop() 被调用"""
+        self.catch_up()
+
+        while not self.stop_event.is_set():
+            self.next_run = self.next_window()
+            self.state["next_run"] = self.next_run.isoformat(timespec="minutes")
+            self._save_state()
+            delay = (self.next_run - datetime.now()).total_seconds()
+            logger.info(f"下一次运行时间: {self.next_run.strftime('%Y-%m-%d %H:%M')}，约 {delay / 3600:.1f} 小时后")
+
+            # 等待到窗口时间；被提前唤醒（如系统时间调整、重新设置运行时间）时重新计算
+            self.wake_event.wait(max(delay, 0))
+            self.wake_event.clear()
+            if self.stop_event.is_set():
+                break
+            if self.run_requested:
+                self.run_manual()
+                continue
+            if datetime.now() < self.next_run:
+                continue
+
+            # 休眠期间可能跨过多个窗口（如电脑睡眠），较早的窗口按补跑策略处理
+            missed = self.missed_windows() or [self.next_run]
+            self._run_missed(missed, run_latest=True)
+
+        self.next_run = None
+        self.state["next_run"] = None
+        self._save_state()
+
+    def reschedule(self, run_times=None, daily_quota=None):
+        """运行中修改运行时间或每日配额，唤醒休眠的线程重新计算下一个窗口"""
+        if run_times:
+            self.run_times = sorted(run_times)
+        if daily_quota is not None:
+            self.daily_quota = daily_quota
+        logger.info(f"调度已更新: 运行时间 {', '.join(self.status()['run_times'])}，每日配额 {self.daily_quota}")
+        self.wake_event.set()
+
+    def trigger(self):
+        """请求立即运行一次（可从其他线程调用）；正在运行时在本次结束后运行"""
+        self.run_requested = True
+        self.wake_event.set()
+
+    def stop(self):
+        """停止调度，立即唤醒正在休眠的线程"""
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def status(self):
+        """返回调度状态；可能在其他线程中调用，因此只读取状态而不创建当天的记录"""
+        today = self.state["days"].get(datetime.now().date().isoformat()) or {"completed": [], "submitted": 0}
+        return {
+            "run_times": [f"{h:02d}:{m:02d}" for h, m in self.run_times],
+            "catchup_policy": self.catchup_policy,
+            "next_run": self.next_run.isoformat(timespec="minutes") if self.next_run else None,
+            "last_run": self.state.get("last_run"),
+            "completed_today": list(today["completed"]),
+            "submitted_today": today["submitted"],
+            "quota_remaining_today": max(self.daily_quota - today["submitted"], 0),
+            "running": self.running,
+            "run_requested": self.run_requested,
+        }
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 选择器注册表
+每个页面元素对应一组按优先级排列的候选选择器，同时等待所有候选（Locator.or_），
+记录实际匹配的候选并持久化，下次运行优先使用；匹配的候选发生变化时记录为漂移
+"""
+
+import json
+import os
+from datetime import datetime
+from loguru import logger
+
+from paths import SELECTORS_FILE
+
+# 元素名称 -> 候选选择器，越靠前越优先；可以包含 {project_id} 等参数
+DEFAULT_SELECTORS = {
+    "festival_item": [".festival-item", "[data-festival-id]", "article.festival"],
+    "listing_filters": [".filters-container", ".filters", "form.festival-filters"],
+    "free_filter": ['text="Free"', 'label:has-text("Free")', 'input[value="free"]'],
+    "next_page": ['a[rel="next"]', ".pagination a.next", '.pagination a:has-text("Next")'],
+    "pagination_links": [".pagination a", "nav.pagination a"],
+    "already_submitted": ['text="Already Submitted"', "text=/already submitted/i"],
+    "submit_now": ['a:text("Submit Now")', 'button:text("Submit Now")'],
+    "project_link": ['a[href*="{project_id}"]', '[data-project-id="{project_id}"]', 'label:has(input[value="{project_id}"])'],
+    "continue_button": ['button:text("Continue")', 'input[type="submit"][value*="Continue"]', 'a:text("Continue")'],
+    "final_submit": ['button:text("Submit")', 'input[type="submit"][value*="Submit"]', 'button:has-text("Submit Entry")'],
+    "thank_you": ['text="Thank you"', "text=/thank you/i"],
+    "email_input": ['input[name="email"]', 'input[type="email"]', "#user_email"],
+    "password_input": ['input[name="password"]', 'input[type="password"]', "#user_password"],
+    "login_button": ['button[type="submit"]', 'input[type="submit"]', 'button:has-text("Log In")'],
+    "logged_in": ['a[href="/dashboard"]', 'a[href*="/logout"]'],
+    "google_login": ['text="Sign in with Google"', ".google-login-button", 'a:has-text("Google")'],
+    "project_item": [".project-item", "[data-project-id]"],
+}
+
+# 漂移记录保留条数
+DRIFT_HISTORY = 50
+
+# 较低优先级的候选需要连续命中的次数才会成为首选，避免偶然命中一次（如某个页面缺少该元素）就永久改变顺序
+PROMOTE_HITS = 3
+
+
+class SelectorRegistry:
+    """选择器注册表
+
+    find()/wait() 同时等待元素的所有候选，匹配后按优先级确定是哪一个候选命中；
+    默认的第一个候选命中即为首选，其他候选连续命中 PROMOTE_HITS 次后才成为首选，之后的运行排在最前面。
+    """
+
+    def __init__(self, path=SELECTORS_FILE, selectors=None):
+        self.path = path
+        self.selectors = selectors or DEFAULT_SELECTORS
+        self.state = self._load()
+        self.drift = []
+        self._dirty = False
+        # 向页面查询元素的次数，用于统计每次投递的操作数
+        self.queries = 0
+
+    def _load(self):
+        """读取上次保存的首选选择器"""
+        if not os.path.exists(self.path):
+            return {"elements": {}, "drift": []}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"读取选择器记录失败，将使用默认顺序: {str(e)}")
+            return {"elements": {}, "drift": []}
+
+    def save(self):
+        """有变化时保存选择器记录"""
+        if not self._dirty:
+            return
+        self.state["drift"] = self.state["drift"][-DRIFT_HISTORY:]
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.path)
+        self._dirty = False
+
+    def ordered(self, name):
+        """元素的候选选择器（模板），上次命中的排在最前"""
+        candidates = list(self.selectors[name])
+        winner = self.state["elements"].get(name, {}).get("winner")
+        if winner in candidates:
+            candidates.remove(winner)
+            candidates.insert(0, winner)
+        return candidates
+
+    def _record(self, name, template):
+        """记录命中的候选，首选发生变化时记录漂移"""
+        element = self.state["elements"].setdefault(name, {"winner": None, "hits": {}})
+        element["hits"][template] = element["hits"].get(template, 0) + 1
+        self._dirty = True
+        if element["winner"] == template or (element["winner"] is None and template == self.selectors[name][0]):
+            element.pop("challenger", None)
+        else:
+            # 首选以外的候选命中：连续命中足够次数才替换首选
+            challenger = element.get("challenger") or {}
+            streak = challenger.get("streak", 0) + 1 if challenger.get("template") == template else 1
+            element["challenger"] = {"template": template, "streak": streak}
+            if streak < PROMOTE_HITS:
+                return
+            element.pop("challenger", None)
+        if element["winner"] != template:
+            if element["winner"] is not None:
+                drift = {
+                    "time": datetime.now().isoformat(timespec="seconds"),
+                    "element": name,
+                    "from": element["winner"],
+                    "to": template,
+                }
+                self.state["drift"].append(drift)
+                self.drift.append(drift)
+                logger.warning(f"选择器漂移: {name} 不再匹配 {element['winner']}，改用 {template}")
+            element["winner"] = template
+            # 首选变化立即保存，其他进程和下次运行直接使用
+            self.save()
+
+    def _resolve(self, page, name, params):
+        """按优先级返回当前页面上第一个存在的候选 (模板, 选择器)，都不存在时返回 (None, None)"""
+        for template in self.ordered(name):
+            selector = template.format(**params)
+            self.queries += 1
+            if page.locator(selector).count():
+                return template, selector
+        return None, None
+
+    def pick(self, page, name, timeout=0, **params):
+        """返回页面上匹配元素的选择器字符串，timeout(毫秒)内都没有出现时返回None"""
+        if timeout:
+            combined = None
+            for template in self.ordered(name):
+                locator = page.locator(template.format(**params))
+                combined = locator if combined is None else combined.or_(locator)
+            self.queries += 1
+            try:
+                combined.first.wait_for(state="attached", timeout=timeout)
+            except Exception:
+                return None
+
+        template, selector = self._resolve(page, name, params)
+        if template:
+            self._record(name, template)
+        return selector
+
+    def find(self, page, name, timeout=0, **params):
+        """返回匹配元素的 Locator（第一个），没有出现时返回None"""
+        selector = self.pick(page, name, timeout, **params)
+        return page.locator(selector).first if selector else None
+
+    def wait(self, page, name, timeout=30000, **params):
+        """等待元素出现并返回 Locator，超时抛出异常"""
+        locator = self.find(page, name, timeout, **params)
+        if locator is None:
+            raise TimeoutError(f"等待页面元素超时: {name} ({', '.join(self.ordered(name))})")
+        return locator
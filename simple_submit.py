@@ -6,55 +6,58 @@ FilmFreeway简易投递工具 - 命令行版本
 自动使用已安装的Chrome浏览器进行投递
 """
 
-import os
 import time
 import tempfile
 from datetime import datetime
-from dotenv import load_dotenv
 from loguru import logger
 from playwright.sync_api import sync_playwright
 
-# 设置日志
-logger.add("filmfreeway_auto.log", rotation="10 MB", level="INFO")
+from logging_setup import setup_logging
+from asset_cache import AssetCache
+from category_matcher import CategoryMatcher, parse_aliases
+from config import ConfigError, get_settings
+from event_log import RunEventLog
+from quota import QuotaStore
+from report import format_summary, write_run_report
 
 def main():
     """主函数 - 简易版本，直接使用用户的Chrome浏览器"""
+    setup_logging()
     print("FilmFreeway简易投递工具 - 启动中...")
     logger.info("FilmFreeway简易投递工具启动")
     
-    # 加载环境变量
-    load_dotenv()
+    # 读取配置，取值无效时提示后退出
+    try:
+        settings = get_settings()
+    except ConfigError as e:
+        print(f"配置错误: {str(e)}")
+        return
     
     # 获取项目ID
-    project_id = os.getenv("PROJECT_ID", "")
+    project_id = settings.project_id
     if not project_id or project_id == "your_project_id":
         project_id = input("请输入您的项目ID: ")
     
-    # 获取最大费用
-    max_fee_str = os.getenv("MAX_ENTRY_FEE", "0")
-    try:
-        max_fee = float(max_fee_str)
-    except:
-        max_fee = 0
-        print("入场费设置错误，将使用默认值0")
+    max_fee = settings.max_fee
+    max_submissions = settings.max_submissions
     
-    # 获取每日最大投递数
-    max_submissions_str = os.getenv("MAX_SUBMISSION_PER_DAY", "5")
-    try:
-        max_submissions = int(max_submissions_str)
-    except:
-        max_submissions = 5
-        print("每日最大投递数设置错误，将使用默认值5")
+    # 每日配额与其他运行实例（命令行版、GUI）共享
+    account = settings.email
+    quota = QuotaStore()
     
     # 获取类别
-    categories_str = os.getenv("CATEGORIES", "Short,Documentary")
-    categories = [c.strip() for c in categories_str.split(",") if c.strip()]
+    categories = settings.categories
+    category_matcher = CategoryMatcher(
+        categories,
+        aliases=parse_aliases(settings.category_aliases),
+        threshold=settings.category_match_threshold,
+    )
     
     # 确认设置
     print("\n当前设置:")
     print(f"项目ID: {project_id}")
     print(f"最大入场费: ${max_fee}")
-    print(f"每日最大投递数: {max_submissions}")
+    print(f"每日最大投递数: {max_submissions} (今日剩余: {quota.remaining(account, project_id, max_submissions)})")
     print(f"投递类别: {', '.join(categories)}")
     
     confirm = input("\n确认以上设置并开始投递? (y/n): ")
@@ -81,6 +84,10 @@ def main():
                 user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
             )
             
+            # 静态资源从本地磁盘缓存返回，新上下文不必每次重新下载脚本和样式
+            if settings.asset_cache_mb:
+                AssetCache(max_mb=settings.asset_cache_mb).attach(context)
+            
             page = context.new_page()
             
             try:
@@ -120,9 +127,12 @@ def main():
                 
                 submitted_count = 0
                 
+                # 每个电影节的决定写入本次运行的结构化事件日志
+                events = RunEventLog()
+                
                 # 循环处理每个电影节
                 for idx, festival in enumerate(festivals):
-                    if submitted_count >= max_submissions:
+                    if not quota.remaining(account, project_id, max_submissions):
                         print(f"已达到每日最大投递数 {max_submissions}")
                         break
                     
@@ -140,6 +150,7 @@ def main():
                             fee_text = fee_el.inner_text().strip()
                             if 'Free' not in fee_text and max_fee == 0:
                                 print(f"跳过付费电影节: {festival_name}")
+                                events.event(festival_name, "filter", "skipped", reason="paid")
                                 continue
                             
                             # 尝试解析费用
@@ -148,9 +159,11 @@ def main():
                                     fee_value = float(fee_text.replace('$', '').strip())
                                     if fee_value > max_fee:
                                         print(f"跳过费用(${fee_value})超出限制的电影节: {festival_name}")
+                                        events.event(festival_name, "filter", "skipped", reason="over_fee", fee=fee_value)
                                         continue
                                 except:
                                     print(f"无法解析电影节费用: {fee_text}, 跳过: {festival_name}")
+                                    events.event(festival_name, "filter", "skipped", reason="unparsable", fee=fee_text)
                                     continue
                         
                         # 获取详情链接并访问
@@ -159,6 +172,7 @@ def main():
                             continue
                         
                         print(f"\n正在处理电影节 ({idx+1}/{festival_count}): {festival_name}")
+                        started = time.monotonic()
                         
                         # 在新标签页中打开详情页
                         with page.context.new_page() as detail_page:
@@ -169,12 +183,14 @@ def main():
                             # 检查是否已经提交过
                             if detail_page.query_selector('text="Already Submitted"'):
                                 print(f"已经提交过: {festival_name}")
+                                events.event(festival_name, "submit", "already_submitted", time.monotonic() - started)
                                 continue
                             
                             # 寻找提交按钮
                             submit_button = detail_page.query_selector('a:text("Submit Now")')
                             if not submit_button:
                                 print(f"无法找到提交按钮: {festival_name}")
+                                events.event(festival_name, "submit", "no_button", time.monotonic() - started)
                                 continue
                             
                             # 点击提交按钮
@@ -188,12 +204,12 @@ def main():
                                 detail_page.click(f'a[href*="{project_id}"]')
                                 detail_page.wait_for_load_state("networkidle")
                                 
-                                # 选择类别（如果有）
-                                if len(categories) > 0:
-                                    for category in categories:
-                                        category_checkbox = detail_page.query_selector(f'label:text-is("{category.strip()}")')
-                                        if category_checkbox:
-                                            category_checkbox.click()
+                                # 选择类别（如果有）：一次读取所有类别标签，批量勾选匹配项
+                                matches, misses = category_matcher.apply(detail_page)
+                                for m in matches:
+                                    print(f"已选择类别: {m['category']} -> {m['label']} (置信度 {m['confidence']})")
+                                if misses:
+                                    print(f"未匹配的类别: {', '.join(misses)}")
                                 
                                 # 点击继续
                                 continue_button = detail_page.query_selector('button:text("Continue")')
@@ -204,21 +220,29 @@ def main():
                                     # 最终提交
                                     submit_final = detail_page.query_selector('button:text("Submit")')
                                     if submit_final:
-                                        submit_final.click()
+                                        if not quota.reserve(account, project_id, max_submissions, submit_final.click):
+                                            print(f"已达到每日最大投递数 {max_submissions}")
+                                            events.event(festival_name, "submit", "quota_reached", time.monotonic() - started)
+                                            break
                                         detail_page.wait_for_load_state("networkidle")
                                         
                                         # 检查是否成功提交
                                         if detail_page.url.find("thank-you") > -1 or detail_page.query_selector('text="Thank you"'):
                                             submitted_count += 1
                                             print(f"✅ 成功投递 [{submitted_count}]: {festival_name}")
+                                            events.event(festival_name, "submit", "submitted", time.monotonic() - started)
                                         else:
                                             print(f"❓ 可能未成功投递: {festival_name}")
+                                            events.event(festival_name, "submit", "uncertain", time.monotonic() - started)
                                     else:
                                         print(f"未找到最终提交按钮: {festival_name}")
+                                        events.event(festival_name, "submit", "no_button", time.monotonic() - started, "final_submit")
                                 else:
                                     print(f"未找到继续按钮: {festival_name}")
+                                    events.event(festival_name, "submit", "no_button", time.monotonic() - started, "continue")
                             except Exception as e:
                                 print(f"投递过程出错 - {festival_name}: {str(e)}")
+                                events.event(festival_name, "submit", "error", time.monotonic() - started, str(e))
                         
                         # 随机延迟2-5秒，避免被检测为机器人
                         delay = 2 + (idx % 3)
@@ -229,6 +253,9 @@ def main():
                         print(f"处理电影节时出错: {str(e)}")
                 
                 print(f"\n投递过程完成！成功投递 {submitted_count} 个电影节")
+                summary, json_path, csv_path = write_run_report(events.close())
+                print(f"\n{format_summary(summary)}")
+                print(f"运行报告已保存: {json_path}, {csv_path}")
                 
             except Exception as e:
                 print(f"执行过程中出错: {str(e)}")
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FilmFreeway自动投递工具 - 单个电影节的时间预算
+每个电影节的处理有一个截止时间，其中的每次等待都从剩余预算中取超时时间，
+预算用完时正在进行的 Playwright 操作随超时结束，电影节标记为超时，继续处理下一个；
+预算和每个步骤的等待上限根据最近观察到的耗时自动调整
+"""
+
+import time
+from collections import deque
+
+from report import percentile
+
+
+class BudgetExceeded(Exception):
+    """电影节的时间预算已用完"""
+
+
+class TimeBudget:
+    """一个电影节的时间预算
+
+    step_limits 为各步骤单次等待的上限(秒)，由 AdaptiveBudget 根据最近的耗时计算。
+    """
+
+    def __init__(self, seconds, step_limits=None):
+        self.seconds = seconds
+        self.step_limits = step_limits or {}
+        self.started = time.monotonic()
+        self.deadline = self.started + seconds
+
+    def remaining(self):
+        """剩余秒数"""
+        return max(self.deadline - time.monotonic(), 0)
+
+    @property
+    def expired(self):
+        """预算是否已用完"""
+        return self.remaining() <= 0
+
+    def elapsed(self):
+        """已用秒数"""
+        return time.monotonic() - self.started
+
+    def timeout(self, step=None, cap=None):
+        """本次等待可用的超时时间(毫秒)，取剩余预算、步骤上限和 cap(毫秒)中最小的；预算用完时抛出 BudgetExceeded"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise BudgetExceeded(f"已超过 {self.seconds:.0f} 秒的时间预算")
+        limits = [remaining, self.step_limits.get(step), cap / 1000 if cap else None]
+        return max(int(min(v for v in limits if v) * 1000), 1)
+
+
+class AdaptiveBudget:
+    """根据最近的耗时调整时间预算
+
+    样本不足 min_samples 时使用 max_seconds；之后预算为最近耗时 p95 的 factor 倍，
+    限制在 [min_seconds, max_seconds] 之间。步骤的等待上限为该步骤 p95 的 step_factor 倍，不低于 step_floor 秒。
+    """
+
+    def __init__(self, max_seconds=120, min_seconds=30, window=20, min_samples=5, factor=1.5, step_factor=3, step_floor=10):
+        self.max_seconds = max_seconds
+        self.min_seconds = min(min_seconds, max_seconds)
+        self.window = window
+        self.min_samples = min_samples
+        self.factor = factor
+        self.step_factor = step_factor
+        self.step_floor = step_floor
+
+        self.totals = deque(maxlen=window)
+        self.steps = {}
+
+    def observe(self, seconds):
+        """记录一个走完整个表单的电影节的总耗时；超时的按当时的预算计入
+
+        找不到投递按钮、已投递过等很快结束的电影节不应计入，否则预算会被压到下限，完整的投递反而超时。
+        """
+        self.totals.append(seconds)
+
+    def observe_step(self, step, seconds):
+        """记录一个步骤的耗时"""
+        self.steps.setdefault(step, deque(maxlen=self.window)).append(seconds)
+
+    def budget_seconds(self):
+        """当前的电影节预算(秒)"""
+        if len(self.totals) < self.min_samples:
+            return self.max_seconds
+        return min(max(percentile(self.totals, 0.95) * self.factor, self.min_seconds), self.max_seconds)
+
+    def step_limits(self):
+        """各步骤当前的单次等待上限(秒)"""
+        return {
+            step: max(percentile(samples, 0.95) * self.step_factor, self.step_floor)
+            for step, samples in self.steps.items()
+            if len(samples) >= self.min_samples
+        }
+
+    def start(self):
+        """为下一个电影节创建时间预算"""
+        return TimeBudget(self.budget_seconds(), self.step_limits())